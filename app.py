@@ -1,9 +1,15 @@
 import streamlit as st
 import json
-import pandas as pd
 from datetime import datetime
 from pedagogical_sequencer_v2 import PedagogicalSequencerV2
-from utils_v2 import load_json_file, create_sample_json, export_to_csv, validate_new_format_data
+from utils_v2 import load_json_file, create_sample_json, export_to_csv, export_for_lms, validate_new_format_data
+from objective_parser import parse_input_data
+from concurrency_controller import get_default_controller
+from llm_cache import get_default_cache
+from llm_client import format_usage_summary
+from run_store import get_default_run_store, make_run_id
+from tracing import STAGE_LABELS, format_stage_summary, get_tracer, span
+from config import PROMPT_CONFIG
 
 # Configuration de la page
 st.set_page_config(
@@ -13,6 +19,9 @@ st.set_page_config(
 )
 
 def main():
+    # pandas n'est utile qu'aux tableaux et graphiques : importé à l'exécution, pas au chargement du module
+    import pandas as pd
+
     st.title("🎓 Générateur de Séquenceur Pédagogique v2.0")
     st.markdown("*Version spécialisée pour le nouveau format JSON d'analyse d'objectifs*")
     st.markdown("---")
@@ -38,6 +47,55 @@ def main():
         
         st.markdown("---")
         
+        # Encodage du prompt
+        with st.expander("🧮 Encodage du prompt"):
+            compact_prompt = st.checkbox(
+                "Prompt compact",
+                value=PROMPT_CONFIG["compact"],
+                help="Objectifs en tableau référencé par identifiant et JSON minifié : moins de tokens d'entrée"
+            )
+            include_excerpts = st.checkbox(
+                "Inclure les extraits bruts",
+                value=PROMPT_CONFIG["include_excerpts"],
+                help="Ajoute 500 caractères de chaque texte d'entrée, redondants avec l'analyse"
+            )
+        
+        # Statistiques du cache des réponses LLM
+        response_cache = get_default_cache()
+        if response_cache is not None:
+            with st.expander("🗄️ Cache des réponses"):
+                cache_stats = response_cache.stats()
+                st.metric("Taux de hit", f"{cache_stats['hit_rate']:.0f}%")
+                st.caption(f"{cache_stats['hits']} hits · {cache_stats['misses']} misses · {cache_stats['disk_entries']} entrées")
+                if st.button("🗑️ Vider le cache"):
+                    response_cache.clear()
+        
+        # Séquenceurs enregistrés : rechargeables après un rechargement de la page
+        run_store = get_default_run_store()
+        if run_store is not None:
+            with st.expander("💾 Exécutions enregistrées"):
+                saved_runs = [saved_run for saved_run in run_store.list_runs('sequenceur', limit=10) if saved_run['done']]
+                if not saved_runs:
+                    st.caption("Aucun séquenceur enregistré")
+                for saved_run in saved_runs:
+                    st.caption(f"{saved_run['label'] or saved_run['run_id']} · {datetime.fromtimestamp(saved_run['updated_at']):%d/%m %H:%M}")
+                    if st.button("📂 Recharger", key=f"reload_{saved_run['run_id']}"):
+                        st.session_state.sequencer_data = run_store.get_item(saved_run['run_id'], 'sequencer')
+        
+        # Métriques du contrôleur de concurrence adaptatif
+        controller = get_default_controller()
+        if controller is not None:
+            with st.expander("🚦 Concurrence adaptative"):
+                concurrency_metrics = controller.metrics()
+                st.metric("Limite d'appels simultanés", concurrency_metrics['limit'])
+                st.caption(
+                    f"Débit : {concurrency_metrics['throughput']:.2f} appels/s · "
+                    f"latence p50 {concurrency_metrics['latency_p50']:.1f} s, "
+                    f"p95 {concurrency_metrics['latency_p95']:.1f} s, "
+                    f"p99 {concurrency_metrics['latency_p99']:.1f} s · "
+                    f"{concurrency_metrics['overloads']} surcharges (429/délais)"
+                )
+        
         # Téléchargement du modèle JSON
         st.subheader("📄 Modèle JSON")
         sample_json = create_sample_json()
@@ -78,13 +136,20 @@ def main():
         
         # Affichage des données si fichier uploadé
         if uploaded_file is not None:
-            input_data = load_json_file(uploaded_file)
+            try:
+                input_data = load_json_file(uploaded_file)
+            except ValueError as e:
+                st.error(str(e))
+                input_data = {}
             
             if input_data:
                 st.success("✅ Fichier JSON chargé avec succès")
                 
+                # Analyse unique des textes, partagée par la validation et la génération
+                parsed_input = parse_input_data(input_data)
+                
                 # Validation du format spécialisé
-                is_valid, validation_errors, stats = validate_new_format_data(input_data)
+                is_valid, validation_errors, stats = validate_new_format_data(input_data, parsed_input)
                 
                 if validation_errors:
                     st.error("❌ Erreurs de format détectées :")
@@ -107,29 +172,90 @@ def main():
                     st.json(input_data)
             else:
                 input_data = None
+                parsed_input = None
                 is_valid = False
     
     with col2:
         st.header("📋 Séquenceur Généré")
         
+        # Mode de génération
+        generation_mode = st.radio(
+            "Mode de génération",
+            ["⚡ Progressif (streaming)", "🧩 Parallèle (plan puis séquences)", "📦 Standard"],
+            help="Progressif : chaque écran s'affiche dès qu'il est généré. "
+                 "Parallèle : un plan des séquences est généré, puis toutes les séquences en parallèle (cours volumineux)."
+        )
+        
+        fresh_run = st.checkbox(
+            "Régénérer (ignorer la reprise)",
+            value=False,
+            disabled=run_store is None,
+            help="Efface le séquenceur enregistré pour ces entrées et le régénère sans relire le cache de réponses (équivalent de --fresh)"
+        )
+        
         # Génération du séquenceur
         if st.button("🚀 Générer le Séquenceur", type="primary", disabled=not api_key):
             if uploaded_file is not None and input_data and is_valid:
-                with st.spinner("🔄 Génération en cours..."):
-                    sequencer = PedagogicalSequencerV2(api_key)
-                    sequencer_data = sequencer.generate_sequencer(input_data)
+                # Mêmes entrées, même mode : le séquenceur déjà enregistré est repris sans appel
+                run_id = make_run_id('sequenceur', [input_data, generation_mode[2:], compact_prompt, include_excerpts])
+                if run_store is not None and fresh_run:
+                    run_store.delete_run(run_id)
+                saved_sequencer = run_store.get_item(run_id, 'sequencer') if run_store is not None else None
+                if run_store is not None:
+                    run_store.start_run('sequenceur', 1, run_id, label=uploaded_file.name)
+                
+                # Une exécution tracée par génération : les étapes du séquenceur s'y ajoutent
+                with st.spinner("🔄 Génération en cours..."), get_tracer().run('sequenceur', mode=generation_mode[2:]):
+                    sequencer = PedagogicalSequencerV2(
+                        api_key,
+                        compact_prompt=compact_prompt,
+                        include_excerpts=include_excerpts,
+                        refresh=fresh_run
+                    )
+                    
+                    if saved_sequencer:
+                        sequencer_data = saved_sequencer
+                        st.info("💾 Séquenceur repris de l'exécution enregistrée (aucun appel API)")
+                    elif generation_mode.startswith("⚡"):
+                        sequencer_data = []
+                        stream_placeholder = st.empty()
+                        for screen in sequencer.generate_sequencer_stream(input_data, parsed_input):
+                            sequencer_data.append(screen)
+                            with stream_placeholder.container():
+                                st.caption(f"📡 {len(sequencer_data)} écrans reçus...")
+                                st.dataframe(
+                                    pd.DataFrame(sequencer_data)[['num_ecran', 'titre_ecran', 'type_activite']],
+                                    use_container_width=True
+                                )
+                        stream_placeholder.empty()
+                    elif generation_mode.startswith("🧩"):
+                        sequencer_data = sequencer.generate_sequencer_mapreduce(input_data, parsed=parsed_input)
+                    else:
+                        sequencer_data = sequencer.generate_sequencer(input_data, parsed_input)
+                    
+                    for warning in sequencer.generation_warnings:
+                        st.warning(warning)
+                    if sequencer.last_error:
+                        st.error(sequencer.last_error)
                     
                     if sequencer_data:
                         st.session_state.sequencer_data = sequencer_data
+                        if run_store is not None and not saved_sequencer:
+                            run_store.save_item(run_id, 'sequencer', sequencer_data)
+                            run_store.finish_run(run_id)
                         st.success("✅ Séquenceur généré avec succès !")
                         
                         # Affichage des métriques de génération
                         generation_stats = analyze_generated_sequencer(sequencer_data)
-                        col_gen1, col_gen2 = st.columns(2)
+                        usage_stats = sequencer.llm.usage_stats()
+                        col_gen1, col_gen2, col_gen3 = st.columns(3)
                         with col_gen1:
                             st.metric("⏱️ Durée estimée", f"{generation_stats['duration']} min")
                         with col_gen2:
                             st.metric("🎯 Couverture Bloom", f"{generation_stats['bloom_coverage']}%")
+                        with col_gen3:
+                            st.metric("♻️ Cache de préfixe", f"{usage_stats['prompt_cache_hit_ratio']:.0f}%")
+                        st.caption(f"📈 {format_usage_summary(usage_stats)}")
                     else:
                         st.error("❌ Erreur lors de la génération")
             else:
@@ -335,11 +461,19 @@ def main():
         st.markdown("---")
         st.subheader("📥 Export du Séquenceur")
         
+        # Exports préparés ensemble, dans une exécution tracée (détail des temps ci-dessous)
+        with get_tracer().run('export', screens=len(sequencer_data)):
+            with span('export', format='csv'):
+                csv_data = export_to_csv(sequencer_data)
+            with span('export', format='json'):
+                json_data = json.dumps(sequencer_data, indent=2, ensure_ascii=False)
+            with span('export', format='lms'):
+                lms_data = export_for_lms(sequencer_data)
+        
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             # Export CSV
-            csv_data = export_to_csv(sequencer_data)
             st.download_button(
                 label="📥 CSV Standard",
                 data=csv_data,
@@ -349,7 +483,6 @@ def main():
         
         with col2:
             # Export JSON
-            json_data = json.dumps(sequencer_data, indent=2, ensure_ascii=False)
             st.download_button(
                 label="📥 JSON Détaillé", 
                 data=json_data,
@@ -359,7 +492,6 @@ def main():
         
         with col3:
             # Export pour LMS
-            lms_data = export_for_lms(sequencer_data)
             st.download_button(
                 label="📥 Format LMS",
                 data=lms_data,
@@ -371,6 +503,46 @@ def main():
             if st.button("🔄 Nouvelle Génération"):
                 del st.session_state.sequencer_data
                 st.experimental_rerun()
+        
+        display_stage_timings()
+
+def display_stage_timings():
+    """Détail des temps par étape de la dernière génération et des exports"""
+    import pandas as pd
+    
+    generation_run = get_tracer().last_run('sequenceur')
+    export_run = get_tracer().last_run('export')
+    if generation_run is None:
+        return
+    
+    with st.expander("⏱️ Temps par étape de la dernière génération"):
+        st.caption(format_stage_summary(generation_run))
+        stages = dict(generation_run['stages'])
+        if export_run is not None:
+            stages.update(export_run['stages'])
+        
+        # Le premier token et l'attente recoupent le temps des appels LLM : part calculée sur la durée totale
+        rows = [
+            {
+                'Étape': STAGE_LABELS.get(stage, stage),
+                'Durée (s)': round(totals['seconds'], 3),
+                'Mesures': totals['count'],
+                'Part (%)': round(totals['seconds'] / generation_run['duration'] * 100, 1)
+                if generation_run['duration'] else 0.0
+            }
+            for stage, totals in stages.items()
+        ]
+        if rows:
+            df_stages = pd.DataFrame(rows)
+            st.dataframe(df_stages, use_container_width=True)
+            st.bar_chart(df_stages.set_index('Étape')['Durée (s)'])
+        
+        tokens = generation_run['tokens']
+        st.caption(
+            f"🔢 {tokens['requests']} requêtes · {tokens['response_cache_hits']} servies par le cache · "
+            f"{tokens['prompt_tokens']} tokens en entrée (dont {tokens['cached_tokens']} en cache) · "
+            f"{tokens['completion_tokens']} en sortie"
+        )
 
 def analyze_generated_sequencer(sequencer_data):
     """Analyse le séquenceur généré pour fournir des statistiques"""
@@ -389,34 +561,5 @@ def analyze_generated_sequencer(sequencer_data):
         'bloom_coverage': int(bloom_coverage)
     }
 
-def export_for_lms(sequencer_data):
-    """Export spécialisé pour les plateformes LMS"""
-    import io
-    import csv
-    
-    output = io.StringIO()
-    fieldnames = [
-        'module', 'lesson', 'activity_type', 'title', 'description', 
-        'bloom_level', 'difficulty', 'estimated_time', 'prerequisites'
-    ]
-    
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    
-    for item in sequencer_data:
-        writer.writerow({
-            'module': item.get('sequence', ''),
-            'lesson': item.get('num_ecran', ''),
-            'activity_type': item.get('type_activite', ''),
-            'title': item.get('titre_ecran', ''),
-            'description': item.get('resume_contenu', ''),
-            'bloom_level': item.get('niveau_bloom', ''),
-            'difficulty': item.get('difficulte', ''),
-            'estimated_time': item.get('duree_estimee', 5),
-            'prerequisites': item.get('commentaire', '')
-        })
-    
-    return output.getvalue()
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,458 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Dict, List, Any, Callable, Iterator, Optional, Union
+
+from llm_client import LLMClient
+from script_generators import ActivityGenerator, screen_keys
+from tracing import get_tracer, span
+from config import BATCH_CONFIG, GENERATION_CONFIG
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# États terminaux d'un lot (mêmes valeurs que l'API Batch d'OpenAI)
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Lignes JSON d'un fichier ; une dernière ligne incomplète (écriture interrompue) est ignorée"""
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _write_json_atomic(path: str, data: Any) -> None:
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def _succeeded(line: Dict[str, Any]) -> bool:
+    """Vrai pour une ligne de sortie portant une réponse HTTP 200"""
+    response = line.get('response')
+    return not line.get('error') and bool(response) and response.get('status_code', 200) == 200
+
+
+def _drop_partial_line(path: str) -> None:
+    """Tronque une dernière ligne sans fin de ligne (processus interrompu) avant de reprendre l'ajout"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+
+
+class OpenAIBatchBackend:
+    """API Batch d'OpenAI : fichier de requêtes téléversé, traité sous completion_window à tarif réduit"""
+
+    def __init__(self, client: 'OpenAI', completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    def submit(self, input_path: str, metadata: Dict[str, str]) -> str:
+        with open(input_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+            metadata=metadata
+        )
+        return batch.id
+
+    def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        batch = self.client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return {
+            'status': batch.status,
+            'request_counts': {
+                'total': getattr(counts, 'total', 0),
+                'completed': getattr(counts, 'completed', 0),
+                'failed': getattr(counts, 'failed', 0)
+            },
+            'output_file_id': batch.output_file_id,
+            'error_file_id': batch.error_file_id
+        }
+
+    def download(self, batch_id: str, status: Dict[str, Any], destination: str) -> None:
+        """Réponses puis erreurs du lot, concaténées dans destination (JSONL)"""
+        with open(destination, 'w', encoding='utf-8') as out:
+            for file_id in (status.get('output_file_id'), status.get('error_file_id')):
+                if file_id:
+                    text = self.client.files.content(file_id).text
+                    out.write(text if text.endswith('\n') or not text else text + '\n')
+
+
+class LocalBatchBackend:
+    """
+    Substitut fichier de l'API Batch, pour les tests et le serveur simulé.
+
+    Chaque lot est un répertoire (input.jsonl, output.jsonl, status.json) dont les
+    requêtes sont exécutées lors de la consultation de l'état, via un LLMClient sans
+    cache. Une consultation interrompue reprend après la dernière réponse écrite.
+    """
+
+    def __init__(self, directory: str, llm: LLMClient, max_workers: Optional[int] = None):
+        self.directory = directory
+        self.llm = llm
+        self.max_workers = max_workers or GENERATION_CONFIG["activity_concurrency"]
+
+    def submit(self, input_path: str, metadata: Dict[str, str]) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:16]}"
+        batch_dir = os.path.join(self.directory, batch_id)
+        os.makedirs(batch_dir)
+        shutil.copyfile(input_path, os.path.join(batch_dir, 'input.jsonl'))
+        total = sum(1 for _ in read_jsonl(input_path))
+        _write_json_atomic(os.path.join(batch_dir, 'status.json'), {
+            'status': 'validating', 'metadata': metadata,
+            'request_counts': {'total': total, 'completed': 0, 'failed': 0}
+        })
+        return batch_id
+
+    def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        batch_dir = os.path.join(self.directory, batch_id)
+        with open(os.path.join(batch_dir, 'status.json'), encoding='utf-8') as f:
+            status = json.load(f)
+        if status['status'] not in TERMINAL_STATUSES:
+            status = self._process(batch_dir, status)
+        return status
+
+    def download(self, batch_id: str, status: Dict[str, Any], destination: str) -> None:
+        shutil.copyfile(os.path.join(self.directory, batch_id, 'output.jsonl'), destination)
+
+    def _process(self, batch_dir: str, status: Dict[str, Any]) -> Dict[str, Any]:
+        output_path = os.path.join(batch_dir, 'output.jsonl')
+        done = {line['custom_id'] for line in read_jsonl(output_path)}
+        pending = [line for line in read_jsonl(os.path.join(batch_dir, 'input.jsonl')) if line['custom_id'] not in done]
+
+        status['status'] = 'in_progress'
+        _write_json_atomic(os.path.join(batch_dir, 'status.json'), status)
+
+        _drop_partial_line(output_path)
+        with open(output_path, 'a', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as pool:
+            futures = [pool.submit(self._execute, request) for request in pending]
+            for future in as_completed(futures):
+                out.write(json.dumps(future.result(), ensure_ascii=False) + '\n')
+                out.flush()
+
+        lines = list(read_jsonl(output_path))
+        failed = sum(1 for line in lines if line.get('error'))
+        status['status'] = 'completed'
+        status['request_counts'].update(completed=len(lines) - failed, failed=failed)
+        _write_json_atomic(os.path.join(batch_dir, 'status.json'), status)
+        return status
+
+    def _execute(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Ligne de sortie au format de l'API Batch pour une requête"""
+        line = {'id': f"batch_req_{uuid.uuid4().hex[:16]}", 'custom_id': request['custom_id'], 'response': None, 'error': None}
+        try:
+            result = self.llm.complete(**request['body'])
+        except Exception as e:
+            line['error'] = {'code': type(e).__name__, 'message': str(e)}
+            return line
+        line['response'] = {'status_code': 200, 'body': {
+            'object': 'chat.completion',
+            'model': request['body'].get('model'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': result['content']},
+                'finish_reason': result['finish_reason']
+            }],
+            'usage': {
+                'prompt_tokens': result['usage']['prompt_tokens'],
+                'completion_tokens': result['usage']['completion_tokens'],
+                'prompt_tokens_details': {'cached_tokens': result['usage']['cached_tokens']}
+            }
+        }}
+        return line
+
+
+def make_backend(llm: LLMClient, backend: Optional[str] = None) -> Union[OpenAIBatchBackend, LocalBatchBackend]:
+    """Backend de BATCH_CONFIG (ou celui nommé), sur le même serveur que llm"""
+    backend = backend or BATCH_CONFIG["backend"]
+    if backend == "local":
+        # Client sans cache : les réponses sont mises en cache et comptées par BatchRun
+        return LocalBatchBackend(
+            os.path.join(BATCH_CONFIG["directory"], "local"), LLMClient(llm.api_key, base_url=llm.base_url)
+        )
+    if backend == "openai":
+        return OpenAIBatchBackend(llm.client, BATCH_CONFIG["completion_window"])
+    raise ValueError(f"Backend de lot inconnu : {backend}")
+
+
+class BatchRun:
+    """
+    Génère les textes d'un ensemble d'écrans via l'API Batch, avec reprise.
+
+    Le répertoire du lot contient :
+    - requests.jsonl : une requête chat.completions par écran, custom_id dérivé de num_ecran ;
+    - state.json : identifiant du lot soumis et avancement, réécrit à chaque étape ;
+    - output.jsonl : réponses téléchargées, ajoutées à la fin de chaque lot ;
+    - requests.retry-N.jsonl : requêtes soumises à nouveau (sans réponse ou en erreur).
+
+    Relancer run() sur le même répertoire reprend à l'étape atteinte : un lot déjà
+    soumis n'est jamais soumis à nouveau. Si le lot précédent s'est terminé sans
+    réponse pour certains écrans (échec, expiration, annulation, erreurs), seuls
+    ceux-ci sont soumis dans un nouveau lot ; l'exécution n'est marquée complète
+    qu'une fois toutes les réponses obtenues. Les écrans dont la réponse est déjà
+    dans le cache ne sont pas envoyés (ils le sont au lot suivant si elle en a été
+    évincée depuis), et les réponses du lot alimentent le cache. L'usage d'une
+    réponse n'est compté qu'une fois (custom_id listés dans 'recorded').
+    """
+
+    def __init__(
+        self,
+        generator: ActivityGenerator,
+        directory: str,
+        backend: Union[None, str, OpenAIBatchBackend, LocalBatchBackend] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.generator = generator
+        self.directory = directory
+        self.backend = backend if backend is not None and not isinstance(backend, str) else make_backend(generator.llm, backend)
+        self.poll_interval = BATCH_CONFIG["poll_interval"] if poll_interval is None else poll_interval
+        self.requests_path = os.path.join(directory, 'requests.jsonl')
+        self.state_path = os.path.join(directory, 'state.json')
+        self.output_path = os.path.join(directory, 'output.jsonl')
+
+    @staticmethod
+    def default_directory(generator: ActivityGenerator, activities: List[Dict[str, Any]]) -> str:
+        """Répertoire déterminé par le générateur et les écrans : relancer la même sélection la reprend"""
+        digest = hashlib.sha256(json.dumps(
+            [generator.model, generator.text_field, generator.structured_output, activities],
+            sort_keys=True, ensure_ascii=False, default=str
+        ).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(BATCH_CONFIG["directory"], f"{generator.text_field}-{digest}")
+
+    def run(
+        self,
+        activities: List[Dict[str, Any]],
+        on_status: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Prépare, soumet et attend le lot, puis retourne les textes par custom_id
+        (num_ecran) : {'activite', <text_field>, 'error'}, dans l'ordre des écrans.
+        on_status reçoit l'état du lot à chaque consultation.
+        """
+        with get_tracer().run('lot', generator=self.generator.text_field, activities=len(activities)):
+            state = self._load_or_prepare(activities)
+            self._requeue_evicted(activities, state)
+
+            if state['requests'] and not state.get('complete'):
+                if state.get('batch_id') and state.get('downloaded'):
+                    # Reprise d'un lot terminé sans toutes ses réponses : nouveau lot pour les manquantes
+                    self._prepare_retry(state)
+
+                if state.get('input_path') and not state.get('batch_id'):
+                    state['batch_id'] = self.backend.submit(
+                        state['input_path'], {'generator': self.generator.text_field, 'directory': self.directory}
+                    )
+                    state.setdefault('batches', []).append(state['batch_id'])
+                    state['submitted_at'] = time.time()
+                    self._save(state)
+
+                if state.get('batch_id') and not state.get('downloaded'):
+                    with span('llm_total', batch_id=state['batch_id']):
+                        status = self._wait(state, on_status)
+                    self._append_output(state['batch_id'], status)
+                    state['downloaded'] = True
+                    state['complete'] = not self._missing()
+                    self._save(state)
+
+            return self._collect(activities, state)
+
+    def _requeue_evicted(self, activities: List[Dict[str, Any]], state: Dict[str, Any]) -> None:
+        """
+        Écrans marqués 'cached' dont la réponse a depuis quitté le cache : ajoutés à requests.jsonl
+        pour être soumis dans le prochain lot plutôt que générés un à un lors de la collecte
+        """
+        cached = set(state.get('cached', []))
+        if not cached:
+            return
+        evicted = []
+        with open(self.requests_path, 'a', encoding='utf-8') as f:
+            for custom_id, activity in zip(state['custom_ids'], activities):
+                if custom_id not in cached:
+                    continue
+                params = self.generator.completion_params(activity, activity.get('type_activite', 'text'))
+                if self.generator.llm.cached_response(params) is not None:
+                    continue
+                f.write(json.dumps({
+                    'custom_id': custom_id, 'method': 'POST', 'url': '/v1/chat/completions', 'body': params
+                }, ensure_ascii=False) + '\n')
+                evicted.append(custom_id)
+        if not evicted:
+            return
+        state['cached'] = [custom_id for custom_id in state['cached'] if custom_id not in evicted]
+        state['requests'] += len(evicted)
+        state['complete'] = False
+        self._save(state)
+        if not state.get('batch_id') and state.get('input_path') != self.requests_path:
+            # Lot de reprise préparé mais pas encore soumis : réécrit avec ces écrans
+            self._prepare_retry(state)
+
+    def _missing(self) -> List[str]:
+        """custom_id de requests.jsonl sans réponse réussie dans output.jsonl"""
+        answered = {line['custom_id'] for line in read_jsonl(self.output_path) if _succeeded(line)}
+        return [line['custom_id'] for line in read_jsonl(self.requests_path) if line['custom_id'] not in answered]
+
+    def _prepare_retry(self, state: Dict[str, Any]) -> None:
+        """Écrit les requêtes sans réponse dans un nouveau fichier à soumettre, ou marque l'exécution complète"""
+        missing = set(self._missing())
+        if not missing:
+            state['complete'] = True
+            self._save(state)
+            return
+        retry_path = os.path.join(self.directory, f"requests.retry-{len(state.get('batches', []))}.jsonl")
+        temporary = f"{retry_path}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            for line in read_jsonl(self.requests_path):
+                if line['custom_id'] in missing:
+                    f.write(json.dumps(line, ensure_ascii=False) + '\n')
+        os.replace(temporary, retry_path)
+        state.update(input_path=retry_path, batch_id=None, downloaded=False, status='prepared')
+        self._save(state)
+
+    def _append_output(self, batch_id: str, status: Dict[str, Any]) -> None:
+        """Ajoute les réponses du lot à output.jsonl (une réponse réussie n'est jamais remplacée)"""
+        temporary = f"{self.output_path}.tmp"
+        self.backend.download(batch_id, status, temporary)
+        _drop_partial_line(self.output_path)
+        with open(self.output_path, 'a', encoding='utf-8') as out:
+            for line in read_jsonl(temporary):
+                out.write(json.dumps(line, ensure_ascii=False) + '\n')
+        os.remove(temporary)
+
+    def _load_or_prepare(self, activities: List[Dict[str, Any]]) -> Dict[str, Any]:
+        custom_ids = screen_keys(activities)
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding='utf-8') as f:
+                state = json.load(f)
+            if state['custom_ids'] != custom_ids:
+                raise ValueError(f"Le répertoire {self.directory} contient le lot d'autres écrans")
+            # État écrit avant les nouvelles soumissions : un seul lot, sur requests.jsonl
+            state.setdefault('input_path', self.requests_path)
+            state.setdefault('batches', [state['batch_id']] if state.get('batch_id') else [])
+            return state
+
+        os.makedirs(self.directory, exist_ok=True)
+        cached = []
+        written = 0
+        temporary = f"{self.requests_path}.tmp"
+        with span('prompt_build', activities=len(activities)), open(temporary, 'w', encoding='utf-8') as f:
+            for custom_id, activity in zip(custom_ids, activities):
+                activity_type = activity.get('type_activite', 'text')
+                if activity_type not in self.generator.system_prompts():
+                    continue
+                params = self.generator.completion_params(activity, activity_type)
+                # Déjà payé lors d'une génération précédente : servi par le cache au moment des résultats
+                if self.generator.llm.cached_response(params) is not None:
+                    cached.append(custom_id)
+                    continue
+                f.write(json.dumps({
+                    'custom_id': custom_id, 'method': 'POST', 'url': '/v1/chat/completions', 'body': params
+                }, ensure_ascii=False) + '\n')
+                written += 1
+        os.replace(temporary, self.requests_path)
+
+        state = {
+            'generator': self.generator.text_field,
+            'custom_ids': custom_ids,
+            'requests': written,
+            'cached': cached,
+            'input_path': self.requests_path,
+            'batch_id': None,
+            'batches': [],
+            'status': 'prepared',
+            'downloaded': False,
+            'complete': False,
+            'created_at': time.time()
+        }
+        self._save(state)
+        return state
+
+    def _wait(self, state: Dict[str, Any], on_status: Optional[Callable[[Dict[str, Any]], None]]) -> Dict[str, Any]:
+        while True:
+            status = self.backend.retrieve(state['batch_id'])
+            if status['status'] != state.get('status'):
+                state['status'] = status['status']
+                state['request_counts'] = status.get('request_counts', {})
+                self._save(state)
+            if on_status is not None:
+                on_status(status)
+            if status['status'] in TERMINAL_STATUSES:
+                return status
+            time.sleep(self.poll_interval)
+
+    def _collect(self, activities: List[Dict[str, Any]], state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Textes par custom_id à partir des réponses téléchargées et du cache"""
+        generator = self.generator
+        requests = {line['custom_id']: line['body'] for line in read_jsonl(self.requests_path)}
+        responses: Dict[str, Dict[str, Any]] = {}
+        for line in read_jsonl(self.output_path):
+            # Plusieurs lots : la réponse réussie l'emporte sur les erreurs des lots précédents
+            if line['custom_id'] not in responses or not _succeeded(responses[line['custom_id']]):
+                responses[line['custom_id']] = line
+        cached = set(state.get('cached', []))
+        recorded = set(state.get('recorded', []))
+        results = {}
+
+        with span('parse', activities=len(activities)):
+            for custom_id, activity in zip(state['custom_ids'], activities):
+                activity_type = activity.get('type_activite', 'text')
+                entry = {'activite': activity, generator.text_field: None, 'error': None}
+                try:
+                    if custom_id in cached:
+                        params = generator.completion_params(activity, activity_type)
+                        result = generator.llm.cached_response(params)
+                        if result is None:
+                            entry['error'] = "Réponse évincée du cache ; relancer pour la soumettre dans un nouveau lot"
+                        else:
+                            entry[generator.text_field] = generator.decode_response(result, params)
+                    elif custom_id not in requests:
+                        entry['error'] = f"Type d'activité '{activity_type}' non supporté"
+                    elif custom_id not in responses:
+                        entry['error'] = (
+                            f"Absent des résultats du lot (état : {state.get('status')}) ; "
+                            "relancer pour le soumettre à nouveau"
+                        )
+                    elif responses[custom_id].get('error') or not responses[custom_id].get('response'):
+                        error = responses[custom_id].get('error') or {}
+                        entry['error'] = error.get('message', "Réponse vide")
+                    elif responses[custom_id]['response'].get('status_code', 200) != 200:
+                        body = responses[custom_id]['response'].get('body') or {}
+                        entry['error'] = (body.get('error') or {}).get('message', "Requête refusée")
+                    else:
+                        params = requests[custom_id]
+                        result = generator.llm.record_batch_response(
+                            params, responses[custom_id]['response']['body'], count_usage=custom_id not in recorded
+                        )
+                        recorded.add(custom_id)
+                        entry[generator.text_field] = generator.decode_response(result, params)
+                except Exception as e:
+                    entry['error'] = str(e)
+                results[custom_id] = entry
+
+        if len(recorded) != len(state.get('recorded', [])):
+            state['recorded'] = sorted(recorded)
+            self._save(state)
+        return results
+
+    def _save(self, state: Dict[str, Any]) -> None:
+        _write_json_atomic(self.state_path, state)
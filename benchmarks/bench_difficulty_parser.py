@@ -0,0 +1,128 @@
+"""
+Fuzz et performance du parseur d'évaluation de difficulté (objective_parser).
+
+Vérifie sur des entrées jusqu'à 10 Mo, valides, mal formées ou aléatoires, que :
+- l'analyse ne lève jamais d'exception ;
+- chaque bloc est soit analysé, soit signalé dans difficulty_failures (analysés + signalés = générés) ;
+- le temps d'analyse croît linéairement avec la taille de l'entrée.
+
+Usage : python benchmarks/bench_difficulty_parser.py [--size-mb 10] [--seed 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from objective_parser import parse_difficulty_evaluation
+
+VALID_BLOCK = (
+    "{num}. **Objectif : L'apprenant sera capable d'analyser les impacts du changement {num}.**\n"
+    "   - **Niveau de difficulté : {level}**\n"
+    "   - **Justification :** Cet objectif demande une analyse critique des sources.\n"
+    "   - **Temps nécessaire :** Environ {low}-{high} heures pour la recherche et la rédaction.\n"
+    "   - **Conseils :** Décomposer en sous-objectifs.\n\n"
+)
+
+# Mutations typiques des textes produits par un LLM
+MUTATIONS = (
+    lambda block: block.replace("**Niveau de difficulté : ", "**Niveau de difficulté : **"),
+    lambda block: block.replace("Niveau de difficulté", "Niveau difficulté"),
+    lambda block: block.replace("**", ""),
+    lambda block: block.replace(":", " :", 1),
+    lambda block: block.replace("\n", " ", 2),
+    lambda block: block[:len(block) // 2],
+    lambda block: block.replace("   - ", "* "),
+    lambda block: block.replace(".**\n", ".**" + "*" * 200 + "\n"),
+)
+
+# Fragments pathologiques pour les anciennes expressions régulières à base de .*?
+ADVERSARIAL = "1. **Objectif : " + "Niveau de difficulté : " * 50 + "Temps nécessaire : " * 50
+
+
+def build_input(target_bytes: int, malformed_rate: float, rng: random.Random) -> tuple:
+    """Construit un texte d'environ target_bytes octets ; retourne (texte, nombre de blocs)"""
+    parts = []
+    size = 0
+    blocks = 0
+
+    while size < target_bytes:
+        blocks += 1
+        low = rng.randint(1, 20)
+        block = VALID_BLOCK.format(num=blocks, level=rng.randint(2, 4), low=low, high=low + rng.randint(1, 10))
+
+        roll = rng.random()
+        if roll < malformed_rate:
+            block = rng.choice(MUTATIONS)(block)
+        elif roll < malformed_rate * 1.2:
+            block = ADVERSARIAL + "\n"
+
+        parts.append(block)
+        size += len(block.encode('utf-8'))
+
+    return ''.join(parts), blocks
+
+
+def random_noise(length: int, rng: random.Random) -> str:
+    alphabet = "0123456789.*:- \n\tNiveaudifcltéObjJusTmpsnécr**"
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def time_parse(text: str) -> tuple:
+    start = time.perf_counter()
+    analysis = parse_difficulty_evaluation(text)
+    return time.perf_counter() - start, analysis
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=10.0, help="Taille maximale de l'entrée (Mo)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-ratio', type=float, default=3.0,
+                        help="Écart toléré entre le coût par octet de la plus petite et de la plus grande entrée")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = []
+
+    # Fuzz : bruit aléatoire et blocs mutés ne doivent jamais lever d'exception
+    for _ in range(200):
+        text = random_noise(rng.randint(0, 5000), rng)
+        try:
+            parse_difficulty_evaluation(text)
+        except Exception as e:
+            failures.append(f"Exception sur bruit aléatoire : {e!r}")
+            break
+
+    # Performance : coût par octet stable de 1 % à 100 % de la taille cible
+    target = int(args.size_mb * 1024 * 1024)
+    per_byte = []
+    for fraction in (0.01, 0.1, 1.0):
+        text, blocks = build_input(max(1, int(target * fraction)), malformed_rate=0.2, rng=rng)
+        elapsed, analysis = time_parse(text)
+        parsed = len(analysis.difficulties)
+        reported = len(analysis.difficulty_failures)
+        per_byte.append(elapsed / len(text))
+
+        print(f"{len(text) / 1024 / 1024:8.2f} Mo  {blocks:8d} blocs  {parsed:8d} analysés  "
+              f"{reported:7d} signalés  {elapsed * 1000:9.1f} ms")
+
+        # Chaque bloc généré est analysé ou signalé, exactement une fois
+        if parsed + reported != blocks:
+            failures.append(f"Blocs analysés + signalés : {parsed + reported} pour {blocks} blocs générés")
+
+    ratio = per_byte[-1] / per_byte[0] if per_byte[0] else 0
+    print(f"Rapport coût/octet (grande / petite entrée) : {ratio:.2f}")
+    if ratio > args.max_ratio:
+        failures.append(f"Croissance non linéaire : rapport {ratio:.2f} > {args.max_ratio}")
+
+    for failure in failures:
+        print(f"ÉCHEC : {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
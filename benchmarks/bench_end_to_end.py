@@ -0,0 +1,135 @@
+"""
+Benchmark de bout en bout hors ligne : pipeline complet (séquenceur, scripts,
+prompts) contre le serveur simulé de mock_llm_server.py, sans réseau ni coût.
+
+Les fichiers d'entrée sont générés par synthetic_workload puis traités par
+cli.process_file, comme le ferait la commande pedagogical-sequencer. Le cache
+de réponses, le limiteur de débit et les points de reprise sont désactivés :
+chaque appel atteint le serveur. Mesures : débit (fichiers/min, écrans/s),
+percentiles du temps par fichier et de la latence des appels API (contrôleur de
+concurrence), compteurs du serveur (429 injectés, troncatures, continuations).
+
+Usage : python benchmarks/bench_end_to_end.py [--files 8] [--objectives 10] [--workers 4]
+        [--scripts] [--prompts] [--pack] [--latency lognormal:0.2,0.5] [--tokens-per-second 200]
+        [--error-rate 0.05] [--truncation-rate 0.1] [--output e2e.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CACHE_CONFIG, RATE_LIMIT_CONFIG, RUN_STORE_CONFIG
+
+# Avant la création des instances partagées par les générateurs
+CACHE_CONFIG["enabled"] = False
+RATE_LIMIT_CONFIG["enabled"] = False
+RUN_STORE_CONFIG["enabled"] = False
+
+from cli import process_file
+from concurrency_controller import get_default_controller
+from mock_llm_server import MockLLMServer
+from synthetic_workload import WorkloadGenerator
+
+
+def percentile(values: list, percent: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=8, help="Fichiers d'analyse traités (défaut : 8)")
+    parser.add_argument('--objectives', type=int, default=10, help="Objectifs par fichier (défaut : 10)")
+    parser.add_argument('--workers', type=int, default=4, help="Fichiers traités simultanément (défaut : 4)")
+    parser.add_argument('--mode', choices=['standard', 'mapreduce'], default='standard')
+    parser.add_argument('--scripts', action='store_true', help="Générer aussi les scripts")
+    parser.add_argument('--prompts', action='store_true', help="Générer aussi les prompts")
+    parser.add_argument('--pack', action='store_true', help="Plusieurs écrans de même type par requête")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', default='lognormal:0.2,0.5', help="Délai avant le premier token (serveur simulé)")
+    parser.add_argument('--tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Proportion de 429 injectés")
+    parser.add_argument('--truncation-rate', type=float, default=0.0, help="Proportion de réponses tronquées")
+    parser.add_argument('--retry-after', type=float, default=0.2, help="Retry-After des 429 (secondes)")
+    parser.add_argument('--output', default=None, help="Fichier JSON des résultats (défaut : sortie standard)")
+    args = parser.parse_args()
+
+    generator = WorkloadGenerator(seed=args.seed)
+    server = MockLLMServer(
+        seed=args.seed, latency=args.latency, tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate, truncation_rate=args.truncation_rate, retry_after=args.retry_after
+    )
+
+    with tempfile.TemporaryDirectory() as workdir, server:
+        paths = []
+        for index in range(args.files):
+            path = os.path.join(workdir, f"analyse_{index:04d}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(generator.generate_text_input(args.objectives, index), f, ensure_ascii=False)
+            paths.append(path)
+
+        output_dir = os.path.join(workdir, 'sortie')
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            reports = list(pool.map(
+                lambda path: process_file(
+                    path, output_dir, "sk-mock", args.mode, args.scripts, args.prompts, server.base_url,
+                    pack=args.pack
+                ),
+                paths
+            ))
+        elapsed = time.perf_counter() - start
+        server_stats = server.stats()
+
+    seconds = [report['seconds'] for report in reports]
+    screens = sum(report['screens'] for report in reports)
+    controller = get_default_controller()
+    api_metrics = controller.metrics() if controller is not None else {}
+
+    result = {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'parameters': vars(args),
+        'elapsed_seconds': round(elapsed, 3),
+        'files': len(reports),
+        'failed_files': sum(not report['success'] for report in reports),
+        'screens': screens,
+        'texts': sum(report['scripts'] + report['prompts'] for report in reports),
+        'activity_failures': sum(report['activity_failures'] for report in reports),
+        'files_per_minute': round(len(reports) / elapsed * 60, 2) if elapsed else 0.0,
+        'screens_per_second': round(screens / elapsed, 2) if elapsed else 0.0,
+        'file_seconds': {
+            'p50': round(percentile(seconds, 50), 3),
+            'p95': round(percentile(seconds, 95), 3),
+            'p99': round(percentile(seconds, 99), 3)
+        },
+        'api_latency_seconds': {
+            name: round(api_metrics.get(f'latency_{name}', 0.0), 3) for name in ('p50', 'p95', 'p99')
+        },
+        'concurrency_limit': api_metrics.get('limit'),
+        'server': server_stats,
+        'errors': [f"{report['file']} : {report['error']}" for report in reports if not report['success']]
+    }
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"{result['files']} fichiers, {screens} écrans en {elapsed:.1f} s "
+              f"({result['screens_per_second']} écrans/s, p99 fichier {result['file_seconds']['p99']} s)")
+    else:
+        print(output)
+    return 1 if result['failed_files'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Mesure le temps d'import des modules du cœur avec `python -X importtime`.
+
+Chaque module est importé dans un interpréteur neuf (plusieurs répétitions, médiane
+du temps cumulé). Deux régressions font échouer le benchmark (code de sortie 1) :
+- un temps cumulé supérieur au seuil du module (--max-ms pour le remplacer) ;
+- un module lourd (pandas, openai, numpy, tiktoken, xlsxwriter, plotly, streamlit)
+  chargé dès l'import, alors qu'il doit l'être au premier usage.
+
+Usage : python benchmarks/bench_import_time.py [module ...] [--repeat 5] [--max-ms 250] [--json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seuils de temps cumulé (ms), avec une marge large au-dessus des mesures de référence
+# (≈ 15 ms pour utils_v2, 60 à 80 ms pour les autres, contre 500 à 800 ms avant le chargement différé)
+THRESHOLDS_MS = {
+    'utils_v2': 100,
+    'llm_client': 250,
+    'script_generators': 250,
+    'pedagogical_sequencer_v2': 250,
+    'cli': 250,
+}
+
+HEAVY_MODULES = ('pandas', 'openai', 'numpy', 'tiktoken', 'xlsxwriter', 'plotly', 'streamlit')
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Temps cumulé (µs) de chaque module de premier niveau d'une trace -X importtime"""
+    cumulative = {}
+    for line in stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            cumulative.setdefault(match.group(4), int(match.group(2)))
+    return cumulative
+
+
+def measure(module: str, repeat: int) -> dict:
+    """Médiane du temps d'import du module et modules lourds chargés"""
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"import {module} a échoué :\n{result.stderr.strip().splitlines()[-1]}")
+        modules = parse_importtime(result.stderr)
+        timings.append(modules.get(module, 0) / 1000)
+        loaded.update(name for name in modules if name.split('.')[0] in HEAVY_MODULES)
+
+    return {
+        'median_ms': round(statistics.median(timings), 1),
+        'min_ms': round(min(timings), 1),
+        'heavy_modules': sorted({name.split('.')[0] for name in loaded})
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', help="Modules à mesurer (défaut : modules du cœur)")
+    parser.add_argument('--repeat', type=int, default=5, help="Imports par module (défaut : 5)")
+    parser.add_argument('--max-ms', type=float, default=None, help="Seuil commun remplaçant les seuils par module")
+    parser.add_argument('--json', action='store_true', help="Sortie JSON")
+    args = parser.parse_args()
+
+    modules = args.modules or list(THRESHOLDS_MS)
+    report = {}
+    failures = []
+    for module in modules:
+        result = measure(module, max(1, args.repeat))
+        threshold = args.max_ms if args.max_ms is not None else THRESHOLDS_MS.get(module, 250)
+        result['threshold_ms'] = threshold
+        report[module] = result
+
+        if result['median_ms'] > threshold:
+            failures.append(f"{module} : {result['median_ms']} ms > seuil {threshold} ms")
+        if result['heavy_modules']:
+            failures.append(f"{module} : import immédiat de {', '.join(result['heavy_modules'])}")
+
+    if args.json:
+        print(json.dumps({'results': report, 'failures': failures}, indent=2, ensure_ascii=False))
+    else:
+        print(f"{'module':<28}{'médiane':>10}{'min':>10}{'seuil':>10}  modules lourds")
+        for module, result in report.items():
+            print(f"{module:<28}{result['median_ms']:>8} ms{result['min_ms']:>7} ms"
+                  f"{result['threshold_ms']:>7} ms  {', '.join(result['heavy_modules']) or '-'}")
+        for failure in failures:
+            print(f"RÉGRESSION {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Micro-benchmarks du traitement local : analyse des entrées, enrichissement,
+statistiques et exports, sur des données synthétiques de trois tailles.
+
+- small  :     3 objectifs,      50 écrans
+- medium :   500 objectifs,   5 000 écrans
+- huge   : 5 000 objectifs, 100 000 écrans
+
+Aucun appel API : les données viennent de synthetic_workload (graine fixe) et les
+écrans n'ont pas d'« objectif_lie » pour que l'enrichissement passe par le
+rattachement aux objectifs.
+Chaque mesure est la médiane de --repeat exécutions. Les résultats sont écrits
+en JSON (--output) avec le commit courant ; --compare signale les régressions
+par rapport à un fichier de résultats précédent.
+
+Usage : python benchmarks/bench_pipeline.py [--sizes small,medium] [--repeat 3]
+        [--output bench.json] [--compare ancien.json] [--tolerance 1.25]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import LLMCache
+from pedagogical_sequencer_v2 import PedagogicalSequencerV2
+from synthetic_workload import WorkloadGenerator
+from utils_v2 import (
+    export_for_lms,
+    export_prompts_text,
+    export_scripts_markdown,
+    export_to_csv,
+    extract_bloom_progression,
+    extract_difficulty_matrix,
+    extract_temporal_sequence,
+    generate_activity_statistics,
+    write_texts_jsonl,
+    write_texts_zip
+)
+
+SIZES = {
+    'small': (3, 50),
+    'medium': (500, 5000),
+    'huge': (5000, 100000),
+}
+
+
+def synthetic_screens(generator: WorkloadGenerator, screen_count: int, objective_count: int) -> list:
+    """Écrans de séquenceur complets, sauf 'objectif_lie' (rattachement fait par l'enrichissement)"""
+    screens = generator.generate_sequencer(screen_count, objective_count)
+    for screen in screens:
+        del screen['objectif_lie']
+    return screens
+
+
+def synthetic_texts(screens: list, field: str) -> dict:
+    """Sorties générées au format des exports ({id: {'activite', field}})"""
+    return {
+        f"{screen['num_ecran']}_{screen['type_activite']}": {
+            'activite': screen,
+            field: f"## {screen['titre_ecran']}\n\n" + "Contenu pédagogique détaillé. " * 40
+        }
+        for screen in screens
+    }
+
+
+def timed(function, repeat: int) -> float:
+    """Médiane des durées (ms) de function() ; le GC est désactivé pendant la mesure"""
+    durations = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            function()
+            durations.append((time.perf_counter() - start) * 1000)
+        finally:
+            gc.enable()
+    return round(statistics.median(durations), 3)
+
+
+def export_to_file(writer, texts: dict, text_field: str, directory: str, binary: bool) -> None:
+    """Export en continu (write_texts_zip, write_texts_jsonl) vers un fichier temporaire"""
+    path = os.path.join(directory, f"{writer.__name__}.{text_field}")
+    with open(path, 'wb') if binary else open(path, 'w', encoding='utf-8') as f:
+        writer(texts, f, text_field)
+
+
+def run_size(objective_count: int, screen_count: int, repeat: int) -> dict:
+    """Mesures d'une taille de données"""
+    sequencer = PedagogicalSequencerV2("sk-benchmark-hors-ligne", cache=LLMCache())
+    generator = WorkloadGenerator(seed=0)
+    input_data = generator.generate_text_input(objective_count)
+    screens = synthetic_screens(generator, screen_count, objective_count)
+    analysis = sequencer._analyze_input_data(input_data)
+    enriched = sequencer._enrich_with_metadata(screens, analysis)
+    scripts = synthetic_texts(enriched, 'script')
+    prompts = synthetic_texts(enriched, 'prompt')
+
+    classification = input_data['classification']['classification']
+    formatted = input_data['formatted_objectives']['formatted_objectives']
+    difficulty = input_data['difficulty_evaluation']['difficulty_evaluation']
+
+    benchmarks = {
+        'analyze_input_data': lambda: sequencer._analyze_input_data(input_data),
+        'extract_bloom_progression': lambda: extract_bloom_progression(classification),
+        'extract_temporal_sequence': lambda: extract_temporal_sequence(formatted),
+        'extract_difficulty_matrix': lambda: extract_difficulty_matrix(difficulty),
+        'enrich_with_metadata': lambda: sequencer._enrich_with_metadata(screens, analysis),
+        'generate_activity_statistics': lambda: generate_activity_statistics(enriched),
+        'export_to_csv': lambda: export_to_csv(enriched),
+        'export_for_lms': lambda: export_for_lms(enriched),
+        'export_scripts_markdown': lambda: export_scripts_markdown(scripts),
+        'export_prompts_text': lambda: export_prompts_text(prompts),
+        'write_texts_zip': lambda: export_to_file(write_texts_zip, scripts, 'script', workdir, binary=True),
+        'write_texts_jsonl': lambda: export_to_file(write_texts_jsonl, scripts, 'script', workdir, binary=False),
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, function in benchmarks.items():
+            results[name] = timed(function, repeat)
+            print(f"  {name:<30}{results[name]:>12.3f} ms", file=sys.stderr)
+    return {'objectives': objective_count, 'screens': screen_count, 'timings_ms': results}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+        ).stdout.strip() or 'inconnu'
+    except OSError:
+        return 'inconnu'
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Mesures plus lentes que baseline × tolerance"""
+    regressions = []
+    for size, result in report['results'].items():
+        previous = baseline.get('results', {}).get(size, {}).get('timings_ms', {})
+        for name, value in result['timings_ms'].items():
+            reference = previous.get(name)
+            # Les mesures sous la milliseconde sont trop bruitées pour être comparées
+            if reference and max(value, reference) >= 1.0 and value > reference * tolerance:
+                regressions.append(f"{size}/{name} : {reference} ms -> {value} ms (×{value / reference:.2f})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='small,medium,huge', help="Tailles à mesurer (défaut : toutes)")
+    parser.add_argument('--repeat', type=int, default=3, help="Exécutions par mesure (défaut : 3)")
+    parser.add_argument('--output', default=None, help="Fichier JSON des résultats (défaut : sortie standard)")
+    parser.add_argument('--compare', default=None, help="Résultats de référence (JSON) à comparer")
+    parser.add_argument('--tolerance', type=float, default=1.25, help="Ralentissement toléré (défaut : 1.25)")
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"tailles inconnues : {', '.join(unknown)} (choix : {', '.join(SIZES)})")
+
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'results': {}
+    }
+    for size in sizes:
+        print(f"{size} : {SIZES[size][0]} objectifs, {SIZES[size][1]} écrans", file=sys.stderr)
+        report['results'][size] = run_size(*SIZES[size], repeat=max(1, args.repeat))
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"RÉGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Mesure les tokens d'entrée du prompt du séquenceur selon l'encodage choisi.
+
+Compare l'encodage historique (JSON indenté + extraits bruts) à l'encodage compact
+(tableau d'objectifs référencés par identifiant, JSON minifié, sans indentation),
+avec ou sans extraits. Le comptage utilise tiktoken s'il est installé, sinon une
+estimation de ~4 caractères par token.
+
+Usage : python benchmarks/measure_prompt_tokens.py [fichier.json ...] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import LLMCache
+from pedagogical_sequencer_v2 import PedagogicalSequencerV2
+from prompt_encoding import count_message_tokens, is_exact_count
+from utils_v2 import create_sample_json
+
+VARIANTS = (
+    ('verbeux + extraits', False, True),
+    ('verbeux sans extraits', False, False),
+    ('compact + extraits', True, True),
+    ('compact sans extraits', True, False),
+)
+
+
+def measure(input_data, model: str) -> dict:
+    """Tokens d'entrée (system + user) pour chaque variante d'encodage"""
+    results = {}
+    for label, compact, excerpts in VARIANTS:
+        sequencer = PedagogicalSequencerV2(
+            "sk-mesure-hors-ligne", cache=LLMCache(), compact_prompt=compact, include_excerpts=excerpts
+        )
+        _, messages = sequencer._prepare_request(input_data)
+        results[label] = {
+            'system': count_message_tokens(messages[:1], model),
+            'total': count_message_tokens(messages, model)
+        }
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help="Fichiers d'analyse JSON (défaut : exemple intégré)")
+    parser.add_argument('--model', default='gpt-4o-mini')
+    parser.add_argument('--json', action='store_true', help="Sortie JSON")
+    args = parser.parse_args()
+
+    inputs = [(path, json.load(open(path, encoding='utf-8'))) for path in args.files]
+    if not inputs:
+        inputs = [('exemple intégré', create_sample_json())]
+
+    report = {name: measure(data, args.model) for name, data in inputs}
+
+    if args.json:
+        print(json.dumps({'exact': is_exact_count(args.model), 'results': report}, indent=2, ensure_ascii=False))
+        return 0
+
+    if not is_exact_count(args.model):
+        print("(tokenizer indisponible : estimation à ~4 caractères par token)")
+
+    for name, results in report.items():
+        baseline = results[VARIANTS[0][0]]['total']
+        print(f"\n{name}")
+        for label, counts in results.items():
+            saving = (1 - counts['total'] / baseline) * 100 if baseline else 0
+            print(f"  {label:<24} {counts['total']:7d} tokens (system {counts['system']:5d})  {saving:+6.1f} %")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,359 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from config import RATE_LIMIT_CONFIG
+from objective_parser import parse_input_data
+from pedagogical_sequencer_v2 import PedagogicalSequencerV2
+from run_store import RunStore, get_default_run_store, make_run_id
+from script_generators import ActivityGenerator, PromptGenerator, ScriptGenerator
+from tracing import STAGE_LABELS, configure_tracing, get_tracer, span
+from utils_v2 import load_json_file, validate_new_format_data
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Arguments de la commande pedagogical-sequencer"""
+    parser = argparse.ArgumentParser(
+        prog="pedagogical-sequencer",
+        description="Génère séquenceurs, scripts et prompts pour un répertoire de fichiers d'analyse JSON, sans interface."
+    )
+    parser.add_argument("input_dir", help="Répertoire des fichiers d'analyse d'objectifs (JSON)")
+    parser.add_argument("-o", "--output-dir", default="output", help="Répertoire de sortie (défaut : output)")
+    parser.add_argument("--pattern", default="*.json", help="Motif des fichiers d'entrée (défaut : *.json)")
+    parser.add_argument(
+        "--mode", choices=["standard", "mapreduce"], default="standard",
+        help="standard : un appel par séquenceur ; mapreduce : plan puis séquences en parallèle"
+    )
+    parser.add_argument("--scripts", action="store_true", help="Générer aussi les scripts de chaque écran")
+    parser.add_argument("--prompts", action="store_true", help="Générer aussi les prompts de chaque écran")
+    parser.add_argument("--workers", type=int, default=4, help="Fichiers traités simultanément (défaut : 4)")
+    parser.add_argument(
+        "--pool", choices=["process", "thread"], default="process",
+        help="Pool de processus (défaut) ou de threads"
+    )
+    parser.add_argument("--api-key", default=None, help="Clé API OpenAI (défaut : variable OPENAI_API_KEY)")
+    parser.add_argument(
+        "--base-url", default=None,
+        help="Serveur compatible OpenAI à utiliser, ex. http://127.0.0.1:8765/v1 (mock_llm_server.py)"
+    )
+    generation = parser.add_mutually_exclusive_group()
+    generation.add_argument(
+        "--batch", action="store_true",
+        help="Scripts et prompts via l'API Batch (résultats sous 24 h, coût réduit) ; relancer reprend les lots en cours"
+    )
+    generation.add_argument(
+        "--pack", action="store_true",
+        help="Scripts et prompts de plusieurs écrans de même type par requête (PACKING_CONFIG)"
+    )
+    parser.add_argument(
+        "--no-rate-limit", action="store_true",
+        help="Désactiver le limiteur de débit partagé (RATE_LIMIT_CONFIG), déjà ignoré avec --base-url"
+    )
+    parser.add_argument(
+        "--fresh", action="store_true",
+        help="Régénérer : ignorer les séquenceurs, scripts et prompts enregistrés (RUN_STORE_CONFIG) et le cache de réponses"
+    )
+    parser.add_argument("--trace", default=None, help="Trace JSONL des étapes mesurées (ajout en fin de fichier)")
+    parser.add_argument(
+        "--metrics", default=None,
+        help="Fichier texte Prometheus des cumuls ; avec le pool de processus, un fichier par worker ({pid})"
+    )
+    return parser
+
+
+def process_file(
+    path: str,
+    output_dir: str,
+    api_key: str,
+    mode: str = "standard",
+    scripts: bool = False,
+    prompts: bool = False,
+    base_url: Optional[str] = None,
+    batch: bool = False,
+    pack: bool = False,
+    fresh: bool = False
+) -> Dict[str, Any]:
+    """
+    Traite un fichier d'analyse : séquenceur, puis scripts et prompts de ses écrans.
+    Exécuté dans un worker ; retourne un compte rendu sérialisable, sans lever d'exception.
+    Les temps par étape et les tokens de tout le fichier sont réunis dans une exécution 'fichier'.
+    Le séquenceur et chaque écran terminé sont enregistrés (run_store) : relancer la commande
+    après une interruption ne régénère que ce qui manque, sauf avec fresh.
+    """
+    start = time.perf_counter()
+    report = {
+        'file': path, 'success': False, 'screens': 0, 'scripts': 0, 'prompts': 0,
+        'activity_failures': 0, 'warnings': [], 'error': None, 'seconds': 0.0, 'usage': {},
+        'stages': {}, 'tokens': {}, 'resumed': 0
+    }
+
+    with get_tracer().run('fichier', file=path) as trace_run:
+        _process_file(report, path, output_dir, api_key, mode, scripts, prompts, base_url, batch, pack, fresh)
+
+    if trace_run is not None:
+        summary = trace_run.summary()
+        report['stages'] = summary['stages']
+        report['tokens'] = summary['tokens']
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def _process_file(
+    report: Dict[str, Any],
+    path: str,
+    output_dir: str,
+    api_key: str,
+    mode: str,
+    scripts: bool,
+    prompts: bool,
+    base_url: Optional[str],
+    batch: bool,
+    pack: bool,
+    fresh: bool
+) -> None:
+    stem = Path(path).stem
+    store = get_default_run_store()
+    # Un lot par fichier et par générateur, sous le répertoire de sortie (reprise à la relance)
+    batch_dir = Path(output_dir) / ".batches" if batch else None
+    try:
+        with open(path, 'rb') as f:
+            input_data = load_json_file(f)
+
+        parsed = parse_input_data(input_data)
+        is_valid, validation_errors, _ = validate_new_format_data(input_data, parsed)
+        if not is_valid:
+            raise ValueError("Format invalide : " + " ; ".join(validation_errors))
+
+        sequencer = PedagogicalSequencerV2(api_key, base_url=base_url, refresh=fresh)
+        run_id = _start_run(store, 'sequenceur', [input_data, mode], 1, stem, fresh)
+        sequencer_data = store.get_item(run_id, 'sequencer') if store is not None else None
+        if sequencer_data:
+            report['resumed'] += 1
+        else:
+            if mode == "mapreduce":
+                sequencer_data = sequencer.generate_sequencer_mapreduce(input_data, parsed=parsed)
+            else:
+                sequencer_data = sequencer.generate_sequencer(input_data, parsed)
+            report['warnings'].extend(sequencer.generation_warnings)
+            if not sequencer_data:
+                raise RuntimeError(sequencer.last_error or "Aucun écran généré")
+            if store is not None:
+                store.save_item(run_id, 'sequencer', sequencer_data)
+                store.finish_run(run_id)
+
+        _write_json(Path(output_dir) / f"{stem}.sequencer.json", sequencer_data)
+        report['screens'] = len(sequencer_data)
+        report['usage'] = sequencer.llm.usage_stats()
+
+        if scripts:
+            generated, failures = _generate_for_screens(
+                ScriptGenerator(api_key, base_url=base_url, refresh=fresh), sequencer_data,
+                batch_dir / f"{stem}.scripts" if batch_dir else None, pack, store, stem, fresh, report
+            )
+            _write_json(Path(output_dir) / f"{stem}.scripts.json", {
+                "metadata": _export_metadata(generated, "nombre_scripts"),
+                "scripts": {key: {'activite': activity, 'script': text} for key, (activity, text) in generated.items()}
+            })
+            report['scripts'] = len(generated)
+            report['activity_failures'] += len(failures)
+            report['warnings'].extend(failures)
+
+        if prompts:
+            generated, failures = _generate_for_screens(
+                PromptGenerator(api_key, base_url=base_url, refresh=fresh), sequencer_data,
+                batch_dir / f"{stem}.prompts" if batch_dir else None, pack, store, stem, fresh, report
+            )
+            _write_json(Path(output_dir) / f"{stem}.prompts.json", {
+                "metadata": _export_metadata(generated, "nombre_prompts"),
+                "prompts": {
+                    key: {'activite_info': activity, 'prompt_ready_to_use': text}
+                    for key, (activity, text) in generated.items()
+                }
+            })
+            report['prompts'] = len(generated)
+            report['activity_failures'] += len(failures)
+            report['warnings'].extend(failures)
+
+        report['success'] = True
+    except Exception as e:
+        report['error'] = str(e)
+
+
+def _generate_for_screens(
+    generator: ActivityGenerator,
+    sequencer_data: List[Dict[str, Any]],
+    batch_dir: Optional[Path] = None,
+    pack: bool = False,
+    store: Optional[RunStore] = None,
+    label: Optional[str] = None,
+    fresh: bool = False,
+    report: Optional[Dict[str, Any]] = None
+) -> tuple:
+    """
+    Texte de chaque écran, en parallèle (regroupés par type si pack) ou via l'API Batch (batch_dir) ;
+    un échec n'interrompt pas les autres écrans. Hors API Batch (qui a sa propre reprise),
+    chaque écran terminé est enregistré dans store et les écrans déjà enregistrés sont repris.
+    """
+    keys = [
+        f"{activity.get('num_ecran', f'Act{index + 1}')}_{activity.get('type_activite', 'text')}"
+        for index, activity in enumerate(sequencer_data)
+    ]
+    if batch_dir is not None:
+        entries = generator.generate_batch_offline(sequencer_data, directory=str(batch_dir)).values()
+        outcomes = (
+            (index, entry[generator.text_field], entry['error']) for index, entry in enumerate(entries)
+        )
+    else:
+        run_id = _start_run(
+            store, generator.text_field,
+            [generator.model, generator.structured_output, sequencer_data], len(sequencer_data), label, fresh
+        )
+        if store is not None and report is not None:
+            report['resumed'] += len(store.completed(run_id))
+        outcomes = generator.generate_many(sequencer_data, packed=pack, store=store, run_id=run_id)
+
+    texts = {}
+    failures = []
+    for index, text, error in outcomes:
+        if error is None:
+            texts[index] = text
+        else:
+            failures.append(f"{keys[index]} : {error}")
+    if store is not None and batch_dir is None:
+        store.finish_run(run_id, 'completed' if not failures else 'partial')
+    # Ordre du séquenceur, quel que soit l'ordre d'achèvement
+    generated = {keys[index]: (sequencer_data[index], texts[index]) for index in sorted(texts)}
+    return generated, failures
+
+
+def _start_run(store: Optional[RunStore], kind: str, payload: Any, total: int, label: Optional[str], fresh: bool) -> str:
+    """Identifiant de l'exécution (déterminé par ses entrées) ; fresh efface ce qui avait été enregistré"""
+    run_id = make_run_id(kind, payload)
+    if store is not None:
+        if fresh:
+            store.delete_run(run_id)
+        store.start_run(kind, total, run_id, label=label)
+    return run_id
+
+
+def _export_metadata(generated: Dict[str, tuple], count_key: str) -> Dict[str, Any]:
+    return {
+        "date_generation": datetime.now().isoformat(),
+        count_key: len(generated),
+        "types_activites": sorted({activity.get('type_activite') for activity, _ in generated.values()})
+    }
+
+
+def _write_json(path: Path, data: Any) -> None:
+    with span('export', file=path.name):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def print_summary(reports: List[Dict[str, Any]], elapsed: float) -> None:
+    """Débit et échecs du lot"""
+    succeeded = [r for r in reports if r['success']]
+    failed = [r for r in reports if not r['success']]
+    screens = sum(r['screens'] for r in reports)
+    texts = sum(r['scripts'] + r['prompts'] for r in reports)
+    prompt_tokens = sum(r['usage'].get('prompt_tokens', 0) for r in reports)
+    completion_tokens = sum(r['usage'].get('completion_tokens', 0) for r in reports)
+
+    print()
+    print(f"Fichiers : {len(reports)} · réussis : {len(succeeded)} · échoués : {len(failed)}")
+    print(f"Écrans : {screens} · scripts/prompts : {texts} · "
+          f"échecs par écran : {sum(r['activity_failures'] for r in reports)}")
+    if elapsed > 0:
+        print(f"Durée : {elapsed:.1f} s · débit : {len(reports) / elapsed * 60:.1f} fichiers/min, "
+              f"{screens / elapsed:.2f} écrans/s")
+    if reports:
+        latencies = sorted(r['seconds'] for r in reports)
+        print(f"Temps par fichier : médiane {latencies[len(latencies) // 2]:.1f} s · max {latencies[-1]:.1f} s")
+    print(f"Tokens du séquenceur : {prompt_tokens} en entrée, {completion_tokens} en sortie")
+    resumed = sum(r['resumed'] for r in reports)
+    if resumed:
+        print(f"Repris d'une exécution précédente : {resumed} séquenceur(s), scripts ou prompts (sans appel API)")
+
+    stages: Dict[str, float] = {}
+    for report in reports:
+        for stage, totals in report['stages'].items():
+            stages[stage] = stages.get(stage, 0.0) + totals['seconds']
+    if stages:
+        # Temps cumulés sur les fichiers (les étapes concurrentes s'additionnent)
+        print("Temps par étape : " + " · ".join(
+            f"{STAGE_LABELS.get(stage, stage)} {seconds:.1f} s" for stage, seconds in stages.items()
+        ))
+
+    for report in failed:
+        print(f"ÉCHEC {report['file']} : {report['error']}")
+
+
+def configure_worker(trace_path: Optional[str], metrics_path: Optional[str], rate_limit: bool) -> None:
+    """Configure la trace, les métriques et le limiteur de débit du processus principal et de chaque worker"""
+    RATE_LIMIT_CONFIG["enabled"] = RATE_LIMIT_CONFIG["enabled"] and rate_limit
+    configure_tracing(trace_path, metrics_path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    api_key = args.api_key or os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        print("Clé API manquante : --api-key ou variable OPENAI_API_KEY", file=sys.stderr)
+        return 2
+
+    files = sorted(str(path) for path in Path(args.input_dir).glob(args.pattern) if path.is_file())
+    if not files:
+        print(f"Aucun fichier {args.pattern} dans {args.input_dir}", file=sys.stderr)
+        return 2
+
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    pool_class = ProcessPoolExecutor if args.pool == "process" else ThreadPoolExecutor
+
+    metrics_path = args.metrics
+    if metrics_path and args.pool == "process" and "{pid}" not in metrics_path:
+        # Chaque processus a ses propres cumuls : un fichier par worker, agrégés par Prometheus
+        root, extension = os.path.splitext(metrics_path)
+        metrics_path = f"{root}.{{pid}}{extension}"
+    configure_worker(args.trace, metrics_path, not args.no_rate_limit)
+
+    start = time.perf_counter()
+    reports = []
+    # Les threads partagent le collecteur du processus ; les processus configurent le leur
+    pool_options = {}
+    if args.pool == "process":
+        pool_options = {'initializer': configure_worker, 'initargs': (args.trace, metrics_path, not args.no_rate_limit)}
+    with pool_class(max_workers=max(1, args.workers), **pool_options) as pool:
+        futures = [
+            pool.submit(
+                process_file, path, args.output_dir, api_key, args.mode, args.scripts, args.prompts,
+                args.base_url, args.batch, args.pack, args.fresh
+            )
+            for path in files
+        ]
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            status = "ok" if report['success'] else "échec"
+            print(f"[{len(reports)}/{len(files)}] {report['file']} : {status} "
+                  f"({report['screens']} écrans, {report['seconds']:.1f} s)")
+
+    print_summary(reports, time.perf_counter() - start)
+    return 0 if all(r['success'] for r in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
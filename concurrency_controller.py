@@ -0,0 +1,171 @@
+import asyncio
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Any, AsyncIterator, Deque, Iterator, List, Optional, Tuple
+
+from config import CONCURRENCY_CONFIG
+from request_executor import is_overload_error
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))
+    return sorted_values[index]
+
+
+class ConcurrencyController:
+    """
+    Limite adaptative du nombre d'appels API simultanés (AIMD).
+
+    - augmentation additive : chaque succès à latence saine ajoute 1/limite, soit
+      environ +1 par « tour » complet de requêtes en vol ;
+    - diminution multiplicative : un 429 ou un délai dépassé multiplie la limite
+      par decrease_factor, au plus une fois par période de cooldown pour qu'une
+      rafale d'erreurs d'un même tour ne l'effondre pas ;
+    - une latence supérieure à latency_tolerance × médiane récente gèle la hausse.
+
+    Les créneaux sont partagés entre threads (slot) et coroutines (aslot).
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        cooldown_seconds: float = 2.0,
+        window: int = 200
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.cooldown_seconds = cooldown_seconds
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._last_decrease = 0.0
+
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._completions: Deque[float] = deque(maxlen=window)
+        self._counters = {'completed': 0, 'overloads': 0, 'errors': 0, 'increases': 0, 'decreases': 0}
+
+    @classmethod
+    def from_config(cls) -> 'ConcurrencyController':
+        """Contrôleur paramétré par CONCURRENCY_CONFIG"""
+        return cls(**{key: value for key, value in CONCURRENCY_CONFIG.items() if key != 'enabled'})
+
+    @property
+    def limit(self) -> int:
+        """Nombre maximal d'appels en vol"""
+        return max(self.min_limit, int(self._limit))
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Occupe un créneau (bloquant) le temps de l'appel"""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        """Occupe un créneau sans bloquer la boucle d'événements"""
+        while True:
+            with self._condition:
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    break
+                future = asyncio.get_running_loop().create_future()
+                self._async_waiters.append((asyncio.get_running_loop(), future))
+            await future
+        try:
+            yield
+        finally:
+            self._release()
+
+    def record(self, latency: float, error: Optional[Exception] = None) -> None:
+        """Ajuste la limite selon l'issue d'un appel"""
+        with self._condition:
+            now = time.time()
+            if error is None:
+                healthy = self._is_healthy(latency)
+                self._latencies.append(latency)
+                self._completions.append(now)
+                self._counters['completed'] += 1
+                if healthy and self._limit < self.max_limit:
+                    self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+                    self._counters['increases'] += 1
+                    self._wake_waiters()
+            elif is_overload_error(error):
+                self._counters['overloads'] += 1
+                if now - self._last_decrease >= self.cooldown_seconds:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self._counters['decreases'] += 1
+            else:
+                self._counters['errors'] += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        """Limite courante, appels en vol, débit (appels/s) et percentiles de latence (s)"""
+        with self._condition:
+            latencies = sorted(self._latencies)
+            completions = list(self._completions)
+            metrics = dict(self._counters, limit=self.limit, in_flight=self._in_flight)
+
+        span = completions[-1] - completions[0] if len(completions) > 1 else 0.0
+        metrics['throughput'] = (len(completions) - 1) / span if span > 0 else 0.0
+        metrics['latency_p50'] = _percentile(latencies, 50)
+        metrics['latency_p95'] = _percentile(latencies, 95)
+        metrics['latency_p99'] = _percentile(latencies, 99)
+        return metrics
+
+    def _is_healthy(self, latency: float) -> bool:
+        if len(self._latencies) < 10:
+            return True
+        return latency <= self.latency_tolerance * statistics.median(self._latencies)
+
+    def _release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        """Réveille threads et coroutines en attente ; ils revérifient la limite (verrou tenu)"""
+        self._condition.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # Boucle déjà fermée : la coroutine en attente n'existe plus
+                pass
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_default_controller: Optional[ConcurrencyController] = None
+
+
+def get_default_controller() -> Optional[ConcurrencyController]:
+    """Contrôleur partagé par les générateurs du processus (None si désactivé)"""
+    global _default_controller
+    if not CONCURRENCY_CONFIG.get("enabled", True):
+        return None
+    if _default_controller is None:
+        _default_controller = ConcurrencyController.from_config()
+    return _default_controller
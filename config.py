@@ -13,6 +13,95 @@ OPENAI_CONFIG = {
     "max_tokens": 3000
 }
 
+# Cache des réponses LLM (partagé par les trois générateurs)
+CACHE_CONFIG = {
+    "enabled": True,
+    "path": ".llm_cache.sqlite3",
+    "max_memory_entries": 256,
+    "max_disk_entries": 5000,
+    "ttl_seconds": 7 * 24 * 3600
+}
+
+# Encodage des prompts du séquenceur
+PROMPT_CONFIG = {
+    "compact": False,          # Tableau d'objectifs et JSON minifié au lieu de json.dumps(indent=2)
+    "include_excerpts": True,  # Extraits bruts (500 caractères) des textes d'entrée
+    "structured_output": True  # Sortie contrainte par JSON Schema (sequencer_schema.py)
+}
+
+# Exécution des appels API : délais, nouvelles tentatives et hedging (request_executor.py)
+REQUEST_CONFIG = {
+    "timeout": 120.0,          # Délai maximal d'un appel (secondes)
+    "max_retries": 4,          # Nouvelles tentatives sur 429, 5xx et délais dépassés
+    "backoff_base": 1.0,       # Backoff exponentiel : base * 2^tentative, gigue complète
+    "backoff_max": 30.0,
+    "hedging": True,           # Doubler un appel qui dépasse le budget de latence
+    "hedge_percentile": 95,    # Budget = ce percentile des latences observées
+    "hedge_min_samples": 20,   # Pas de hedging tant que l'historique est plus court
+    "hedge_min_delay": 2.0,    # Jamais de hedge avant ce délai (secondes)
+    "latency_window": 200      # Latences conservées par (modèle, max_tokens)
+}
+
+# Limiteur de débit partagé entre threads et processus (rate_limiter.py)
+# Limites de l'organisation par modèle, à ajuster selon le palier du compte OpenAI
+RATE_LIMIT_CONFIG = {
+    "enabled": True,
+    "path": ".llm_ratelimit.sqlite3",   # État des seaux partagé par les processus
+    "burst_seconds": 10.0,              # Capacité des seaux en secondes de débit
+    "limits": {
+        "gpt-4o-mini": {"requests_per_minute": 500, "tokens_per_minute": 200000},
+        "gpt-4o": {"requests_per_minute": 500, "tokens_per_minute": 30000}
+    },
+    "default_limits": {"requests_per_minute": 500, "tokens_per_minute": 30000}
+}
+
+# Contrôle adaptatif (AIMD) du nombre d'appels API simultanés (concurrency_controller.py)
+CONCURRENCY_CONFIG = {
+    "enabled": True,
+    "initial_limit": 4,
+    "min_limit": 1,
+    "max_limit": 64,
+    "decrease_factor": 0.5,     # Limite multipliée par ce facteur sur 429 ou délai dépassé
+    "latency_tolerance": 2.0,   # Pas de hausse si latence > tolérance × médiane récente
+    "cooldown_seconds": 2.0,    # Au plus une baisse par période
+    "window": 200               # Appels retenus pour les percentiles et le débit
+}
+
+# Reprise des réponses tronquées par max_tokens (finish_reason == "length")
+GENERATION_CONFIG = {
+    "max_continuations": 3,    # Requêtes de continuation au plus par génération
+    "activity_concurrency": 8  # Écrans générés simultanément (scripts, prompts)
+}
+
+# Regroupement de plusieurs écrans de même type par requête (scripts, prompts)
+PACKING_CONFIG = {
+    "max_screens": 8,           # Écrans au plus par requête
+    "max_input_tokens": 8000,   # Prompt système, consignes et données des écrans
+    "max_output_tokens": 16000  # Sortie du groupe (max_tokens du générateur par écran)
+}
+
+# Génération hors ligne des scripts et prompts via l'API Batch (batch_runner.py)
+BATCH_CONFIG = {
+    "backend": "openai",            # "openai" : API Batch ; "local" : substitut fichier (tests, serveur simulé)
+    "directory": ".batch_runs",     # Répertoire des lots (requêtes, état, résultats)
+    "completion_window": "24h",
+    "poll_interval": 60.0           # Secondes entre deux consultations de l'état du lot
+}
+
+# Points de reprise des générations (run_store.py) : chaque élément terminé est enregistré
+RUN_STORE_CONFIG = {
+    "enabled": True,
+    "path": ".runs.sqlite3"         # Base SQLite des exécutions (séquenceurs, scripts, prompts)
+}
+
+# Mesure du temps par étape et des tokens de chaque génération (tracing.py)
+TRACE_CONFIG = {
+    "enabled": True,
+    "jsonl_path": None,         # Trace JSONL des étapes et des exécutions (None : pas de fichier)
+    "prometheus_path": None,    # Fichier texte Prometheus ; "{pid}" est remplacé par le processus
+    "max_runs": 50              # Exécutions conservées en mémoire pour l'API Python
+}
+
 # Taxonomie de Bloom - Niveaux et descriptions
 BLOOM_TAXONOMY = {
     "se_souvenir": {
@@ -0,0 +1,179 @@
+import json
+from typing import Dict, List, Any
+
+
+class IncrementalJSONArrayParser:
+    """
+    Parseur incrémental d'un tableau JSON d'objets reçu par morceaux.
+
+    Le texte est ignoré jusqu'au premier '[' (préambule, balises ```json, objet
+    englobant du type {"ecrans": [...]}), puis chaque objet du tableau est
+    décodé dès que son accolade fermante arrive. Chaque caractère n'est examiné
+    qu'une seule fois : le coût total est linéaire dans la taille de la réponse.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._current: List[str] = []
+        self.consumed = 0
+        self.last_complete_offset = 0
+        self.errors: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        """Vrai une fois le crochet fermant du tableau reçu"""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Ajoute un morceau de texte et retourne les objets complétés par ce morceau"""
+        completed = []
+
+        for char in chunk:
+            self.consumed += 1
+
+            if self._finished:
+                continue
+
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                # Entre deux objets du tableau : seuls '{' et ']' sont significatifs
+                if char == '{':
+                    self._depth = 1
+                    self._current = [char]
+                elif char == ']':
+                    self._finished = True
+                continue
+
+            self._current.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._decode(''.join(self._current))
+                    self._current = []
+                    self.last_complete_offset = self.consumed
+                    if obj is not None:
+                        completed.append(obj)
+
+        return completed
+
+    def _decode(self, text: str) -> Any:
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError as e:
+            self.errors.append(f"Objet JSON invalide ignoré : {str(e)}")
+            return None
+
+        if not isinstance(obj, dict):
+            self.errors.append("Élément du tableau ignoré : objet attendu")
+            return None
+
+        return obj
+
+
+def extract_partial_string(content: str, field: str) -> str:
+    """
+    Valeur, éventuellement tronquée, du champ chaîne 'field' d'un objet JSON incomplet.
+
+    Sert à récupérer le texte déjà produit d'une réponse structurée coupée par
+    max_tokens, par exemple {"script": "# Titre\\n... sans guillemet fermant.
+    Retourne '' si le champ n'a pas encore commencé.
+    """
+    start = content.find(f'"{field}"')
+    if start == -1:
+        return ''
+
+    index = start + len(field) + 2
+    while index < len(content) and content[index] in ' \t\r\n:':
+        index += 1
+    if index >= len(content) or content[index] != '"':
+        return ''
+    index += 1
+
+    raw = []
+    escape = False
+    for char in content[index:]:
+        if escape:
+            escape = False
+        elif char == '\\':
+            escape = True
+        elif char == '"':
+            break
+        raw.append(char)
+
+    text = ''.join(raw)
+    # Séquence d'échappement coupée en fin de texte (\, \u00e)
+    cut = text.rfind('\\')
+    if cut != -1 and (cut == len(text) - 1 or (text[cut + 1] == 'u' and len(text) - cut < 6)):
+        backslashes = len(text[:cut + 1]) - len(text[:cut + 1].rstrip('\\'))
+        if backslashes % 2 == 1:
+            text = text[:cut]
+
+    try:
+        return json.loads(f'"{text}"')
+    except json.JSONDecodeError:
+        return text
+
+
+def extract_complete_members(content: str) -> Dict[str, Any]:
+    """
+    Membres entièrement reçus d'un objet JSON, éventuellement incomplet.
+
+    Sert aux réponses groupées {"E1": "...", "E2": "..."} coupées par max_tokens
+    ou mal terminées : les paires clé/valeur décodées avant la coupure sont
+    conservées, la valeur tronquée et tout ce qui suit sont ignorés.
+    Le texte avant la première accolade (préambule, ```json) est ignoré.
+    """
+    decoder = json.JSONDecoder()
+    members: Dict[str, Any] = {}
+    index = content.find('{')
+    if index == -1:
+        return members
+    index += 1
+
+    def skip(position: int) -> int:
+        while position < len(content) and content[position] in ' \t\r\n':
+            position += 1
+        return position
+
+    while True:
+        index = skip(index)
+        if index >= len(content) or content[index] != '"':
+            return members
+        try:
+            key, index = decoder.raw_decode(content, index)
+        except json.JSONDecodeError:
+            return members
+        index = skip(index)
+        if index >= len(content) or content[index] != ':':
+            return members
+        try:
+            value, index = decoder.raw_decode(content, skip(index + 1))
+        except json.JSONDecodeError:
+            return members
+        members[key] = value
+        index = skip(index)
+        if index >= len(content) or content[index] != ',':
+            return members
+        index += 1
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from config import CACHE_CONFIG
+
+
+class LLMCache:
+    """
+    Cache des réponses LLM adressé par le contenu de la requête.
+
+    Deux niveaux : un LRU en mémoire pour les accès répétés dans le même processus,
+    adossé à un fichier SQLite partagé entre les exécutions (et entre processus).
+    La clé est un hash SHA-256 des paramètres de la requête (modèle, messages,
+    température, max_tokens, ...).
+
+    Le nombre de lignes sur disque est suivi approximativement (un COUNT à l'ouverture,
+    puis les insertions et suppressions de ce processus) : les entrées expirées et les
+    plus anciennes ne sont purgées, après un décompte exact, que lorsque l'estimation
+    dépasse max_disk_entries, jusqu'à 90 % de cette taille.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 5000,
+        ttl_seconds: Optional[float] = None
+    ):
+        """Initialise le cache (path=None : cache uniquement en mémoire)"""
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'memory_hits': 0, 'disk_hits': 0, 'writes': 0, 'evictions': 0}
+
+        self._conn = None
+        self._disk_entries = 0
+        if path:
+            self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+            self._conn.commit()
+            self._disk_entries = self._count_disk()
+
+    @staticmethod
+    def make_key(params: Dict[str, Any]) -> str:
+        """Calcule la clé de cache d'une requête chat.completions"""
+        canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Retourne la réponse en cache ou None (hit/miss comptabilisés)"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._stats['hits'] += 1
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value_json, created_at = row
+                    if not self._is_expired(created_at, now):
+                        self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                        self._conn.commit()
+                        value = json.loads(value_json)
+                        self._remember(key, created_at, value)
+                        self._stats['hits'] += 1
+                        self._stats['disk_hits'] += 1
+                        return value
+                    cursor = self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._conn.commit()
+                    self._disk_entries -= cursor.rowcount
+
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Enregistre une réponse dans les deux niveaux du cache"""
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, value)
+            self._stats['writes'] += 1
+
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                # Un remplacement compte aussi : l'estimation ne peut que surévaluer, d'où un décompte plus tôt
+                self._disk_entries += 1
+                if self._disk_entries > self.max_disk_entries:
+                    self._evict_disk(now)
+                self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        """Retire une réponse des deux niveaux du cache (réponse inexploitable, par exemple)"""
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._conn is not None:
+                cursor = self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self._disk_entries -= cursor.rowcount
+
+    def clear(self) -> None:
+        """Vide le cache (mémoire et disque)"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_cache")
+                self._conn.commit()
+                self._disk_entries = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs hit/miss et la taille du cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_entries'] = 0
+            if self._conn is not None:
+                stats['disk_entries'] = self._count_disk()
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / lookups) * 100 if lookups else 0.0
+        return stats
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: Dict[str, Any]) -> None:
+        """Insère dans le LRU mémoire en évinçant l'entrée la moins récemment utilisée"""
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _count_disk(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def _evict_disk(self, now: float) -> None:
+        """
+        Supprime les entrées expirées puis les plus anciennes jusqu'à 90 % de la taille maximale,
+        pour que les écritures suivantes ne déclenchent pas un nouveau décompte à chaque fois
+        """
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._stats['evictions'] += cursor.rowcount
+
+        # Décompte exact : d'autres processus partagent le fichier
+        count = self._count_disk()
+        if count > self.max_disk_entries:
+            excess = count - self.max_disk_entries * 9 // 10
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+            self._stats['evictions'] += cursor.rowcount
+            count -= cursor.rowcount
+        self._disk_entries = count
+
+
+_default_cache: Optional[LLMCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> Optional[LLMCache]:
+    """Retourne le cache partagé par les générateurs (None si désactivé dans la configuration)"""
+    global _default_cache
+
+    if not CACHE_CONFIG.get("enabled", True):
+        return None
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache(
+                path=CACHE_CONFIG.get("path"),
+                max_memory_entries=CACHE_CONFIG.get("max_memory_entries", 256),
+                max_disk_entries=CACHE_CONFIG.get("max_disk_entries", 5000),
+                ttl_seconds=CACHE_CONFIG.get("ttl_seconds")
+            )
+        return _default_cache
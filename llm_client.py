@@ -0,0 +1,448 @@
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import (
+    TYPE_CHECKING, Dict, Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, ContextManager, Iterator,
+    Optional, Tuple
+)
+
+import tracing
+from concurrency_controller import ConcurrencyController, get_default_controller
+from llm_cache import LLMCache
+from rate_limiter import RateLimiter, get_default_rate_limiter
+from request_executor import RequestExecutor, get_default_executor
+from tracing import TraceRun
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+
+def format_usage_summary(stats: Dict[str, Any]) -> str:
+    """Résumé lisible d'un usage_stats() pour l'affichage en fin d'exécution"""
+    return (
+        f"{stats['requests']} requêtes API, {stats['response_cache_hits']} réponses en cache local · "
+        f"tokens d'entrée : {stats['prompt_tokens']} dont {stats['cached_tokens']} en cache de préfixe "
+        f"({stats['prompt_cache_hit_ratio']:.1f} %) · tokens de sortie : {stats['completion_tokens']} · "
+        f"{stats.get('retries', 0)} nouvelles tentatives, {stats.get('hedges', 0)} requêtes doublées · "
+        f"attente du limiteur de débit : {stats.get('rate_limit_wait_seconds', 0):.1f} s"
+    )
+
+
+# Consigne de reprise d'un texte libre tronqué par max_tokens
+CONTINUATION_PROMPT = (
+    "Votre réponse a été interrompue par la limite de longueur. Poursuivez exactement "
+    "là où elle s'est arrêtée, sans répéter ce qui précède ni ajouter d'introduction."
+)
+
+
+class CompletionStream:
+    """
+    Itérateur sur les fragments de texte d'une réponse en streaming.
+
+    Une fois l'itération terminée, content, finish_reason et usage décrivent la
+    réponse complète, comme le dictionnaire retourné par LLMClient.complete.
+    """
+
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = chunks
+        self.content = ''
+        self.finish_reason: Optional[str] = None
+        self.usage: Dict[str, int] = {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+        self.from_cache = False
+
+    def __iter__(self) -> Iterator[str]:
+        return self._chunks
+
+
+class LLMClient:
+    """
+    Point d'accès unique aux appels chat.completions des générateurs.
+
+    Normalise les réponses en dictionnaires sérialisables :
+    {'content', 'finish_reason', 'usage', 'from_cache'}, consulte le cache
+    de réponses avant chaque appel et cumule l'usage des tokens, dont les
+    tokens servis par le cache de préfixe du fournisseur (cached_tokens).
+    Une réponse que l'appelant ne parvient pas à exploiter doit être retirée
+    du cache avec discard(params).
+    Les appels passent par un RequestExecutor (délais, nouvelles tentatives, hedging).
+    Chaque tentative est d'abord admise : créneau du ConcurrencyController (AIMD) puis
+    budget du RateLimiter partagé ; ces attentes restent hors du budget de hedging
+    et des latences mesurées.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[LLMCache] = None,
+        executor: Optional[RequestExecutor] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        concurrency: Optional[ConcurrencyController] = None,
+        base_url: Optional[str] = None,
+        refresh: bool = False
+    ):
+        """
+        Initialise le client avec la clé API OpenAI, un cache optionnel, et par défaut
+        l'exécuteur, le limiteur de débit et le contrôleur de concurrence partagés du processus
+
+        base_url : serveur compatible OpenAI à utiliser à la place de l'API (ex. mock_llm_server) ;
+        sans rate_limiter explicite, aucun limiteur de débit n'est alors appliqué
+        refresh : régénération ; le cache de réponses n'est pas relu (use_cache=False par
+        défaut) mais les nouvelles réponses y sont enregistrées
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client: Optional['OpenAI'] = None
+        self.cache = cache
+        self.refresh = refresh
+        self.executor = executor if executor is not None else get_default_executor()
+        # Serveur autre que l'API (simulé, local) : les quotas de RATE_LIMIT_CONFIG et leur fichier partagé ne s'appliquent pas
+        if rate_limiter is None and base_url is None:
+            rate_limiter = get_default_rate_limiter()
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency if concurrency is not None else get_default_controller()
+        self._usage_lock = threading.Lock()
+        self.reset_usage()
+
+    @property
+    def client(self) -> 'OpenAI':
+        """Client synchrone, créé au premier appel (le SDK openai est long à importer)"""
+        if self._client is None:
+            from openai import OpenAI
+            # Les nouvelles tentatives sont gérées par l'exécuteur, pas par le SDK
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    @client.setter
+    def client(self, client: 'OpenAI') -> None:
+        self._client = client
+
+    def async_client(self) -> 'AsyncOpenAI':
+        """Crée un client asynchrone, à utiliser avec 'async with'"""
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+
+    def complete(self, use_cache: Optional[bool] = None, **params) -> Dict[str, Any]:
+        """
+        Appel synchrone à chat.completions.create avec cache
+        (use_cache=False : la réponse en cache est ignorée et remplacée ; défaut : not refresh)
+        """
+        key = self._cache_key(params)
+        cached = self._cache_get(key) if self._reads_cache(use_cache) else None
+        if cached is not None:
+            self._record_usage(cached)
+            return cached
+
+        trace_run = tracing.current_run()
+        with tracing.span('llm_total', model=params.get('model')):
+            response = self.executor.execute(
+                self._observed(self.client.chat.completions.create), params,
+                admission=self._admission(params, trace_run), can_hedge=self._hedge_budget(params)
+            )
+        result = self._normalize(response)
+        self._record_usage(result)
+        self._cache_set(key, result)
+        return result
+
+    def stream(self, use_cache: Optional[bool] = None, **params) -> CompletionStream:
+        """
+        Appel en streaming à chat.completions.create.
+        En cas de hit, la réponse en cache est restituée en un seul fragment (use_cache comme pour complete).
+        """
+        key = self._cache_key(params)
+        cached = self._cache_get(key) if self._reads_cache(use_cache) else None
+        if cached is not None:
+            self._record_usage(cached)
+            stream = CompletionStream(iter([cached['content']]))
+            stream.content = cached['content']
+            stream.finish_reason = cached['finish_reason']
+            stream.usage = cached['usage']
+            stream.from_cache = True
+            return stream
+
+        def chunks() -> Iterator[str]:
+            parts = []
+            trace_run = tracing.current_run()
+            start = time.perf_counter()
+            # Pas de hedging en streaming : seule l'ouverture du flux est retentée
+            response = self.executor.execute(
+                self._observed(self.client.chat.completions.create),
+                dict(params, stream=True, stream_options={"include_usage": True}),
+                hedge=False,
+                admission=self._admission(params, trace_run)
+            )
+            for chunk in response:
+                # Le dernier fragment porte l'usage de la requête et aucun choix
+                if getattr(chunk, 'usage', None) is not None:
+                    stream.usage = self._normalize_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    stream.finish_reason = choice.finish_reason
+                delta = getattr(choice.delta, 'content', None)
+                if delta:
+                    if not parts:
+                        tracing.record('ttft', time.perf_counter() - start, trace_run, model=params.get('model'))
+                    parts.append(delta)
+                    yield delta
+
+            tracing.record('llm_total', time.perf_counter() - start, trace_run, model=params.get('model'))
+            stream.content = ''.join(parts)
+            result = {
+                'content': stream.content,
+                'finish_reason': stream.finish_reason,
+                'usage': stream.usage,
+                'from_cache': False
+            }
+            self._record_usage(result)
+            self._cache_set(key, result)
+
+        stream = CompletionStream(chunks())
+        return stream
+
+    async def acomplete(self, async_client: 'AsyncOpenAI', use_cache: Optional[bool] = None, **params) -> Dict[str, Any]:
+        """Appel asynchrone à chat.completions.create avec cache (use_cache comme pour complete)"""
+        key = self._cache_key(params)
+        cached = self._cache_get(key) if self._reads_cache(use_cache) else None
+        if cached is not None:
+            self._record_usage(cached)
+            return cached
+
+        trace_run = tracing.current_run()
+        with tracing.span('llm_total', model=params.get('model')):
+            response = await self.executor.aexecute(
+                self._aobserved(async_client.chat.completions.create), params,
+                admission=self._aadmission(params, trace_run), can_hedge=self._hedge_budget(params)
+            )
+        result = self._normalize(response)
+        self._record_usage(result)
+        self._cache_set(key, result)
+        return result
+
+    def continue_text(self, params: Dict[str, Any], text: str, max_continuations: int) -> Tuple[str, Optional[str]]:
+        """
+        Prolonge un texte libre tronqué (finish_reason == "length").
+
+        Chaque requête de continuation reprend les messages d'origine suivis du texte
+        déjà produit (message assistant) et de CONTINUATION_PROMPT ; les fragments sont
+        concaténés. Retourne le texte complet et le finish_reason de la dernière réponse.
+        """
+        params = {key: value for key, value in params.items() if key != 'response_format'}
+        messages = params.pop('messages')
+        finish_reason = 'length'
+
+        for _ in range(max_continuations):
+            response = self.complete(messages=messages + [
+                {"role": "assistant", "content": text},
+                {"role": "user", "content": CONTINUATION_PROMPT}
+            ], **params)
+            text += response['content']
+            finish_reason = response['finish_reason']
+            if finish_reason != 'length' or not response['content']:
+                break
+
+        return text, finish_reason
+
+    def discard(self, params: Dict[str, Any]) -> None:
+        """
+        Retire du cache la réponse à ces paramètres : à appeler quand l'appelant ne peut
+        pas l'exploiter (JSON invalide, schéma non respecté), pour que la prochaine
+        génération interroge à nouveau l'API au lieu de reproduire l'échec
+        """
+        key = self._cache_key(params)
+        if key is not None:
+            self.cache.delete(key)
+
+    def cached_response(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Réponse déjà en cache pour ces paramètres, sans appel API ni comptage dans l'usage (None si refresh)"""
+        if self.refresh:
+            return None
+        return self._cache_get(self._cache_key(params))
+
+    def record_batch_response(self, params: Dict[str, Any], body: Dict[str, Any], count_usage: bool = True) -> Dict[str, Any]:
+        """
+        Réponse d'une requête traitée par l'API Batch (corps chat.completion en JSON) :
+        normalisée comme celle de complete, comptée dans l'usage et mise en cache.
+        count_usage=False : réponse déjà comptée (résultats du lot relus à une reprise)
+        """
+        choice = (body.get('choices') or [{}])[0]
+        usage = body.get('usage') or {}
+        result = {
+            'content': (choice.get('message') or {}).get('content') or '',
+            'finish_reason': choice.get('finish_reason'),
+            'usage': {
+                'prompt_tokens': usage.get('prompt_tokens', 0) or 0,
+                'completion_tokens': usage.get('completion_tokens', 0) or 0,
+                'cached_tokens': (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0) or 0
+            },
+            'from_cache': False
+        }
+        if count_usage:
+            self._record_usage(result)
+        self._cache_set(self._cache_key(params), result)
+        return result
+
+    def _admission(self, params: Dict[str, Any], trace_run: Optional[TraceRun] = None) -> Callable[[], ContextManager]:
+        """
+        Admission d'une tentative : créneau de concurrence puis réservation du budget
+        (requête + tokens estimés), ouverte par l'exécuteur avant de mesurer l'appel.
+        En streaming, seule l'ouverture du flux occupe le créneau.
+        trace_run : exécution à laquelle imputer l'attente
+        """
+        @contextmanager
+        def admitted() -> Iterator[None]:
+            queued = time.perf_counter()
+            slot = self.concurrency.slot() if self.concurrency is not None else nullcontext()
+            with slot:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(params.get('model', ''), self.rate_limiter.estimate_tokens(params))
+                tracing.record('queue_wait', time.perf_counter() - queued, trace_run)
+                yield
+        return admitted
+
+    def _aadmission(
+        self,
+        params: Dict[str, Any],
+        trace_run: Optional[TraceRun] = None
+    ) -> Callable[[], AsyncContextManager]:
+        """Version asynchrone de _admission"""
+        @asynccontextmanager
+        async def admitted() -> AsyncIterator[None]:
+            queued = time.perf_counter()
+            slot = self.concurrency.aslot() if self.concurrency is not None else nullcontext()
+            async with slot:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.aacquire(params.get('model', ''), self.rate_limiter.estimate_tokens(params))
+                tracing.record('queue_wait', time.perf_counter() - queued, trace_run)
+                yield
+        return admitted
+
+    def _hedge_budget(self, params: Dict[str, Any]) -> Optional[Callable[[], bool]]:
+        """Réservation immédiate du budget d'une requête doublée : pas de hedge si le débit est épuisé"""
+        if self.rate_limiter is None:
+            return None
+        return lambda: self.rate_limiter.try_acquire(params.get('model', ''), self.rate_limiter.estimate_tokens(params))
+
+    def _observed(self, create: Callable[..., Any]) -> Callable[..., Any]:
+        """create dont la durée et l'issue (hors attente d'admission) ajustent la limite AIMD"""
+        def call(**params):
+            start = time.perf_counter()
+            try:
+                response = create(**params)
+            except Exception as e:
+                self._record_outcome(start, e)
+                raise
+            self._record_outcome(start)
+            return response
+        return call
+
+    def _aobserved(self, create: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        """Version asynchrone de _observed"""
+        async def call(**params):
+            start = time.perf_counter()
+            try:
+                response = await create(**params)
+            except Exception as e:
+                self._record_outcome(start, e)
+                raise
+            self._record_outcome(start)
+            return response
+        return call
+
+    def _record_outcome(self, start: float, error: Optional[Exception] = None) -> None:
+        if self.concurrency is not None:
+            self.concurrency.record(time.perf_counter() - start, error)
+
+    def reset_usage(self) -> None:
+        """Remet à zéro les compteurs d'usage (début d'une exécution)"""
+        # L'exécuteur est partagé : ses compteurs sont relevés par différence
+        self._executor_baseline = self.executor.stats()
+        self._limiter_baseline = self.rate_limiter.stats() if self.rate_limiter is not None else {}
+        with self._usage_lock:
+            self._usage = {
+                'requests': 0,
+                'response_cache_hits': 0,
+                'prompt_tokens': 0,
+                'cached_tokens': 0,
+                'completion_tokens': 0
+            }
+
+    def usage_stats(self) -> Dict[str, Any]:
+        """
+        Usage cumulé depuis le dernier reset_usage.
+        prompt_cache_hit_ratio : part des tokens d'entrée servis par le cache de préfixe (%)
+        """
+        with self._usage_lock:
+            stats = dict(self._usage)
+
+        stats['prompt_cache_hit_ratio'] = (
+            stats['cached_tokens'] / stats['prompt_tokens'] * 100 if stats['prompt_tokens'] else 0.0
+        )
+        executor_stats = self.executor.stats()
+        for name in ('retries', 'timeouts', 'hedges', 'hedges_refused', 'hedge_wins'):
+            stats[name] = executor_stats[name] - self._executor_baseline.get(name, 0)
+        limiter_stats = self.rate_limiter.stats() if self.rate_limiter is not None else {}
+        for name in ('throttled', 'wait_seconds'):
+            stats[f'rate_limit_{name}'] = limiter_stats.get(name, 0) - self._limiter_baseline.get(name, 0)
+        return stats
+
+    def _record_usage(self, result: Dict[str, Any]) -> None:
+        trace_run = tracing.current_run()
+        if trace_run is not None:
+            trace_run.add_usage(result.get('usage', {}), bool(result.get('from_cache')))
+
+        with self._usage_lock:
+            if result.get('from_cache'):
+                # Réponse servie localement : aucun token facturé
+                self._usage['response_cache_hits'] += 1
+                return
+
+            usage = result.get('usage', {})
+            self._usage['requests'] += 1
+            self._usage['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            self._usage['cached_tokens'] += usage.get('cached_tokens', 0)
+            self._usage['completion_tokens'] += usage.get('completion_tokens', 0)
+
+    def _cache_key(self, params: Dict[str, Any]) -> Optional[str]:
+        if self.cache is None:
+            return None
+        # Les réponses d'un autre serveur (simulé, par exemple) ne doivent pas servir pour l'API
+        return LLMCache.make_key(dict(params, base_url=self.base_url) if self.base_url else params)
+
+    def _reads_cache(self, use_cache: Optional[bool]) -> bool:
+        return not self.refresh if use_cache is None else use_cache
+
+    def _cache_get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if key is None:
+            return None
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        return dict(cached, from_cache=True)
+
+    def _cache_set(self, key: Optional[str], result: Dict[str, Any]) -> None:
+        # Les réponses vides ou tronquées ne sont pas mises en cache pour ne pas figer un échec
+        if key is not None and result.get('content') and result.get('finish_reason') != 'length':
+            self.cache.set(key, dict(result, from_cache=False))
+
+    @classmethod
+    def _normalize(cls, response: Any) -> Dict[str, Any]:
+        """Convertit la réponse OpenAI en dictionnaire"""
+        choice = response.choices[0]
+
+        return {
+            'content': choice.message.content or '',
+            'finish_reason': getattr(choice, 'finish_reason', None),
+            'usage': cls._normalize_usage(getattr(response, 'usage', None)),
+            'from_cache': False
+        }
+
+    @staticmethod
+    def _normalize_usage(usage: Any) -> Dict[str, int]:
+        """Extrait les compteurs de tokens, dont usage.prompt_tokens_details.cached_tokens"""
+        details = getattr(usage, 'prompt_tokens_details', None)
+        return {
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+            'cached_tokens': getattr(details, 'cached_tokens', 0) or 0
+        }
@@ -0,0 +1,498 @@
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from sequencer_schema import AUTHORIZED_ACTIVITY_TYPES
+from synthetic_workload import WorkloadGenerator
+
+# Marqueurs reconnus dans les requêtes des générateurs
+_SCREEN_COUNT_RE = re.compile(r"Nombre d'écrans : (\d+)")
+_SEQUENCE_NAME_RE = re.compile(r"UNIQUEMENT les écrans de la séquence \d+ : « (.+?) »")
+_SCREEN_NUMBER_RE = re.compile(r"Numéro d'écran : (.+)")
+_OBJECTIVES_RE = re.compile(r'"objectif":', re.IGNORECASE)
+_SKELETON_RE = re.compile(r"plan du séquenceur pédagogique pour ces (\d+) objectifs")
+_PACKED_SCREEN_RE = re.compile(r"^\s*### Écran (.+)$", re.MULTILINE)
+
+# Taille minimale d'un préfixe mis en cache par l'API, et granularité du cache
+_PREFIX_CACHE_MIN_TOKENS = 1024
+_PREFIX_CACHE_BLOCK = 128
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation simple et déterministe (~4 caractères par token)"""
+    return len(text) // 4 + 1
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """
+    Distribution de latence (secondes) décrite par une chaîne :
+    fixed:0.2, uniform:0.1,0.5, normal:moyenne,écart-type, lognormal:médiane,sigma,
+    exponential:moyenne. Lève ValueError si la description est invalide.
+    """
+    kind, _, raw = spec.partition(':')
+    try:
+        values = [float(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        raise ValueError(f"Distribution invalide : {spec}")
+
+    expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(
+            f"Distribution invalide : {spec} (fixed:s, uniform:a,b, normal:m,σ, lognormal:médiane,σ, exponential:m)"
+        )
+
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(max(values[0], 1e-6)), values[1])
+    return lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+
+
+class MockLLMServer:
+    """
+    Serveur local compatible avec l'API chat.completions d'OpenAI, sans réseau ni coût.
+
+    Les réponses sont déterministes (même graine, même requête, même réponse) et
+    conformes aux schémas des générateurs : séquenceur (complet ou par séquence),
+    plan de séquences, scripts et prompts, en sortie structurée ou libre.
+
+    - latence : délai avant le premier token (distribution) puis débit de tokens/s ;
+    - error_rate / server_error_rate : 429 (avec Retry-After) et 500 injectés ;
+    - truncation_rate : réponses coupées (finish_reason "length") ; une réponse plus
+      longue que max_tokens l'est toujours. Les requêtes de continuation reçoivent
+      la suite exacte de la réponse d'origine ;
+    - streaming SSE (stream=True, stream_options.include_usage) ;
+    - cache de préfixe simulé (usage.prompt_tokens_details.cached_tokens).
+
+    Les tirages aléatoires dépendent de la graine, de la requête et du nombre de fois
+    où elle a été reçue : une nouvelle tentative n'échoue pas forcément comme la première.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+        latency: str = "lognormal:0.2,0.5",
+        tokens_per_second: float = 200.0,
+        error_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        retry_after: float = 1.0,
+        truncation_rate: float = 0.0,
+        screens_per_response: int = 12,
+        script_tokens: int = 400
+    ):
+        self.seed = seed
+        self.sample_latency = parse_distribution(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after
+        self.truncation_rate = truncation_rate
+        self.screens_per_response = screens_per_response
+        self.script_tokens = script_tokens
+
+        self._lock = threading.Lock()
+        self._seen_requests: Dict[str, int] = {}
+        self._seen_prefixes: set = set()
+        self._stats = {
+            'requests': 0, 'streams': 0, 'rate_limited': 0, 'server_errors': 0,
+            'truncated': 0, 'continuations': 0, 'completion_tokens': 0
+        }
+
+        handler = type('MockHandler', (_MockHandler,), {'mock': self})
+        self._httpd = ThreadingHTTPServer((host, port), handler)
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """URL à passer en base_url aux générateurs"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'MockLLMServer':
+        """Démarre le serveur dans un thread de fond"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._httpd.serve_forever()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> 'MockLLMServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs de requêtes, erreurs injectées, troncatures et tokens produits"""
+        with self._lock:
+            return dict(self._stats)
+
+    def handle_completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Prépare la réponse d'une requête chat.completions :
+        {'status', 'headers', 'error'} ou {'status': 200, 'content', 'finish_reason', 'usage', 'ttft'}
+        """
+        request_key = hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+        with self._lock:
+            attempt = self._seen_requests.get(request_key, 0)
+            self._seen_requests[request_key] = attempt + 1
+            self._stats['requests'] += 1
+            self._stats['streams'] += bool(body.get('stream'))
+        rng = random.Random(f"{self.seed}:{request_key}:{attempt}")
+
+        if rng.random() < self.error_rate:
+            self._count('rate_limited')
+            return {
+                'status': 429,
+                'headers': {'Retry-After': f"{self.retry_after:g}"},
+                'error': {"message": "Rate limit reached (simulé)", "type": "requests", "code": "rate_limit_exceeded"}
+            }
+        if rng.random() < self.server_error_rate:
+            self._count('server_errors')
+            return {
+                'status': 500, 'headers': {},
+                'error': {"message": "Erreur serveur (simulée)", "type": "server_error", "code": None}
+            }
+
+        messages = body.get('messages', [])
+        content, finish_reason = self._render(body, messages, rng)
+        completion_tokens = estimate_tokens(content)
+        self._count('completion_tokens', completion_tokens)
+        if finish_reason == 'length':
+            self._count('truncated')
+
+        return {
+            'status': 200,
+            'content': content,
+            'finish_reason': finish_reason,
+            'usage': self._usage(messages, completion_tokens),
+            'ttft': self.sample_latency(rng)
+        }
+
+    def _render(self, body: Dict[str, Any], messages: List[Dict[str, Any]], rng: random.Random) -> Tuple[str, str]:
+        """Texte de la réponse et finish_reason (troncature éventuelle)"""
+        first_assistant = next((i for i, m in enumerate(messages) if m.get('role') == 'assistant'), None)
+        original = messages if first_assistant is None else messages[:first_assistant]
+        schema_name = ((body.get('response_format') or {}).get('json_schema') or {}).get('name')
+        document_rng = random.Random(f"{self.seed}:{hashlib.sha256(json.dumps(original, sort_keys=True).encode()).hexdigest()}")
+
+        if first_assistant is not None:
+            self._count('continuations')
+            content = self._continuation(original, messages[first_assistant:], schema_name, document_rng)
+        else:
+            content = self._full_response(original, schema_name, document_rng)
+
+        limit = body.get('max_tokens') or body.get('max_completion_tokens')
+        if limit and estimate_tokens(content) > limit:
+            return content[:limit * 4], 'length'
+        if len(content) > 40 and rng.random() < self.truncation_rate:
+            return content[:int(len(content) * rng.uniform(0.3, 0.9))], 'length'
+        return content, 'stop'
+
+    def _full_response(self, messages: List[Dict[str, Any]], schema_name: Optional[str], rng: random.Random) -> str:
+        user = next((m.get('content') or '' for m in reversed(messages) if m.get('role') == 'user'), '')
+        system = next((m.get('content') or '' for m in messages if m.get('role') == 'system'), '')
+
+        skeleton_match = _SKELETON_RE.search(user)
+        if schema_name == 'plan_sequenceur' or skeleton_match:
+            sequences = self._skeleton(int(skeleton_match.group(1)) if skeleton_match else 3, rng)
+            return json.dumps({"sequences": sequences} if schema_name else sequences, ensure_ascii=False)
+        if _PACKED_SCREEN_RE.search(user):
+            # Requête groupée : un texte par identifiant d'écran, dans un objet JSON
+            parts = _PACKED_SCREEN_RE.split(user)
+            return json.dumps({
+                key.strip(): self._activity_text(block, system, rng) for key, block in zip(parts[1::2], parts[2::2])
+            }, ensure_ascii=False)
+        if schema_name in ('script_pedagogique', 'prompt_activite') or _SCREEN_NUMBER_RE.search(user):
+            text = self._activity_text(user, system, rng)
+            if schema_name is None:
+                return text
+            number = _SCREEN_NUMBER_RE.search(user)
+            return json.dumps({
+                "num_ecran": number.group(1).strip() if number else "E1",
+                "type_activite": self._activity_type(system),
+                "script" if schema_name == 'script_pedagogique' else "prompt": text
+            }, ensure_ascii=False)
+
+        screens = self._screens(user, rng)
+        if schema_name is None:
+            return json.dumps(screens, ensure_ascii=False, indent=2)
+        return json.dumps({"ecrans": screens}, ensure_ascii=False)
+
+    def _continuation(
+        self,
+        original: List[Dict[str, Any]],
+        tail: List[Dict[str, Any]],
+        schema_name: Optional[str],
+        rng: random.Random
+    ) -> str:
+        """Suite de la réponse d'origine, après ce que les messages assistant contiennent déjà"""
+        produced = ''.join(m.get('content') or '' for m in tail if m.get('role') == 'assistant')
+        full = self._full_response(original, schema_name, rng)
+
+        if produced.lstrip().startswith('{"ecrans"'):
+            # Continuation du séquenceur : écrans restants, au même format
+            try:
+                done = len(json.loads(produced)['ecrans'])
+            except (ValueError, KeyError, TypeError):
+                done = 0
+            remaining = self._parse_screens(full)[done:]
+            return json.dumps({"ecrans": remaining} if schema_name else remaining, ensure_ascii=False)
+
+        # Continuation d'un texte libre : la réponse d'origine sans sa partie déjà produite
+        text = full
+        if schema_name in ('script_pedagogique', 'prompt_activite'):
+            data = json.loads(full)
+            text = data.get('script', data.get('prompt', ''))
+        return text[len(produced):] if text.startswith(produced) else text
+
+    @staticmethod
+    def _parse_screens(content: str) -> List[Dict[str, Any]]:
+        data = json.loads(content)
+        return data['ecrans'] if isinstance(data, dict) else data
+
+    def _screens(self, user: str, rng: random.Random) -> List[Dict[str, Any]]:
+        count_match = _SCREEN_COUNT_RE.search(user)
+        count = int(count_match.group(1)) if count_match else self.screens_per_response
+        objectives = max(1, len(_OBJECTIVES_RE.findall(user)) or 3)
+        generator = WorkloadGenerator(seed=rng.randrange(1 << 30))
+        screens = generator.generate_sequencer(count, min(objectives, count))
+
+        sequence_match = _SEQUENCE_NAME_RE.search(user)
+        if sequence_match:
+            for index, screen in enumerate(screens, 1):
+                screen['sequence'] = sequence_match.group(1)
+                screen['num_ecran'] = f"{sequence_match.group(1)[:12]}-E{index}"
+        return screens
+
+    def _skeleton(self, objectives: int, rng: random.Random) -> List[Dict[str, Any]]:
+        objectives = max(1, objectives)
+        roles = ["Découverte", "Approfondissement", "Application", "Évaluation"]
+        levels = ["comprendre", "analyser", "appliquer", "evaluer"]
+        sequence_count = min(4, max(2, objectives))
+        per_sequence = -(-objectives // sequence_count)
+        return [
+            {
+                "sequence": f"Séquence {index + 1} - {roles[index]}",
+                "role": roles[index],
+                "niveau_bloom": levels[index],
+                "objectifs_couverts": list(range(index * per_sequence + 1, min(objectives, (index + 1) * per_sequence) + 1)),
+                "nombre_ecrans": rng.randint(3, 6)
+            }
+            for index in range(sequence_count)
+        ]
+
+    def _activity_text(self, user: str, system: str, rng: random.Random) -> str:
+        title = next((line.split(':', 1)[1].strip() for line in user.splitlines() if 'Titre :' in line), "Activité")
+        sentences = [
+            "Présentez le contexte et l'objectif de l'écran en une phrase.",
+            "Illustrez la notion par un exemple concret tiré du domaine.",
+            "Proposez une question de vérification avec un feedback explicatif.",
+            "Reliez l'activité à l'objectif pédagogique visé.",
+            "Concluez par une synthèse des points clés à retenir."
+        ]
+        parts = [f"## {title}\n"]
+        while estimate_tokens('\n'.join(parts)) < self.script_tokens:
+            parts.append(f"- {rng.choice(sentences)}")
+        return '\n'.join(parts)
+
+    @staticmethod
+    def _activity_type(system: str) -> str:
+        lowered = system.lower()
+        for activity_type in AUTHORIZED_ACTIVITY_TYPES:
+            if activity_type in lowered:
+                return activity_type
+        return 'text'
+
+    def _usage(self, messages: List[Dict[str, Any]], completion_tokens: int) -> Dict[str, Any]:
+        prompt_tokens = sum(estimate_tokens(m.get('content') or '') + 4 for m in messages)
+        cached_tokens = 0
+        system = (messages[0].get('content') or '') if messages else ''
+        prefix_tokens = estimate_tokens(system)
+        if prefix_tokens >= _PREFIX_CACHE_MIN_TOKENS:
+            prefix_key = hashlib.sha256(system.encode()).hexdigest()
+            with self._lock:
+                if prefix_key in self._seen_prefixes:
+                    cached_tokens = prefix_tokens // _PREFIX_CACHE_BLOCK * _PREFIX_CACHE_BLOCK
+                self._seen_prefixes.add(prefix_key)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}
+        }
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    mock: MockLLMServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path.rstrip('/').endswith('/stats'):
+            self._send_json(200, self.mock.stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Chemin inconnu : {self.path}"}})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Corps JSON invalide", "type": "invalid_request_error"}})
+            return
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": f"Chemin inconnu : {self.path}"}})
+            return
+
+        result = self.mock.handle_completion(body)
+        if result['status'] != 200:
+            self._send_json(result['status'], {"error": result['error']}, result['headers'])
+            return
+
+        time.sleep(result['ttft'])
+        if body.get('stream'):
+            self._send_stream(body, result)
+        else:
+            tokens_per_second = self.mock.tokens_per_second
+            if tokens_per_second > 0:
+                time.sleep(result['usage']['completion_tokens'] / tokens_per_second)
+            self._send_json(200, self._completion(body, result))
+
+    def _completion(self, body: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": f"chatcmpl-mock-{self.mock.stats()['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'mock'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": result['content']},
+                "finish_reason": result['finish_reason'],
+                "logprobs": None
+            }],
+            "usage": result['usage']
+        }
+
+    def _send_stream(self, body: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Réponse SSE : fragments de ~4 tokens au débit configuré, puis usage et [DONE]"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        base = {
+            "id": "chatcmpl-mock-stream", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": body.get('model', 'mock')
+        }
+        content = result['content']
+        chunk_chars = 16
+        delay = (chunk_chars / 4) / self.mock.tokens_per_second if self.mock.tokens_per_second > 0 else 0.0
+        try:
+            for start in range(0, len(content), chunk_chars):
+                self._send_event(dict(base, choices=[{
+                    "index": 0, "delta": {"content": content[start:start + chunk_chars]}, "finish_reason": None
+                }]))
+                time.sleep(delay)
+            self._send_event(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": result['finish_reason']}]))
+            if (body.get('stream_options') or {}).get('include_usage'):
+                self._send_event(dict(base, choices=[], usage=result['usage']))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client parti (annulation d'un hedge, par exemple)
+            pass
+
+    def _send_event(self, payload: Dict[str, Any]) -> None:
+        self.wfile.write(b"data: " + json.dumps(payload, ensure_ascii=False).encode('utf-8') + b"\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format: str, *args) -> None:
+        # Pas de journal par requête : le serveur sert des milliers d'appels par benchmark
+        pass
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Serveur local compatible OpenAI (chat.completions) pour benchmarks hors ligne."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", default="lognormal:0.2,0.5",
+                        help="Délai avant le premier token : fixed:s, uniform:a,b, normal:m,σ, lognormal:médiane,σ, exponential:m")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Débit de génération (0 : instantané)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses 429")
+    parser.add_argument("--server-error-rate", type=float, default=0.0, help="Proportion de réponses 500")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="En-tête Retry-After des 429 (secondes)")
+    parser.add_argument("--truncation-rate", type=float, default=0.0, help="Proportion de réponses tronquées")
+    parser.add_argument("--screens", type=int, default=12, help="Écrans par séquenceur généré")
+    parser.add_argument("--script-tokens", type=int, default=400, help="Longueur des scripts et prompts (tokens)")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        server = MockLLMServer(
+            host=args.host, port=args.port, seed=args.seed, latency=args.latency,
+            tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+            server_error_rate=args.server_error_rate, retry_after=args.retry_after,
+            truncation_rate=args.truncation_rate, screens_per_response=args.screens,
+            script_tokens=args.script_tokens
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"Serveur simulé sur {server.base_url} (Ctrl+C pour arrêter)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_WORD_RE = re.compile(r'[^\W_]+')
+
+# Mots vides français fréquents dans les objectifs et les résumés d'écrans
+_STOPWORDS = frozenset("""
+    au aux avec ce ces cette dans de des du elle en est et etre il ils la le les leur leurs
+    lui mais ne ni nos notre ou par pas pour qu que qui sa se ses son sont sur ta te tes ton
+    un une vos votre sera seront capable apprenant apprenants fin afin ainsi
+""".split())
+
+
+def _build_accent_table() -> Dict[int, str]:
+    """Table de translittération des lettres accentuées latines (é -> e, œ -> oe, ...)"""
+    table = {ord('œ'): 'oe', ord('æ'): 'ae'}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        stripped = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+        if stripped != char and stripped.isascii():
+            table[code] = stripped
+    return table
+
+
+_ACCENT_TABLE = _build_accent_table()
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Découpe un texte en termes normalisés : minuscules, sans accents ni ponctuation ni mots vides"""
+    text = text.lower().translate(_ACCENT_TABLE)
+
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        term = _normalize_term(token)
+        if term is not None:
+            tokens.append(term)
+    return tokens
+
+
+def _normalize_term(token: str) -> Optional[str]:
+    """Filtre les mots vides et courts, puis applique une racinisation minimale (pluriels réguliers)"""
+    if len(token) < 3 or token in _STOPWORDS:
+        return None
+    if len(token) > 4 and token[-1] in 'sx':
+        return token[:-1]
+    return token
+
+
+def _numpy():
+    """numpy n'est importé qu'à la première construction d'index"""
+    import numpy
+    return numpy
+
+
+class ObjectiveIndex:
+    """
+    Index BM25 des objectifs pour rattacher les écrans à leur objectif.
+
+    Le vocabulaire et la matrice de poids objectifs × termes sont construits une
+    fois par analyse ; tous les écrans sont ensuite notés contre tous les objectifs
+    par un seul produit matriciel (par blocs pour borner la mémoire).
+    """
+
+    def __init__(self, objectives: List[Dict[str, str]], k1: float = 1.5, b: float = 0.75, batch_size: int = 2048):
+        """Construit l'index à partir des objectifs analysés ({'objectif': ..., ...})"""
+        np = _numpy()
+        self.objectives = objectives
+        self.batch_size = batch_size
+        self._columns: Dict[str, tuple] = {}
+
+        documents = [normalize_tokens(obj.get('objectif', '')) for obj in objectives]
+        self.vocabulary: Dict[str, int] = {}
+        for tokens in documents:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+
+        n_docs = len(documents)
+        term_freq = np.zeros((n_docs, len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(documents):
+            for token in tokens:
+                term_freq[row, self.vocabulary[token]] += 1
+
+        if n_docs and self.vocabulary:
+            doc_freq = (term_freq > 0).sum(axis=0)
+            idf = np.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+            lengths = term_freq.sum(axis=1, keepdims=True)
+            avg_length = max(float(lengths.mean()), 1.0)
+            saturation = term_freq * (k1 + 1) / (term_freq + k1 * (1 - b + b * lengths / avg_length))
+            self.weights = (saturation * idf).astype(np.float32)
+        else:
+            self.weights = term_freq
+
+    def best_matches(self, texts: List[str]) -> List[Optional[int]]:
+        """Retourne, pour chaque texte, l'indice de l'objectif le mieux noté (None si aucun terme commun)"""
+        if not texts or not self.vocabulary:
+            return [None] * len(texts)
+
+        np = _numpy()
+        matches: List[Optional[int]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            rows, cols = self._query_coordinates(batch)
+            queries = np.zeros((len(batch), len(self.vocabulary)), dtype=np.float32)
+            queries[rows, cols] = 1.0
+
+            scores = queries @ self.weights.T
+            best = scores.argmax(axis=1)
+            best_scores = scores[np.arange(len(batch)), best]
+            matches.extend(int(index) if score > 0 else None for index, score in zip(best, best_scores))
+
+        return matches
+
+    def _query_coordinates(self, texts: List[str]) -> tuple:
+        """Coordonnées (ligne, colonne) des termes du vocabulaire présents dans chaque texte"""
+        rows: List[int] = []
+        cols: List[int] = []
+        columns = self._columns
+
+        for row, text in enumerate(texts):
+            for word in set(_WORD_RE.findall(text.lower())):
+                word_cols = columns.get(word)
+                if word_cols is None:
+                    # Chaque forme brute n'est normalisée qu'une fois par index
+                    word_cols = tuple(
+                        self.vocabulary[term] for term in normalize_tokens(word) if term in self.vocabulary
+                    )
+                    columns[word] = word_cols
+                for col in word_cols:
+                    rows.append(row)
+                    cols.append(col)
+
+        return rows, cols
+
+    def link_items(self, items: List[Dict[str, str]]) -> List[str]:
+        """
+        Objectif de chaque écran, validé contre l'index : celui que désigne son champ objectif_lie
+        (rempli par le modèle) s'il correspond à un objectif, sinon celui de match_items ('' si aucun)
+        """
+        declared = self.best_matches([item.get('objectif_lie') or '' for item in items])
+        unresolved = [item for item, index in zip(items, declared) if index is None]
+        matches = iter(self.match_items(unresolved))
+        return [
+            self.objectives[index].get('objectif', '') if index is not None else next(matches)
+            for index in declared
+        ]
+
+    def match_items(self, items: List[Dict[str, str]]) -> List[str]:
+        """Retourne le texte de l'objectif rattaché à chaque écran ('' si aucun)"""
+        texts = [item.get('titre_ecran', '') + ' ' + item.get('resume_contenu', '') for item in items]
+        return [
+            self.objectives[index].get('objectif', '') if index is not None else ''
+            for index in self.best_matches(texts)
+        ]
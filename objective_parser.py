@@ -0,0 +1,385 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Set
+
+# Motifs précompilés, partagés par la validation, l'analyse et la construction des prompts
+_SEPARATOR_RE = re.compile(r'^-{3,}$')
+_CLASSIFICATION_FIELDS = (
+    ('Objectif:', 'objectif'),
+    ('Verbe principal:', 'verbe'),
+    ('Niveau de Bloom:', 'bloom'),
+    ('Justification:', 'justification'),
+)
+_BLOOM_MARKER = 'Niveau de Bloom:'
+
+_NUMBERED_ITEM_RE = re.compile(r'^\s*(\d+)\.\s*(.*)$')
+_WEEK_RE = re.compile(r'semaine (\d+)')
+_VERB_RE = re.compile(r'capable de (\w+)')
+_TEMPORAL_RE = re.compile(r'semaine \d+|fin de.*?semaine', re.IGNORECASE)
+
+_HOURS_RE = re.compile(r'(\d+)-?(\d+)?\s*heures?')
+
+# Champs des blocs d'évaluation de difficulté (reconnus par préfixe, sans regex)
+_DIFFICULTY_FIELDS = (
+    ('Niveau de difficulté', 'niveau'),
+    ('Justification', 'justification'),
+    ('Temps nécessaire', 'temps'),
+    ('Conseils', 'conseils'),
+)
+
+# Normalisation des libellés de niveaux de Bloom (ordre de test significatif)
+_BLOOM_NORMALIZATION = (
+    (('comprendre',), 'comprendre'),
+    (('analyser', 'analyse'), 'analyser'),
+    (('évaluer', 'evaluer'), 'evaluer'),
+    (('appliquer',), 'appliquer'),
+    (('créer', 'creer'), 'creer'),
+    (('se souvenir', 'souvenir'), 'se_souvenir'),
+)
+
+
+@dataclass
+class ClassifiedObjective:
+    """Objectif issu de la classification Bloom"""
+    objectif: str
+    verbe: Optional[str] = None
+    bloom: Optional[str] = None
+    justification: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, str]:
+        return {key: value for key, value in (
+            ('objectif', self.objectif),
+            ('verbe', self.verbe),
+            ('bloom', self.bloom),
+            ('justification', self.justification),
+        ) if value is not None}
+
+
+@dataclass
+class SmartObjective:
+    """Objectif SMART numéroté"""
+    numero: int
+    objectif: str
+    semaine: Optional[str] = None
+    verbe: Optional[str] = None
+
+
+@dataclass
+class DifficultyEntry:
+    """Évaluation de difficulté d'un objectif"""
+    numero: int
+    objectif: str
+    niveau: int
+    justification: str = ''
+    temps: str = ''
+
+
+@dataclass
+class ParseFailure:
+    """Bloc d'évaluation de difficulté non exploitable"""
+    numero: Optional[int]
+    line: int
+    reason: str
+
+    def __str__(self) -> str:
+        label = f"Bloc {self.numero}" if self.numero is not None else "Bloc"
+        return f"{label} (ligne {self.line}) : {self.reason}"
+
+
+@dataclass
+class ObjectiveAnalysis:
+    """Résultat de l'analyse unique des trois textes d'entrée"""
+    objectives: List[ClassifiedObjective] = field(default_factory=list)
+    classification_block_count: int = 0
+    bloom_progression: List[str] = field(default_factory=list)
+    bloom_levels: Set[str] = field(default_factory=set)
+    smart_objectives: List[SmartObjective] = field(default_factory=list)
+    temporal_indicators: int = 0
+    difficulties: List[DifficultyEntry] = field(default_factory=list)
+    difficulty_levels: Set[int] = field(default_factory=set)
+    difficulty_failures: List[ParseFailure] = field(default_factory=list)
+    total_hours: int = 0
+
+    @property
+    def bloom_distribution(self) -> Dict[str, int]:
+        """Distribution des niveaux de Bloom normalisés"""
+        distribution = {}
+        for obj in self.objectives:
+            level = normalize_bloom_level(obj.bloom or '')
+            distribution[level] = distribution.get(level, 0) + 1
+        return distribution
+
+    def validation_stats(self) -> Dict[str, int]:
+        """Statistiques affichées après validation"""
+        return {
+            'objectives_count': self.classification_block_count,
+            'bloom_levels': len(self.bloom_levels),
+            'difficulty_levels': len(self.difficulty_levels),
+            'temporal_indicators': self.temporal_indicators
+        }
+
+    def to_analysis_dict(self) -> Dict[str, Any]:
+        """Dictionnaire d'analyse consommé par PedagogicalSequencerV2"""
+        return {
+            'domain': "Domaine à détecter automatiquement par le LLM",
+            'objectives': [obj.to_dict() for obj in self.objectives],
+            'bloom_distribution': self.bloom_distribution,
+            'difficulty_mapping': {
+                entry.objectif: {'niveau': entry.niveau, 'temps': entry.temps, 'numero': str(entry.numero)}
+                for entry in self.difficulties
+            },
+            'temporal_progression': [
+                {'numero': str(obj.numero), 'objectif': obj.objectif, 'semaine': obj.semaine}
+                for obj in self.smart_objectives
+            ],
+            'estimated_total_hours': self.total_hours
+        }
+
+
+def normalize_bloom_level(level: str) -> str:
+    """Normalise un libellé de niveau de Bloom (ex: 'Évaluer' -> 'evaluer')"""
+    level = level.lower()
+    for markers, normalized in _BLOOM_NORMALIZATION:
+        if any(marker in level for marker in markers):
+            return normalized
+    return level
+
+
+def parse_classification(text: str, analysis: Optional[ObjectiveAnalysis] = None) -> ObjectiveAnalysis:
+    """Analyse la classification Bloom (blocs séparés par '---') en une passe sur les lignes"""
+    analysis = analysis if analysis is not None else ObjectiveAnalysis()
+    current: Dict[str, str] = {}
+    block_has_content = False
+    block_bloom: Optional[str] = None
+
+    def close_block():
+        if block_has_content:
+            analysis.classification_block_count += 1
+        if block_bloom is not None:
+            analysis.bloom_progression.append(block_bloom)
+        if current.get('objectif'):
+            analysis.objectives.append(ClassifiedObjective(**current))
+
+    for raw_line in text.split('\n'):
+        line = raw_line.strip()
+
+        if _SEPARATOR_RE.match(line):
+            close_block()
+            current, block_has_content, block_bloom = {}, False, None
+            continue
+
+        if not line:
+            continue
+        block_has_content = True
+
+        if _BLOOM_MARKER in line:
+            level = line.split(_BLOOM_MARKER, 1)[1].strip()
+            analysis.bloom_levels.add(level.lower())
+            if block_bloom is None:
+                block_bloom = level
+
+        for prefix, key in _CLASSIFICATION_FIELDS:
+            if line.startswith(prefix):
+                current[key] = line[len(prefix):].strip()
+                break
+
+    close_block()
+    return analysis
+
+
+def parse_smart_objectives(text: str, analysis: Optional[ObjectiveAnalysis] = None) -> ObjectiveAnalysis:
+    """Analyse les objectifs SMART numérotés (un objectif se termine à une ligne vide ou au numéro suivant)"""
+    analysis = analysis if analysis is not None else ObjectiveAnalysis()
+    numero: Optional[int] = None
+    lines: List[str] = []
+
+    def close_item():
+        if numero is None:
+            return
+        content = '\n'.join(lines).strip()
+        lowered = content.lower()
+        week_match = _WEEK_RE.search(lowered)
+        verb_match = _VERB_RE.search(lowered)
+        analysis.smart_objectives.append(SmartObjective(
+            numero=numero,
+            objectif=content,
+            semaine=week_match.group(1) if week_match else None,
+            verbe=verb_match.group(1) if verb_match else None
+        ))
+        analysis.temporal_indicators += len(_TEMPORAL_RE.findall(content))
+
+    for line in text.split('\n'):
+        item_match = _NUMBERED_ITEM_RE.match(line)
+        if item_match:
+            close_item()
+            numero, lines = int(item_match.group(1)), [item_match.group(2)]
+        elif not line.strip():
+            close_item()
+            numero, lines = None, []
+        elif numero is not None:
+            lines.append(line)
+
+    close_item()
+    return analysis
+
+
+def parse_difficulty_evaluation(text: str, analysis: Optional[ObjectiveAnalysis] = None) -> ObjectiveAnalysis:
+    """
+    Analyse l'évaluation de difficulté avec une machine à états ligne par ligne.
+
+    Chaque bloc commence par une ligne « N. **Objectif : ...** » suivie des champs
+    Niveau de difficulté / Justification / Temps nécessaire / Conseils ; les lignes
+    sans préfixe de champ prolongent le champ précédent. Chaque ligne n'est lue
+    qu'une fois et aucun motif ne peut revenir en arrière : le coût est linéaire.
+    Un en-tête collé à la fin d'une ligne tronquée ouvre quand même un nouveau bloc.
+    Les blocs inexploitables sont listés dans analysis.difficulty_failures.
+    """
+    analysis = analysis if analysis is not None else ObjectiveAnalysis()
+    block: Optional[Dict[str, Any]] = None
+    last_field: Optional[str] = None
+
+    def close_block():
+        if block is None:
+            return
+
+        level = _leading_int(block['niveau'])
+        if not block['objectif']:
+            reason = "texte de l'objectif manquant"
+        elif block['niveau'] is None:
+            reason = "niveau de difficulté manquant"
+        elif level is None:
+            reason = f"niveau de difficulté illisible « {block['niveau'][:40]} »"
+        else:
+            analysis.difficulty_levels.add(level)
+            analysis.difficulties.append(DifficultyEntry(
+                numero=block['numero'],
+                objectif=block['objectif'],
+                niveau=level,
+                justification=block['justification'] or '',
+                temps=block['temps'] or ''
+            ))
+            return
+
+        analysis.difficulty_failures.append(ParseFailure(block['numero'], block['line'], reason))
+
+    for line_number, raw_line in enumerate(text.split('\n'), 1):
+        for low, high in _HOURS_RE.findall(raw_line):
+            analysis.total_hours += int(high) if high else int(low)
+
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        # Ligne lue en deux segments si un en-tête y est collé après un texte tronqué
+        glued = _glued_header_start(line)
+        segments = (line,) if glued == -1 else (line[:glued].rstrip(), line[glued:])
+        for line in segments:
+            header = _parse_difficulty_header(line)
+            if header is not None:
+                close_block()
+                numero, objectif = header
+                block = {
+                    'numero': numero, 'line': line_number, 'objectif': objectif,
+                    'niveau': None, 'justification': None, 'temps': None, 'conseils': None
+                }
+                last_field = 'objectif' if not objectif else None
+                continue
+
+            if block is None:
+                continue
+
+            field_name, value = _parse_difficulty_field(line)
+            if field_name is not None:
+                block[field_name] = value
+                last_field = field_name
+            elif last_field is not None:
+                # Ligne de continuation du champ précédent
+                continuation = line.strip(' *')
+                block[last_field] = f"{block[last_field]} {continuation}".strip() if block[last_field] else continuation
+
+    close_block()
+    return analysis
+
+
+def _parse_difficulty_header(line: str) -> Optional[tuple]:
+    """Reconnaît « N. **Objectif : texte** » et retourne (N, texte) ou None"""
+    digits_end = 0
+    while digits_end < len(line) and line[digits_end].isdigit():
+        digits_end += 1
+    if digits_end == 0 or digits_end >= len(line) or line[digits_end] != '.':
+        return None
+
+    rest = line[digits_end + 1:].lstrip(' *')
+    if not rest.startswith('Objectif'):
+        return None
+
+    rest = rest[len('Objectif'):].lstrip()
+    if not rest.startswith(':'):
+        return None
+
+    return int(line[:digits_end]), rest[1:].strip(' *')
+
+
+def _glued_header_start(line: str) -> int:
+    """Position d'un en-tête « N. **Objectif : » précédé d'autre texte sur la ligne, ou -1"""
+    at = line.find('Objectif', 1)
+    while at != -1:
+        end = at
+        while end > 0 and line[end - 1] in ' *':
+            end -= 1
+        if end > 1 and line[end - 1] == '.' and line[end - 2].isdigit():
+            start = end - 2
+            while start > 0 and line[start - 1].isdigit():
+                start -= 1
+            if start > 0 and line[at + len('Objectif'):].lstrip().startswith(':'):
+                return start
+        at = line.find('Objectif', at + 1)
+    return -1
+
+
+def _parse_difficulty_field(line: str) -> tuple:
+    """Reconnaît « - **Champ :** valeur » et retourne (clé, valeur) ou (None, None)"""
+    content = line.lstrip('-•* ')
+    for label, key in _DIFFICULTY_FIELDS:
+        if content.startswith(label):
+            rest = content[len(label):].lstrip(' *')
+            if rest.startswith(':'):
+                return key, rest[1:].strip(' *')
+    return None, None
+
+
+def _leading_int(value: Optional[str]) -> Optional[int]:
+    """Entier en tête de chaîne (« 3 » dans « 3 (moyen) »), ou None"""
+    if not value:
+        return None
+    digits_end = 0
+    while digits_end < len(value) and value[digits_end].isdigit():
+        digits_end += 1
+    return int(value[:digits_end]) if digits_end else None
+
+
+def _section_text(data: Dict[str, Any], key: str) -> Optional[str]:
+    """Retourne data[key][key] s'il s'agit d'un texte, sinon None"""
+    section = data.get(key)
+    if isinstance(section, dict) and isinstance(section.get(key), str):
+        return section[key]
+    return None
+
+
+def parse_input_data(data: Dict[str, Any]) -> ObjectiveAnalysis:
+    """Analyse en une seule passe les trois sections du format d'entrée"""
+    analysis = ObjectiveAnalysis()
+
+    classification = _section_text(data, 'classification')
+    if classification is not None:
+        parse_classification(classification, analysis)
+
+    formatted_objectives = _section_text(data, 'formatted_objectives')
+    if formatted_objectives is not None:
+        parse_smart_objectives(formatted_objectives, analysis)
+
+    difficulty_evaluation = _section_text(data, 'difficulty_evaluation')
+    if difficulty_evaluation is not None:
+        parse_difficulty_evaluation(difficulty_evaluation, analysis)
+
+    return analysis
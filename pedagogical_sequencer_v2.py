@@ -1,190 +1,527 @@
-from openai import OpenAI
-import streamlit as st
+import asyncio
 import json
-import re
-from typing import Dict, List, Any
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Any, Iterator, Optional, Tuple
+
+from json_stream import IncrementalJSONArrayParser
+from llm_cache import LLMCache, get_default_cache
+from llm_client import LLMClient
+from objective_index import ObjectiveIndex
+from objective_parser import ObjectiveAnalysis, parse_input_data
+from prompt_encoding import compact_text, encode_objectives_table, minify_json
+from sequencer_schema import SEQUENCER_SCHEMA, SKELETON_SCHEMA, response_format, split_valid_screens
+from tracing import get_tracer, record, span
+from config import GENERATION_CONFIG, PROMPT_CONFIG
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+@dataclass
+class GenerationReport:
+    """Compte rendu d'une génération : avertissements (écrans rejetés, réponses restées tronquées) et erreur bloquante"""
+    warnings: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+
+# Compte rendu de la génération en cours ; chaque tâche asyncio d'un lot a le sien
+_current_report: ContextVar[Optional[GenerationReport]] = ContextVar('generation_report', default=None)
+
 
 class PedagogicalSequencerV2:
-    def __init__(self, api_key: str):
-        """Initialise le générateur spécialisé avec la clé API OpenAI"""
-        self.client = OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[LLMCache] = None,
+        compact_prompt: Optional[bool] = None,
+        include_excerpts: Optional[bool] = None,
+        structured_output: Optional[bool] = None,
+        base_url: Optional[str] = None,
+        refresh: bool = False
+    ):
+        """
+        Initialise le générateur spécialisé avec la clé API OpenAI
         
-    def generate_sequencer(self, input_data: Dict[str, Any]) -> List[Dict[str, str]]:
+        compact_prompt : encodage compact des données d'analyse (tableau d'objectifs, JSON minifié)
+        include_excerpts : inclure les extraits bruts des textes d'entrée dans le prompt
+        structured_output : sortie contrainte par JSON Schema (response_format json_schema strict)
+        base_url : serveur compatible OpenAI à la place de l'API (ex. mock_llm_server pour les benchmarks)
+        refresh : régénérer sans relire le cache de réponses (reprise ignorée, --fresh)
+        """
+        self.api_key = api_key
+        self.compact_prompt = PROMPT_CONFIG["compact"] if compact_prompt is None else compact_prompt
+        self.include_excerpts = PROMPT_CONFIG["include_excerpts"] if include_excerpts is None else include_excerpts
+        self.structured_output = PROMPT_CONFIG["structured_output"] if structured_output is None else structured_output
+        self.max_continuations = GENERATION_CONFIG["max_continuations"]
+        # Compte rendu de la dernière génération synchrone terminée (interface, CLI) ;
+        # les générations concurrentes d'agenerate_batch retournent chacune le leur
+        self.last_report = GenerationReport()
+        self.llm = LLMClient(
+            api_key, cache=cache if cache is not None else get_default_cache(), base_url=base_url,
+            refresh=refresh
+        )
+    
+    @property
+    def client(self):
+        """Client OpenAI synchrone (créé au premier accès)"""
+        return self.llm.client
+    
+    @property
+    def generation_warnings(self) -> List[str]:
+        """Avertissements de la dernière génération synchrone (last_report)"""
+        return self.last_report.warnings
+    
+    @property
+    def last_error(self) -> Optional[str]:
+        """Erreur bloquante de la dernière génération synchrone (last_report)"""
+        return self.last_report.error
+    
+    @contextmanager
+    def _reporting(self, publish: bool = True) -> Iterator[GenerationReport]:
         """
-        Génère un séquenceur pédagogique à partir du nouveau format de données
+        Ouvre le compte rendu d'une génération, ou rejoint celui déjà ouvert dans ce contexte.
+        publish : le compte rendu devient last_report à la fin (générations synchrones uniquement).
         """
-        # Analyser les données d'entrée
-        analysis = self._analyze_input_data(input_data)
+        current = _current_report.get()
+        if current is not None:
+            yield current
+            return
         
-        # Créer le prompt spécialisé
-        prompt = self._create_specialized_prompt(input_data, analysis)
+        report = GenerationReport()
+        token = _current_report.set(report)
+        try:
+            yield report
+        finally:
+            try:
+                _current_report.reset(token)
+            except ValueError:
+                # Générateur fermé depuis un autre contexte (ramasse-miettes) : rien à restaurer
+                pass
+            if publish:
+                self.last_report = report
+    
+    def _report(self) -> GenerationReport:
+        """Compte rendu de la génération en cours (last_report hors génération)"""
+        return _current_report.get() or self.last_report
+        
+    def generate_sequencer(self, input_data: Dict[str, Any], parsed: Optional[ObjectiveAnalysis] = None) -> List[Dict[str, str]]:
+        """
+        Génère un séquenceur pédagogique à partir du nouveau format de données.
+        En cas d'échec, retourne [] et décrit l'erreur dans last_error.
+        Les temps par étape sont consignés dans une exécution 'sequenceur' (tracing).
+        """
+        with get_tracer().run('sequenceur', mode='standard'), self._reporting():
+            return self._generate_sequencer(input_data, parsed)
+    
+    def _generate_sequencer(self, input_data: Dict[str, Any], parsed: Optional[ObjectiveAnalysis]) -> List[Dict[str, str]]:
+        # Analyser les données d'entrée et construire la requête
+        analysis, messages = self._prepare_request(input_data, parsed)
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": self._get_specialized_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=4000
-            )
-            
-            # Parser la réponse pour extraire le JSON
-            content = response.choices[0].message.content
-            sequencer_data = self._parse_response(content)
+            # Appel, puis continuations si la réponse est tronquée par max_tokens
+            sequencer_data = self._complete_screens(messages)
             
             # Enrichir avec les métadonnées analysées
             enriched_data = self._enrich_with_metadata(sequencer_data, analysis)
             
             return enriched_data
             
+        except json.JSONDecodeError as e:
+            self._report().error = f"Erreur de parsing JSON : {str(e)} — contenu reçu : {e.doc.strip()[:500]}..."
+            return []
         except Exception as e:
-            st.error(f"Erreur lors de la génération : {str(e)}")
+            self._report().error = f"Erreur lors de la génération : {str(e)}"
             return []
     
-    def _analyze_input_data(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyse approfondie des données d'entrée du nouveau format"""
-        analysis = {
-            'domain': None,
-            'objectives': [],
-            'bloom_distribution': {},
-            'difficulty_mapping': {},
-            'temporal_progression': [],
-            'estimated_total_hours': 0
-        }
+    def generate_sequencer_stream(self, input_data: Dict[str, Any], parsed: Optional[ObjectiveAnalysis] = None) -> Iterator[Dict[str, str]]:
+        """
+        Génère le séquenceur en streaming : chaque écran est enrichi et retourné
+        dès que son objet JSON est complet, sans attendre la fin de la réponse.
+        Le parsing et l'enrichissement, entrelacés avec la réception, sont cumulés
+        et consignés une fois à la fin du flux.
+        """
+        with get_tracer().run('sequenceur', mode='stream'), self._reporting():
+            yield from self._generate_sequencer_stream(input_data, parsed)
+    
+    def _generate_sequencer_stream(
+        self,
+        input_data: Dict[str, Any],
+        parsed: Optional[ObjectiveAnalysis]
+    ) -> Iterator[Dict[str, str]]:
+        analysis, messages = self._prepare_request(input_data, parsed)
+        objective_index = ObjectiveIndex(analysis['objectives'])
+        screens: List[Dict[str, str]] = []
+        parser_errors: List[str] = []
+        request_messages = messages
+        parse_seconds = enrich_seconds = 0.0
         
-        # Analyser la classification
-        if 'classification' in input_data and 'classification' in input_data['classification']:
-            analysis['objectives'] = self._extract_objectives_from_classification(
-                input_data['classification']['classification']
-            )
-            analysis['bloom_distribution'] = self._analyze_bloom_distribution(analysis['objectives'])
+        try:
+            for attempt in range(self.max_continuations + 1):
+                parser = IncrementalJSONArrayParser()
+                params = self._completion_params(request_messages)
+                stream = self.llm.stream(**params)
+                added = 0
+                for chunk in stream:
+                    start = time.perf_counter()
+                    items = self._check_screens(parser.feed(chunk))
+                    parse_seconds += time.perf_counter() - start
+                    for item in items:
+                        if self._merge_screens(screens, [item]):
+                            added += 1
+                            start = time.perf_counter()
+                            enriched = self._enrich_item(item, analysis, objective_index)
+                            enrich_seconds += time.perf_counter() - start
+                            yield enriched
+                parser_errors.extend(parser.errors)
+                if not added:
+                    # Aucun écran exploitable : la réponse ne doit pas resservir depuis le cache
+                    self.llm.discard(params)
+                
+                if stream.finish_reason != 'length' or not added:
+                    break
+                # Réponse tronquée : reprise après le dernier écran complet
+                request_messages = self._continuation_messages(messages, screens)
+            
+            self._warn_if_truncated(stream.finish_reason, screens)
+        except Exception as e:
+            self._report().error = f"Erreur lors de la génération : {str(e)}"
+            return
+        finally:
+            record('parse', parse_seconds)
+            record('enrich', enrich_seconds)
+        
+        report = self._report()
+        report.warnings[:0] = parser_errors
+        if not screens:
+            report.error = "Erreur de parsing JSON : aucun écran reçu dans la réponse"
+    
+    def generate_batch(self, inputs: List[Dict[str, Any]], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Génère les séquenceurs d'un lot de fichiers d'entrée avec une concurrence bornée.
+        Point d'entrée synchrone de agenerate_batch (ne pas appeler depuis une boucle asyncio).
+        """
+        return asyncio.run(self.agenerate_batch(inputs, max_concurrency))
+    
+    async def agenerate_batch(self, inputs: List[Dict[str, Any]], max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Génère les séquenceurs d'un lot de données d'entrée en parallèle.
         
-        # Analyser les objectifs formatés
-        if 'formatted_objectives' in input_data and 'formatted_objectives' in input_data['formatted_objectives']:
-            analysis['temporal_progression'] = self._extract_temporal_progression(
-                input_data['formatted_objectives']['formatted_objectives']
-            )
+        Le nombre de requêtes en vol est réglé par le contrôleur de concurrence adaptatif
+        du client ; max_concurrency ajoute un plafond fixe facultatif. Les résultats sont
+        retournés dans l'ordre des entrées, un dictionnaire par entrée :
+        {'index', 'success', 'sequencer', 'error', 'warnings'}, avec le compte rendu
+        propre à l'entrée. Une erreur sur une entrée n'interrompt pas le reste du lot.
+        """
+        semaphore = self._concurrency_cap(max_concurrency, default=8)
+        
+        async with self.llm.async_client() as async_client:
+            async def run_one(index: int, input_data: Dict[str, Any]) -> Dict[str, Any]:
+                # Une exécution tracée par entrée (chaque tâche a son propre contexte)
+                async with semaphore:
+                    with self._reporting(publish=False) as report:
+                        try:
+                            with get_tracer().run('sequenceur', mode='batch', index=index):
+                                sequencer_data = await self.agenerate_sequencer(input_data, async_client)
+                            return {
+                                'index': index, 'success': True, 'sequencer': sequencer_data,
+                                'error': None, 'warnings': report.warnings
+                            }
+                        except Exception as e:
+                            return {
+                                'index': index, 'success': False, 'sequencer': [],
+                                'error': str(e), 'warnings': report.warnings
+                            }
+            
+            return await asyncio.gather(*(run_one(i, data) for i, data in enumerate(inputs)))
+    
+    def _concurrency_cap(self, max_concurrency: Optional[int], default: int):
+        """
+        Plafond fixe de tâches simultanées : max_concurrency s'il est fourni, sinon aucun
+        si le contrôleur adaptatif est actif, et default à défaut
+        """
+        if max_concurrency is None and self.llm.concurrency is not None:
+            return nullcontext()
+        limit = default if max_concurrency is None else max_concurrency
+        if limit < 1:
+            raise ValueError("max_concurrency doit être supérieur ou égal à 1")
+        return asyncio.Semaphore(limit)
+    
+    async def agenerate_sequencer(self, input_data: Dict[str, Any], async_client: 'AsyncOpenAI') -> List[Dict[str, str]]:
+        """
+        Version asynchrone de generate_sequencer.
+        Lève une exception au lieu d'afficher l'erreur dans Streamlit.
+        """
+        analysis, messages = self._prepare_request(input_data)
         
-        # Analyser l'évaluation de difficulté
-        if 'difficulty_evaluation' in input_data and 'difficulty_evaluation' in input_data['difficulty_evaluation']:
-            analysis['difficulty_mapping'] = self._extract_difficulty_mapping(
-                input_data['difficulty_evaluation']['difficulty_evaluation']
-            )
-            analysis['estimated_total_hours'] = self._calculate_total_hours(
-                input_data['difficulty_evaluation']['difficulty_evaluation']
-            )
+        sequencer_data = await self._acomplete_screens(messages, async_client)
+        if not sequencer_data:
+            raise ValueError("La réponse ne contient aucun écran")
         
-        # Détection du domaine via LLM plutôt que par mots-clés
-        analysis['domain'] = "Domaine à détecter automatiquement par le LLM"
+        return self._enrich_with_metadata(sequencer_data, analysis)
+    
+    def generate_sequencer_mapreduce(
+        self,
+        input_data: Dict[str, Any],
+        max_concurrency: Optional[int] = None,
+        parsed: Optional[ObjectiveAnalysis] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Génère le séquenceur en deux phases : un squelette des séquences, puis les
+        écrans de chaque séquence en parallèle. La latence est proche de celle de la
+        séquence la plus longue et la sortie n'est plus limitée par un seul max_tokens.
+        """
+        # asyncio.run copie le contexte : les tâches des séquences rejoignent l'exécution et le compte rendu
+        with self._reporting() as report:
+            try:
+                with get_tracer().run('sequenceur', mode='mapreduce'):
+                    return asyncio.run(self.agenerate_sequencer_mapreduce(input_data, max_concurrency, parsed))
+            except Exception as e:
+                report.error = f"Erreur lors de la génération : {str(e)}"
+                return []
+    
+    async def agenerate_sequencer_mapreduce(
+        self,
+        input_data: Dict[str, Any],
+        max_concurrency: Optional[int] = None,
+        parsed: Optional[ObjectiveAnalysis] = None
+    ) -> List[Dict[str, str]]:
+        """Version asynchrone de generate_sequencer_mapreduce (lève une exception en cas d'échec)"""
+        analysis = self._analyze_input_data(input_data, parsed)
+        semaphore = self._concurrency_cap(max_concurrency, default=6)
+        
+        async with self.llm.async_client() as async_client:
+            # Phase 1 : squelette des séquences (appel court)
+            skeleton = await self._agenerate_skeleton(analysis, async_client)
+            
+            # Phase 2 : écrans de chaque séquence en parallèle
+            async def run_sequence(index: int) -> List[Dict[str, str]]:
+                async with semaphore:
+                    return await self._agenerate_sequence_screens(input_data, analysis, skeleton, index, async_client)
+            
+            screens_by_sequence = await asyncio.gather(*(run_sequence(i) for i in range(len(skeleton))))
         
-        return analysis
+        return self._stitch_sequences(skeleton, screens_by_sequence, analysis)
+    
+    async def _agenerate_skeleton(self, analysis: Dict[str, Any], async_client: 'AsyncOpenAI') -> List[Dict[str, Any]]:
+        """Génère le squelette du séquenceur : séquences, niveau Bloom et objectifs couverts"""
+        with span('prompt_build'):
+            messages = [
+                {"role": "system", "content": self._get_skeleton_system_prompt()},
+                {"role": "user", "content": self._create_skeleton_prompt(analysis)}
+            ]
+        
+        max_tokens = 1000
+        params = self._completion_params(messages, max_tokens, schema_name="plan_sequenceur", schema=SKELETON_SCHEMA)
+        response = await self.llm.acomplete(async_client, **params)
+        # Plan tronqué par max_tokens : nouvelle requête avec un budget doublé, le plan étant court
+        for _ in range(self.max_continuations):
+            if response['finish_reason'] != 'length':
+                break
+            max_tokens *= 2
+            params = self._completion_params(messages, max_tokens, schema_name="plan_sequenceur", schema=SKELETON_SCHEMA)
+            response = await self.llm.acomplete(async_client, **params)
+        try:
+            with span('parse'):
+                if response['finish_reason'] == 'length':
+                    # Toujours tronqué : seules les séquences complètes du plan sont gardées
+                    entries = IncrementalJSONArrayParser().feed(response['content'])
+                    self._report().warnings.append(
+                        f"Plan des séquences tronqué par max_tokens : {len(entries)} séquence(s) complète(s) conservée(s)"
+                    )
+                else:
+                    entries = self._parse_json_content(response['content'])
+                skeleton = [entry for entry in entries if isinstance(entry, dict) and entry.get('sequence')]
+        except json.JSONDecodeError:
+            self.llm.discard(params)
+            raise
+        
+        if not skeleton:
+            self.llm.discard(params)
+            raise ValueError("Le squelette généré ne contient aucune séquence")
+        
+        return skeleton
+    
+    async def _agenerate_sequence_screens(
+        self,
+        input_data: Dict[str, Any],
+        analysis: Dict[str, Any],
+        skeleton: List[Dict[str, Any]],
+        index: int,
+        async_client: 'AsyncOpenAI'
+    ) -> List[Dict[str, str]]:
+        """Génère les écrans d'une séquence du squelette"""
+        with span('prompt_build', sequence=index):
+            messages = [
+                {"role": "system", "content": self._get_specialized_system_prompt()},
+                {"role": "user", "content": self._create_sequence_prompt(input_data, analysis, skeleton, index)}
+            ]
+        
+        screens = await self._acomplete_screens(messages, async_client, max_tokens=2000)
+        
+        if not screens:
+            raise ValueError(f"Aucun écran généré pour la séquence « {skeleton[index]['sequence']} »")
+        
+        return screens
     
-    def _extract_objectives_from_classification(self, classification_text: str) -> List[Dict[str, str]]:
-        """Extrait les objectifs détaillés de la classification"""
-        objectives = []
+    def _get_skeleton_system_prompt(self) -> str:
+        """Prompt système de la phase squelette"""
+        return """
+        Vous êtes un expert en ingénierie pédagogique. Vous concevez le plan d'un séquenceur
+        pédagogique à partir d'objectifs classés selon la taxonomie de Bloom.
         
-        # Diviser par les séparateurs "---"
-        objective_blocks = classification_text.split('---')
+        RÈGLES :
+        - Prévoyez 5 à 7 séquences, de l'introduction à l'évaluation finale
+        - Ordonnez les séquences selon la progression Bloom et la progression temporelle
+        - Chaque objectif doit être couvert par au moins une séquence
         
-        for block in objective_blocks:
-            if block.strip():
-                objective = {}
-                lines = block.strip().split('\n')
-                
-                for line in lines:
-                    line = line.strip()
-                    if line.startswith('Objectif:'):
-                        objective['objectif'] = line.replace('Objectif:', '').strip()
-                    elif line.startswith('Verbe principal:'):
-                        objective['verbe'] = line.replace('Verbe principal:', '').strip()
-                    elif line.startswith('Niveau de Bloom:'):
-                        objective['bloom'] = line.replace('Niveau de Bloom:', '').strip()
-                    elif line.startswith('Justification:'):
-                        objective['justification'] = line.replace('Justification:', '').strip()
-                
-                if objective.get('objectif'):
-                    objectives.append(objective)
-        
-        return objectives
-    
-    def _analyze_bloom_distribution(self, objectives: List[Dict[str, str]]) -> Dict[str, int]:
-        """Analyse la distribution des niveaux de Bloom"""
-        distribution = {}
-        
-        for obj in objectives:
-            bloom_level = obj.get('bloom', '').lower()
-            # Normaliser les niveaux
-            if 'comprendre' in bloom_level:
-                bloom_level = 'comprendre'
-            elif 'analyser' in bloom_level or 'analyse' in bloom_level:
-                bloom_level = 'analyser'
-            elif 'évaluer' in bloom_level or 'evaluer' in bloom_level:
-                bloom_level = 'evaluer'
-            elif 'appliquer' in bloom_level:
-                bloom_level = 'appliquer'
-            elif 'créer' in bloom_level or 'creer' in bloom_level:
-                bloom_level = 'creer'
-            elif 'se souvenir' in bloom_level or 'souvenir' in bloom_level:
-                bloom_level = 'se_souvenir'
-            
-            distribution[bloom_level] = distribution.get(bloom_level, 0) + 1
+        FORMAT DE SORTIE :
+        Retournez UNIQUEMENT un JSON valide avec un array d'objets contenant :
+        - sequence : Nom de la séquence
+        - role : Rôle de la séquence dans le parcours (introduction, apport, application, évaluation...)
+        - niveau_bloom : Niveau taxonomique principal
+        - objectifs_couverts : Liste des numéros des objectifs couverts
+        - nombre_ecrans : Nombre d'écrans prévus (2 à 8)
+        """
+    
+    def _create_skeleton_prompt(self, analysis: Dict[str, Any]) -> str:
+        """Prompt de la phase squelette : liste compacte des objectifs"""
+        objectives = '\n'.join(
+            f"{i}. [{obj.get('bloom', '?')}] {obj.get('objectif', '')}"
+            for i, obj in enumerate(analysis['objectives'], 1)
+        )
+        
+        return f"""
+        Concevez le plan du séquenceur pédagogique pour ces {len(analysis['objectives'])} objectifs :
+        
+        {objectives}
+        
+        **DISTRIBUTION DES NIVEAUX DE BLOOM :** {json.dumps(analysis['bloom_distribution'], ensure_ascii=False)}
+        **ESTIMATION TOTALE :** {analysis['estimated_total_hours']} heures de formation
         
-        return distribution
+        Retournez UNIQUEMENT le JSON du plan.
+        """
     
-    def _extract_temporal_progression(self, formatted_objectives: str) -> List[Dict[str, str]]:
-        """Extrait la progression temporelle des objectifs SMART"""
-        progression = []
+    def _create_sequence_prompt(
+        self,
+        input_data: Dict[str, Any],
+        analysis: Dict[str, Any],
+        skeleton: List[Dict[str, Any]],
+        index: int
+    ) -> str:
+        """Prompt de la phase séquence : écrans d'une seule séquence du plan"""
+        sequence = skeleton[index]
+        plan = '\n'.join(
+            f"{i}. {entry['sequence']} ({entry.get('role', '')})"
+            for i, entry in enumerate(skeleton, 1)
+        )
+        
+        covered = []
+        for number in sequence.get('objectifs_couverts') or []:
+            try:
+                covered.append(analysis['objectives'][int(number) - 1])
+            except (ValueError, TypeError, IndexError):
+                continue
+        if not covered:
+            covered = analysis['objectives']
         
-        # Extraire les objectifs numérotés
-        pattern = r'(\d+)\.\s*(.*?)(?=\n\n|\n\d+\.|\Z)'
-        matches = re.findall(pattern, formatted_objectives, re.DOTALL)
+        return f"""
+        Voici le plan complet du séquenceur :
+        {plan}
         
-        for num, content in matches:
-            # Extraire la semaine si mentionnée
-            week_match = re.search(r'semaine (\d+)', content)
-            week = week_match.group(1) if week_match else None
+        Créez UNIQUEMENT les écrans de la séquence {index + 1} : « {sequence['sequence']} »
+        - Rôle : {sequence.get('role', 'Non défini')}
+        - Niveau de Bloom principal : {sequence.get('niveau_bloom', 'Non défini')}
+        - Nombre d'écrans : {sequence.get('nombre_ecrans', 4)}
+        
+        **OBJECTIFS COUVERTS PAR CETTE SÉQUENCE :**
+        {json.dumps(covered, indent=2, ensure_ascii=False)}
+        
+        **MAPPING DES DIFFICULTÉS :**
+        {json.dumps(analysis['difficulty_mapping'], indent=2, ensure_ascii=False)}
+        
+        **CONTENU POUR ANALYSE DU DOMAINE :**
+        Classification: {input_data.get('classification', {}).get('classification', '')[:500]}...
+        
+        Le champ sequence de chaque écran doit valoir exactement « {sequence['sequence']} ».
+        Retournez UNIQUEMENT le JSON structuré des écrans de cette séquence.
+        """
+    
+    def _stitch_sequences(
+        self,
+        skeleton: List[Dict[str, Any]],
+        screens_by_sequence: List[List[Dict[str, str]]],
+        analysis: Dict[str, Any]
+    ) -> List[Dict[str, str]]:
+        """Assemble les écrans des séquences dans l'ordre du plan et renumérote num_ecran"""
+        sequencer_data = []
+        
+        for seq_number, (sequence, screens) in enumerate(zip(skeleton, screens_by_sequence), 1):
+            prefix = 'Intro' if seq_number == 1 else 'Seq'
             
-            progression.append({
-                'numero': num,
-                'objectif': content.strip(),
-                'semaine': week
-            })
-        
-        return progression
-    
-    def _extract_difficulty_mapping(self, difficulty_text: str) -> Dict[str, Any]:
-        """Extrait le mapping des difficultés"""
-        mapping = {}
-        
-        # Extraire les niveaux de difficulté
-        pattern = r'(\d+)\.\s*\*\*Objectif\s*:\s*(.*?)\*\*.*?Niveau de difficulté\s*:\s*(\d+).*?Temps nécessaire\s*:\s*(.*?)(?=\n\s*-|\n\n|\Z)'
-        matches = re.findall(pattern, difficulty_text, re.DOTALL)
-        
-        for num, objectif, niveau, temps in matches:
-            mapping[objectif.strip()] = {
-                'niveau': int(niveau),
-                'temps': temps.strip(),
-                'numero': num
-            }
-        
-        return mapping
-    
-    def _calculate_total_hours(self, difficulty_text: str) -> int:
-        """Calcule le nombre total d'heures estimées"""
-        # Extraire tous les temps mentionnés
-        time_pattern = r'(\d+)-?(\d+)?\s*heures?'
-        matches = re.findall(time_pattern, difficulty_text)
-        
-        total_hours = 0
-        for match in matches:
-            if match[1]:  # Range (ex: 10-15 heures)
-                total_hours += int(match[1])  # Prendre la valeur haute
-            else:  # Valeur unique
-                total_hours += int(match[0])
-        
-        return total_hours
+            for screen_number, screen in enumerate(screens, 1):
+                item = dict(screen)
+                item['sequence'] = sequence['sequence']
+                item['num_ecran'] = f"{seq_number:02d}-{prefix}-{screen_number:02d}"
+                if 'niveau_bloom' not in item and sequence.get('niveau_bloom'):
+                    item['niveau_bloom'] = sequence['niveau_bloom']
+                sequencer_data.append(item)
+        
+        return self._enrich_with_metadata(sequencer_data, analysis)
+    
+    def _prepare_request(
+        self,
+        input_data: Dict[str, Any],
+        parsed: Optional[ObjectiveAnalysis] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, str]]]:
+        """Analyse les données d'entrée et construit les messages de la requête"""
+        analysis = self._analyze_input_data(input_data, parsed)
+        
+        with span('prompt_build'):
+            prompt = self._create_specialized_prompt(input_data, analysis)
+            
+            system_prompt = self._get_specialized_system_prompt()
+            if self.compact_prompt:
+                system_prompt = compact_text(system_prompt)
+            
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ]
+        
+        return analysis, messages
+    
+    def _completion_params(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 4000,
+        schema_name: str = "sequenceur",
+        schema: Dict[str, Any] = SEQUENCER_SCHEMA
+    ) -> Dict[str, Any]:
+        """Paramètres de l'appel chat.completions pour le séquenceur"""
+        params = {
+            "model": "gpt-4o-mini",
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": max_tokens
+        }
+        if self.structured_output:
+            params["response_format"] = response_format(schema_name, schema)
+        return params
+    
+    def _analyze_input_data(self, input_data: Dict[str, Any], parsed: Optional[ObjectiveAnalysis] = None) -> Dict[str, Any]:
+        """
+        Analyse approfondie des données d'entrée du nouveau format
+        
+        parsed : analyse déjà calculée par parse_input_data (évite de ré-analyser les textes)
+        """
+        with span('analysis'):
+            if parsed is None:
+                parsed = parse_input_data(input_data)
+            
+            # Détection du domaine via LLM plutôt que par mots-clés
+            return parsed.to_analysis_dict()
     
     def _get_specialized_system_prompt(self) -> str:
         """Prompt système spécialisé pour le nouveau format"""
@@ -268,33 +605,18 @@ class PedagogicalSequencerV2:
         - commentaire : Notes pédagogiques et instructions techniques
         """
     
-    def _create_specialized_prompt(self, input_data: Dict[str, Any], analysis: Dict[str, Any]) -> str:
-        """Crée un prompt spécialisé basé sur l'analyse"""
-        
-        return f"""
-        Créez un séquenceur pédagogique détaillé basé sur cette analyse d'objectifs :
+    def _get_specialized_instructions(self) -> str:
+        """
+        Consignes statiques du prompt utilisateur.
+        Placées avant les données variables pour que le préfixe des messages
+        (system + consignes) soit identique d'un appel à l'autre (cache de préfixe).
+        """
+        return """
+        Créez un séquenceur pédagogique détaillé basé sur l'analyse d'objectifs fournie à la fin de ce message.
 
         **ANALYSE AUTOMATIQUE DU DOMAINE :**
         Détectez automatiquement le domaine d'expertise à partir du contenu des objectifs et adaptez le séquenceur en conséquence.
 
-        **OBJECTIFS ANALYSÉS ({len(analysis['objectives'])} objectifs) :**
-        {json.dumps(analysis['objectives'], indent=2, ensure_ascii=False)}
-
-        **DISTRIBUTION DES NIVEAUX DE BLOOM :**
-        {json.dumps(analysis['bloom_distribution'], indent=2, ensure_ascii=False)}
-
-        **PROGRESSION TEMPORELLE :**
-        {json.dumps(analysis['temporal_progression'], indent=2, ensure_ascii=False)}
-
-        **MAPPING DES DIFFICULTÉS :**
-        {json.dumps(analysis['difficulty_mapping'], indent=2, ensure_ascii=False)}
-
-        **ESTIMATION TOTALE :** {analysis['estimated_total_hours']} heures de formation
-
-        **CONTENU COMPLET POUR ANALYSE DU DOMAINE :**
-        Classification: {input_data.get('classification', {}).get('classification', '')[:500]}...
-        Objectifs: {input_data.get('formatted_objectives', {}).get('formatted_objectives', '')[:500]}...
-
         INSTRUCTIONS SPÉCIALISÉES :
         1. **DÉTECTION AUTOMATIQUE DU DOMAINE** : Analysez le contenu pour identifier le domaine d'expertise et adaptez :
            - La terminologie spécialisée du secteur
@@ -324,54 +646,250 @@ class PedagogicalSequencerV2:
         - Évaluations formatives régulières adaptées au domaine
         - Synthèse et évaluation finale contextualisée
 
+        """
+    
+    def _create_specialized_prompt(self, input_data: Dict[str, Any], analysis: Dict[str, Any]) -> str:
+        """Crée un prompt spécialisé basé sur l'analyse : consignes statiques puis données variables"""
+        
+        if self.compact_prompt:
+            analysis_section = f"""
+        **OBJECTIFS ANALYSÉS ({len(analysis['objectives'])} objectifs) :**
+        {encode_objectives_table(analysis)}
+
+        **DISTRIBUTION DES NIVEAUX DE BLOOM :** {minify_json(analysis['bloom_distribution'])}
+        """
+        else:
+            analysis_section = f"""
+        **OBJECTIFS ANALYSÉS ({len(analysis['objectives'])} objectifs) :**
+        {json.dumps(analysis['objectives'], indent=2, ensure_ascii=False)}
+
+        **DISTRIBUTION DES NIVEAUX DE BLOOM :**
+        {json.dumps(analysis['bloom_distribution'], indent=2, ensure_ascii=False)}
+
+        **PROGRESSION TEMPORELLE :**
+        {json.dumps(analysis['temporal_progression'], indent=2, ensure_ascii=False)}
+
+        **MAPPING DES DIFFICULTÉS :**
+        {json.dumps(analysis['difficulty_mapping'], indent=2, ensure_ascii=False)}
+        """
+        
+        excerpts_section = ""
+        if self.include_excerpts:
+            excerpts_section = f"""
+        **CONTENU COMPLET POUR ANALYSE DU DOMAINE :**
+        Classification: {input_data.get('classification', {}).get('classification', '')[:500]}...
+        Objectifs: {input_data.get('formatted_objectives', {}).get('formatted_objectives', '')[:500]}...
+        """
+        
+        prompt = self._get_specialized_instructions() + f"""
+        ANALYSE D'OBJECTIFS :
+        {analysis_section}
+        **ESTIMATION TOTALE :** {analysis['estimated_total_hours']} heures de formation
+        {excerpts_section}
         Retournez UNIQUEMENT le JSON structuré.
         """
+        
+        return compact_text(prompt) if self.compact_prompt else prompt
+    
+    def _complete_screens(self, messages: List[Dict[str, str]], max_tokens: int = 4000) -> List[Dict[str, str]]:
+        """
+        Génère les écrans d'une requête. Si la réponse est tronquée par max_tokens,
+        des requêtes de continuation reprennent après le dernier écran complet et
+        leurs écrans sont fusionnés, sans régénérer ceux déjà produits.
+        """
+        params = self._completion_params(messages, max_tokens)
+        response = self.llm.complete(**params)
+        screens = self._extract_screens_or_discard(response, params)
+        
+        for _ in range(self.max_continuations):
+            if response['finish_reason'] != 'length' or not screens:
+                break
+            params = self._completion_params(self._continuation_messages(messages, screens), max_tokens)
+            response = self.llm.complete(**params)
+            if not self._merge_screens(screens, self._extract_continuation(response, params)):
+                break
+        
+        self._warn_if_truncated(response['finish_reason'], screens)
+        return screens
+    
+    async def _acomplete_screens(
+        self,
+        messages: List[Dict[str, str]],
+        async_client: 'AsyncOpenAI',
+        max_tokens: int = 4000
+    ) -> List[Dict[str, str]]:
+        """Version asynchrone de _complete_screens"""
+        params = self._completion_params(messages, max_tokens)
+        response = await self.llm.acomplete(async_client, **params)
+        screens = self._extract_screens_or_discard(response, params)
+        
+        for _ in range(self.max_continuations):
+            if response['finish_reason'] != 'length' or not screens:
+                break
+            params = self._completion_params(self._continuation_messages(messages, screens), max_tokens)
+            response = await self.llm.acomplete(async_client, **params)
+            if not self._merge_screens(screens, self._extract_continuation(response, params)):
+                break
+        
+        self._warn_if_truncated(response['finish_reason'], screens)
+        return screens
     
-    def _parse_response(self, content: str) -> List[Dict[str, str]]:
-        """Parse la réponse de l'IA et extrait le JSON"""
+    def _extract_screens(self, response: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Écrans d'une réponse ; une réponse tronquée ne livre que ses objets JSON complets"""
+        with span('parse'):
+            if response['finish_reason'] == 'length':
+                return self._check_screens(IncrementalJSONArrayParser().feed(response['content']))
+            return self._parse_screens(response['content'])
+    
+    def _extract_screens_or_discard(self, response: Dict[str, Any], params: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Écrans de la réponse à params ; une réponse inexploitable (JSON invalide, aucun écran
+        valide) est retirée du cache pour qu'une nouvelle génération interroge à nouveau l'API
+        """
         try:
-            # Nettoyer le contenu
-            content = content.strip()
-            
-            # Chercher le JSON dans la réponse
-            start_idx = content.find('[')
-            end_idx = content.rfind(']') + 1
-            
-            if start_idx != -1 and end_idx != -1:
-                json_str = content[start_idx:end_idx]
-                return json.loads(json_str)
-            else:
-                # Fallback: essayer de parser toute la réponse
-                return json.loads(content)
-                
+            screens = self._extract_screens(response)
+        except json.JSONDecodeError:
+            self.llm.discard(params)
+            raise
+        if not screens:
+            self.llm.discard(params)
+        return screens
+    
+    def _extract_continuation(self, response: Dict[str, Any], params: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Écrans d'une réponse de continuation : un échec de parsing conserve les écrans déjà obtenus"""
+        try:
+            return self._extract_screens_or_discard(response, params)
         except json.JSONDecodeError as e:
-            st.error(f"Erreur de parsing JSON : {str(e)}")
-            st.error(f"Contenu reçu : {content[:500]}...")
+            self._report().warnings.append(f"Continuation ignorée, JSON invalide : {str(e)}")
             return []
     
+    def _continuation_messages(
+        self,
+        messages: List[Dict[str, str]],
+        screens: List[Dict[str, str]]
+    ) -> List[Dict[str, str]]:
+        """
+        Messages d'une requête de continuation : la requête d'origine (préfixe inchangé),
+        les écrans déjà produits en réponse de l'assistant, puis la consigne de reprise.
+        """
+        last_screen = screens[-1].get('num_ecran', str(len(screens)))
+        return messages + [
+            {"role": "assistant", "content": minify_json({"ecrans": screens})},
+            {"role": "user", "content": (
+                f"Votre réponse a été interrompue par la limite de longueur après l'écran {last_screen} "
+                f"({len(screens)} écrans). Poursuivez le séquenceur à partir de l'écran suivant, sans "
+                "répéter les écrans déjà produits, et retournez UNIQUEMENT les écrans restants au même format JSON."
+            )}
+        ]
+    
+    def _merge_screens(self, screens: List[Dict[str, str]], new_screens: List[Dict[str, str]]) -> int:
+        """Ajoute à screens les écrans dont le num_ecran est nouveau ; retourne le nombre d'ajouts"""
+        known = {screen.get('num_ecran') for screen in screens}
+        added = 0
+        for screen in new_screens:
+            number = screen.get('num_ecran')
+            if number and number in known:
+                continue
+            known.add(number)
+            screens.append(screen)
+            added += 1
+        return added
+    
+    def _warn_if_truncated(self, finish_reason: Optional[str], screens: List[Dict[str, str]]) -> None:
+        if finish_reason == 'length':
+            self._report().warnings.append(
+                f"Réponse tronquée par max_tokens malgré les continuations : "
+                f"séquenceur partiel ({len(screens)} écrans)"
+            )
+    
+    def _parse_screens(self, content: str) -> List[Dict[str, str]]:
+        """Extrait les écrans de la réponse et écarte ceux qui ne respectent pas le schéma"""
+        return self._check_screens(self._parse_json_content(content))
+    
+    def _check_screens(self, screens: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Validation locale contre SCREEN_SCHEMA en mode structured_output.
+        Les écrans invalides sont écartés et signalés dans le compte rendu de la génération.
+        """
+        if not self.structured_output:
+            return screens
+        valid, errors = split_valid_screens(screens)
+        self._report().warnings.extend(f"Écran ignoré : {error}" for error in errors)
+        return valid
+    
+    def _parse_json_content(self, content: str) -> List[Dict[str, str]]:
+        """
+        Extrait le tableau JSON de la réponse (lève json.JSONDecodeError en cas d'échec).
+        Accepte aussi l'objet englobant des sorties structurées ({"ecrans": [...]}).
+        """
+        # Nettoyer le contenu
+        content = (content or '').strip()
+        
+        # Sortie structurée : objet racine dont l'unique champ est le tableau
+        if content.startswith('{'):
+            try:
+                data = json.loads(content)
+            except json.JSONDecodeError:
+                data = None
+            if isinstance(data, dict) and len(data) == 1 and isinstance(next(iter(data.values())), list):
+                return next(iter(data.values()))
+        
+        # Chercher le JSON dans la réponse
+        start_idx = content.find('[')
+        end_idx = content.rfind(']') + 1
+        
+        if start_idx != -1 and end_idx > start_idx:
+            json_str = content[start_idx:end_idx]
+            return json.loads(json_str)
+        else:
+            # Fallback: essayer de parser toute la réponse
+            return json.loads(content)
+    
     def _enrich_with_metadata(self, sequencer_data: List[Dict[str, str]], analysis: Dict[str, Any]) -> List[Dict[str, str]]:
         """Enrichit les données du séquenceur avec les métadonnées d'analyse"""
-        enriched_data = []
-        
-        for item in sequencer_data:
-            enriched_item = item.copy()
-            
-            # Ajouter des métadonnées par défaut si manquantes
-            if 'niveau_bloom' not in enriched_item:
-                enriched_item['niveau_bloom'] = self._infer_bloom_level(item.get('type_activite', ''))
+        with span('enrich', screens=len(sequencer_data)):
+            # Rattachement de tous les écrans aux objectifs, par lots de produits matriciels ;
+            # l'objectif_lie du modèle (toujours présent en sortie structurée) est validé contre l'index
+            objective_index = ObjectiveIndex(analysis['objectives'])
             
-            if 'difficulte' not in enriched_item:
-                enriched_item['difficulte'] = self._infer_difficulty(item.get('resume_contenu', ''), analysis)
-            
-            if 'duree_estimee' not in enriched_item:
-                enriched_item['duree_estimee'] = self._estimate_duration(enriched_item)
-            
-            if 'objectif_lie' not in enriched_item:
-                enriched_item['objectif_lie'] = self._match_objective(item, analysis['objectives'])
-            
-            enriched_data.append(enriched_item)
+            return [
+                self._enrich_item(item, analysis, matched_objective=matched_objective)
+                for item, matched_objective in zip(sequencer_data, objective_index.link_items(sequencer_data))
+            ]
+    
+    def _enrich_item(
+        self,
+        item: Dict[str, str],
+        analysis: Dict[str, Any],
+        objective_index: Optional[ObjectiveIndex] = None,
+        matched_objective: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        Enrichit un écran avec les métadonnées d'analyse
         
-        return enriched_data
+        matched_objective : objectif déjà rattaché par l'index (enrichissement par lot, link_items)
+        objective_index : index réutilisé d'un écran à l'autre (streaming)
+        """
+        enriched_item = item.copy()
+        
+        # Ajouter des métadonnées par défaut si manquantes
+        if 'niveau_bloom' not in enriched_item:
+            enriched_item['niveau_bloom'] = self._infer_bloom_level(item.get('type_activite', ''))
+        
+        if 'difficulte' not in enriched_item:
+            enriched_item['difficulte'] = self._infer_difficulty(item.get('resume_contenu', ''), analysis)
+        
+        if 'duree_estimee' not in enriched_item:
+            enriched_item['duree_estimee'] = self._estimate_duration(enriched_item)
+        
+        if matched_objective is None:
+            objective_index = objective_index or ObjectiveIndex(analysis['objectives'])
+            matched_objective = objective_index.link_items([item])[0]
+        # Objectif de l'analyse ; l'objectif_lie du modèle n'est gardé que si aucun ne correspond
+        if matched_objective or 'objectif_lie' not in enriched_item:
+            enriched_item['objectif_lie'] = self._format_objective(matched_objective)
+        
+        return enriched_item
     
     def _infer_bloom_level(self, activity_type: str) -> str:
         """Infère le niveau de Bloom à partir du type d'activité"""
@@ -446,34 +964,20 @@ class PedagogicalSequencerV2:
     
     def _match_objective(self, item: Dict[str, str], objectives: List[Dict[str, str]]) -> str:
         """Trouve l'objectif le plus pertinent pour cet écran"""
-        content = (item.get('titre_ecran', '') + ' ' + item.get('resume_contenu', '')).lower()
-        
-        best_match = ""
-        best_score = 0
-        
-        for obj in objectives:
-            objective_text = obj.get('objectif', '').lower()
-            
-            # Compter les mots communs
-            content_words = set(content.split())
-            objective_words = set(objective_text.split())
-            common_words = content_words.intersection(objective_words)
-            
-            score = len(common_words)
-            if score > best_score:
-                best_score = score
-                best_match = obj.get('objectif', '')
-        
-        return best_match[:100] + "..." if len(best_match) > 100 else best_match
+        return self._format_objective(ObjectiveIndex(objectives).match_items([item])[0])
+    
+    def _format_objective(self, objective: str) -> str:
+        """Tronque le texte de l'objectif rattaché à un écran"""
+        return objective[:100] + "..." if len(objective) > 100 else objective
     
     def validate_sequencer_data(self, data: List[Dict[str, str]]) -> bool:
-        """Valide la structure des données du séquenceur"""
+        """Valide la structure des données du séquenceur (le champ fautif est ajouté au compte rendu)"""
         required_fields = ['sequence', 'num_ecran', 'titre_ecran', 'resume_contenu', 'type_activite']
         
         for item in data:
             for field in required_fields:
                 if field not in item or not item[field]:
-                    st.warning(f"Champ manquant ou vide : {field}")
+                    self._report().warnings.append(f"Champ manquant ou vide : {field}")
                     return False
         
         return True
\ No newline at end of file
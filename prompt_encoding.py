@@ -0,0 +1,95 @@
+import json
+import textwrap
+from functools import lru_cache
+from typing import Dict, List, Any
+
+
+def compact_text(text: str) -> str:
+    """Supprime l'indentation et les lignes vides superflues d'un texte de prompt"""
+    lines = [line.strip() for line in textwrap.dedent(text).strip().split('\n')]
+    compacted = []
+    for line in lines:
+        if line or (compacted and compacted[-1]):
+            compacted.append(line)
+    return '\n'.join(compacted)
+
+
+def minify_json(data: Any) -> str:
+    """Sérialisation JSON sans espaces superflus"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def encode_objectives_table(analysis: Dict[str, Any]) -> str:
+    """
+    Encode objectifs, difficultés et progression temporelle en un tableau unique.
+
+    Chaque objectif apparaît une seule fois et porte un identifiant (O1, O2, ...)
+    auquel se rattachent son niveau de difficulté, son temps et sa semaine, au lieu
+    d'être répété comme clé du mapping des difficultés et dans la progression.
+    """
+    difficulties_by_number = {
+        str(info.get('numero')): info for info in analysis.get('difficulty_mapping', {}).values()
+    }
+    progression_by_number = {
+        str(item.get('numero')): item for item in analysis.get('temporal_progression', [])
+    }
+
+    rows = ["id|bloom|difficulte|temps|semaine|objectif"]
+    for number, obj in enumerate(analysis.get('objectives', []), 1):
+        difficulty = difficulties_by_number.get(str(number), {})
+        progression = progression_by_number.get(str(number), {})
+        rows.append('|'.join([
+            f"O{number}",
+            obj.get('bloom', ''),
+            str(difficulty.get('niveau', '')),
+            difficulty.get('temps', ''),
+            progression.get('semaine') or '',
+            obj.get('objectif', '').replace('|', '/')
+        ]))
+
+    smart_rows = [
+        f"O{item.get('numero')}: {' '.join(item.get('objectif', '').split())}"
+        for item in analysis.get('temporal_progression', [])
+    ]
+
+    table = '\n'.join(rows)
+    if smart_rows:
+        table += "\nCritères SMART :\n" + '\n'.join(smart_rows)
+    return table
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Encodage tiktoken du modèle, ou None si tiktoken ou ses tables sont indisponibles"""
+    # Import au premier comptage : tiktoken n'est pas nécessaire au chargement du module
+    try:
+        import tiktoken
+    except ImportError:  # Comptage approximatif si tiktoken n'est pas installé
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Les tables BPE sont téléchargées au premier usage : hors ligne, on estime
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Nombre de tokens d'un texte (tiktoken si disponible, sinon estimation ~4 caractères/token)"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]], model: str = "gpt-4o-mini") -> int:
+    """Nombre de tokens d'entrée d'une liste de messages chat (surcoût de format inclus)"""
+    # ~3 tokens de structure par message et 3 pour l'amorce de la réponse
+    return sum(count_tokens(message.get('content', ''), model) + 3 for message in messages) + 3
+
+
+def is_exact_count(model: str = "gpt-4o-mini") -> bool:
+    """Vrai si count_tokens utilise le tokenizer du modèle plutôt qu'une estimation"""
+    return _get_encoding(model) is not None
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from config import RATE_LIMIT_CONFIG
+from prompt_encoding import count_message_tokens
+
+
+class RateLimiter:
+    """
+    Double seau à jetons (requêtes et tokens par minute) partagé entre threads et processus.
+
+    L'état des seaux est conservé dans une base SQLite : chaque réservation se fait
+    dans une transaction BEGIN IMMEDIATE, qui sert de verrou entre les processus
+    utilisant le même fichier. Une requête consomme un jeton de requête et son
+    estimation de tokens (prompt + max_tokens, comme le décompte TPM de l'API).
+    Les seaux sont propres à chaque modèle, les limites de l'API l'étant aussi.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        limits: Optional[Dict[str, Dict[str, int]]] = None,
+        default_limits: Optional[Dict[str, int]] = None,
+        burst_seconds: float = 10.0
+    ):
+        """
+        path : fichier SQLite partagé (None : état propre au processus)
+        limits : {modèle: {'requests_per_minute', 'tokens_per_minute'}}
+        burst_seconds : capacité des seaux, en secondes de débit (lisse les rafales)
+        """
+        self.path = path or ':memory:'
+        self.limits = limits or {}
+        self.default_limits = default_limits or {'requests_per_minute': 500, 'tokens_per_minute': 30000}
+        self.burst_seconds = burst_seconds
+
+        self._local = threading.local()
+        # Une base en mémoire n'est visible que de sa connexion : on la partage entre threads
+        self._shared_connection: Optional[sqlite3.Connection] = None
+        self._memory_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'acquired': 0, 'throttled': 0, 'wait_seconds': 0.0}
+
+    def acquire(self, model: str, tokens: int) -> float:
+        """Attend que le budget permette la requête et le réserve ; retourne l'attente (secondes)"""
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(model, tokens)
+            if delay <= 0:
+                self._record(waited)
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def aacquire(self, model: str, tokens: int) -> float:
+        """Version asynchrone de acquire (l'attente ne bloque pas la boucle d'événements)"""
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(model, tokens)
+            if delay <= 0:
+                self._record(waited)
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def try_acquire(self, model: str, tokens: int) -> bool:
+        """Réserve le budget s'il est disponible immédiatement, sans attendre (requête doublée du hedging)"""
+        if self._try_acquire(model, tokens) > 0:
+            return False
+        self._record(0.0)
+        return True
+
+    def estimate_tokens(self, params: Dict[str, Any]) -> int:
+        """Estimation du coût TPM d'un appel chat.completions : prompt + max_tokens"""
+        model = params.get('model', '')
+        prompt_tokens = count_message_tokens(params.get('messages', []), model)
+        return prompt_tokens + params.get('max_tokens', 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Réservations accordées, réservations ayant attendu et attente cumulée"""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def _try_acquire(self, model: str, tokens: int) -> float:
+        """Réserve le budget si disponible (retourne 0), sinon retourne l'attente estimée"""
+        request_rate, token_rate = self._rates(model)
+        request_capacity = max(1.0, request_rate * self.burst_seconds)
+        token_capacity = max(1.0, token_rate * self.burst_seconds)
+        # Une requête plus grosse que le seau ne doit pas attendre indéfiniment
+        tokens = min(float(tokens), token_capacity)
+
+        with self._transaction() as conn:
+            now = time.time()
+            row = conn.execute(
+                "SELECT requests, tokens, updated FROM buckets WHERE model = ?", (model,)
+            ).fetchone()
+            if row is None:
+                available_requests, available_tokens = request_capacity, token_capacity
+            else:
+                elapsed = max(0.0, now - row[2])
+                available_requests = min(request_capacity, row[0] + elapsed * request_rate)
+                available_tokens = min(token_capacity, row[1] + elapsed * token_rate)
+
+            if available_requests >= 1 and available_tokens >= tokens:
+                available_requests -= 1
+                available_tokens -= tokens
+                delay = 0.0
+            else:
+                delay = max(
+                    (1 - available_requests) / request_rate if available_requests < 1 else 0.0,
+                    (tokens - available_tokens) / token_rate if available_tokens < tokens else 0.0
+                )
+
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (model, requests, tokens, updated) VALUES (?, ?, ?, ?)",
+                (model, available_requests, available_tokens, now)
+            )
+
+        # Petite marge pour ne pas se réveiller juste avant le remplissage
+        return delay + 0.01 if delay > 0 else 0.0
+
+    def _rates(self, model: str) -> Tuple[float, float]:
+        """Débits par seconde (requêtes, tokens) du modèle"""
+        limits = self.limits.get(model, self.default_limits)
+        return limits['requests_per_minute'] / 60.0, limits['tokens_per_minute'] / 60.0
+
+    def _record(self, waited: float) -> None:
+        with self._stats_lock:
+            self._stats['acquired'] += 1
+            if waited > 0:
+                self._stats['throttled'] += 1
+                self._stats['wait_seconds'] += waited
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transaction BEGIN IMMEDIATE : verrou en écriture de la base pendant la réservation"""
+        in_memory = self.path == ':memory:'
+        if in_memory:
+            self._memory_lock.acquire()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            if in_memory:
+                self._memory_lock.release()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self.path == ':memory:':
+            if self._shared_connection is None:
+                self._shared_connection = self._connect()
+            return self._shared_connection
+
+        # Une connexion héritée d'un fork n'est pas réutilisable dans le processus enfant
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if self.path != ':memory:' and directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "model TEXT PRIMARY KEY, requests REAL NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        return conn
+
+
+_default_limiter: Optional[RateLimiter] = None
+
+
+def get_default_rate_limiter() -> Optional[RateLimiter]:
+    """Limiteur partagé configuré par RATE_LIMIT_CONFIG (None si désactivé)"""
+    global _default_limiter
+    if not RATE_LIMIT_CONFIG.get("enabled", True):
+        return None
+    if _default_limiter is None:
+        _default_limiter = RateLimiter(
+            path=RATE_LIMIT_CONFIG.get("path"),
+            limits=RATE_LIMIT_CONFIG.get("limits"),
+            default_limits=RATE_LIMIT_CONFIG.get("default_limits"),
+            burst_seconds=RATE_LIMIT_CONFIG.get("burst_seconds", 10.0)
+        )
+    return _default_limiter
@@ -0,0 +1,342 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Dict, Any, AsyncContextManager, Awaitable, Callable, ContextManager, Deque, Optional, Tuple
+
+from config import REQUEST_CONFIG
+
+
+class _anullcontext:
+    """Contexte asynchrone sans effet (nullcontext n'est asynchrone qu'à partir de Python 3.10)"""
+
+    async def __aenter__(self) -> None:
+        return None
+
+    async def __aexit__(self, *exc_info) -> bool:
+        return False
+
+
+def _is_timeout(error: Exception) -> bool:
+    # Une erreur du SDK implique qu'il est déjà importé : l'import local est gratuit
+    import openai
+    return isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError, TimeoutError))
+
+
+def is_overload_error(error: Exception) -> bool:
+    """Vrai pour les signes de surcharge : 429 et délais dépassés"""
+    if _is_timeout(error):
+        return True
+    return getattr(error, 'status_code', None) == 429
+
+
+class RequestExecutor:
+    """
+    Exécuteur partagé des appels API des générateurs.
+
+    - délai maximal par appel (paramètre timeout du client OpenAI) ;
+    - nouvelles tentatives avec backoff exponentiel à gigue complète sur 429, 5xx,
+      délais dépassés et erreurs de connexion (en-tête Retry-After respecté) ;
+    - hedging : si un appel dépasse le budget de latence (p95 observé pour le même
+      modèle et max_tokens), une requête identique est lancée en parallèle ; la
+      première réponse est conservée et l'autre annulée. La requête doublée n'est
+      lancée que si son budget est disponible sans attendre (can_hedge) et, en
+      synchrone, si le pool a un thread libre : un appel HTTP synchrone perdant ne
+      peut pas être interrompu, les perdants abandonnés ne doivent pas l'occuper.
+
+    Chaque tentative peut être précédée d'une admission (créneau de concurrence,
+    budget du limiteur de débit) : l'attente d'admission n'entre ni dans le budget
+    de latence ni dans l'historique qui le calcule, et seul l'appel lui-même est doublé.
+
+    Les compteurs (tentatives, hedges, hedges refusés, délais dépassés) sont exposés par stats().
+    """
+
+    hedge_pool_size = 32
+
+    def __init__(
+        self,
+        timeout: float = 120.0,
+        max_retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        hedging: bool = True,
+        hedge_percentile: float = 95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 2.0,
+        latency_window: int = 200
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedging = hedging
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.latency_window = latency_window
+
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple, Deque[float]] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_busy = 0
+        self.reset_stats()
+
+    @classmethod
+    def from_config(cls) -> 'RequestExecutor':
+        """Exécuteur paramétré par REQUEST_CONFIG"""
+        return cls(**REQUEST_CONFIG)
+
+    def execute(
+        self,
+        create: Callable[..., Any],
+        params: Dict[str, Any],
+        hedge: bool = True,
+        admission: Optional[Callable[[], ContextManager]] = None,
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """
+        Appel synchrone create(**params) avec délai, nouvelles tentatives et hedging
+
+        admission : contexte ouvert avant chaque tentative (créneau, budget), hors mesure de latence
+        can_hedge : réserve sans attendre le budget de la requête doublée ; False : pas de hedge
+        """
+        key = self._latency_key(params)
+        attempt = 0
+        while True:
+            self._count('attempts')
+            try:
+                with admission() if admission is not None else nullcontext():
+                    start = time.perf_counter()
+                    budget = self.hedge_budget(key) if hedge else None
+                    if budget is None or not self._pool_available():
+                        # Sans thread libre, l'attente dans le pool fausserait la latence : appel direct
+                        result = create(timeout=self.timeout, **params)
+                    else:
+                        result = self._execute_hedged(create, params, budget, can_hedge)
+                    latency = time.perf_counter() - start
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    self._count('failures')
+                    raise
+                time.sleep(self._backoff_delay(e, attempt))
+                attempt += 1
+                continue
+
+            self._record_latency(key, latency)
+            return result
+
+    async def aexecute(
+        self,
+        create: Callable[..., Awaitable[Any]],
+        params: Dict[str, Any],
+        hedge: bool = True,
+        admission: Optional[Callable[[], AsyncContextManager]] = None,
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """Version asynchrone de execute : l'appel perdant d'un hedge est réellement annulé"""
+        key = self._latency_key(params)
+        attempt = 0
+        while True:
+            self._count('attempts')
+            try:
+                async with admission() if admission is not None else _anullcontext():
+                    start = time.perf_counter()
+                    budget = self.hedge_budget(key) if hedge else None
+                    if budget is None:
+                        result = await create(timeout=self.timeout, **params)
+                    else:
+                        result = await self._aexecute_hedged(create, params, budget, can_hedge)
+                    latency = time.perf_counter() - start
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    self._count('failures')
+                    raise
+                await asyncio.sleep(self._backoff_delay(e, attempt))
+                attempt += 1
+                continue
+
+            self._record_latency(key, latency)
+            return result
+
+    def hedge_budget(self, key: Tuple) -> Optional[float]:
+        """Délai au-delà duquel un appel est doublé (None tant que l'historique est insuffisant)"""
+        if not self.hedging:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+        return max(self.hedge_min_delay, samples[index])
+
+    def reset_stats(self) -> None:
+        """Remet à zéro les compteurs (l'historique de latence est conservé)"""
+        with self._lock:
+            self._stats = {
+                'attempts': 0,
+                'retries': 0,
+                'timeouts': 0,
+                'hedges': 0,
+                'hedges_refused': 0,
+                'hedge_wins': 0,
+                'failures': 0
+            }
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs depuis le dernier reset_stats"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _execute_hedged(
+        self,
+        create: Callable[..., Any],
+        params: Dict[str, Any],
+        budget: float,
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        """
+        Appel synchrone avec hedging sur un pool de threads.
+        Un appel HTTP synchrone ne peut pas être interrompu : le perdant est abandonné
+        et son résultat ignoré, dans la limite du délai par appel.
+        """
+        primary = self._submit(create, params)
+        done, _ = wait([primary], timeout=budget)
+        if done:
+            return primary.result()
+
+        if not self._pool_available() or (can_hedge is not None and not can_hedge()):
+            # Débit épuisé ou pool occupé par des perdants : doubler aggraverait la contention
+            self._count('hedges_refused')
+            return primary.result()
+
+        self._count('hedges')
+        hedged = self._submit(create, params)
+        pending = {primary, hedged}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    if future is hedged:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def _aexecute_hedged(
+        self,
+        create: Callable[..., Awaitable[Any]],
+        params: Dict[str, Any],
+        budget: float,
+        can_hedge: Optional[Callable[[], bool]] = None
+    ) -> Any:
+        primary = asyncio.ensure_future(create(timeout=self.timeout, **params))
+        pending = {primary}
+        error = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=budget)
+            if done:
+                return primary.result()
+
+            if can_hedge is not None and not can_hedge():
+                self._count('hedges_refused')
+                return await primary
+
+            self._count('hedges')
+            hedged = asyncio.ensure_future(create(timeout=self.timeout, **params))
+            pending = {primary, hedged}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedged:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        """429, 5xx, délais dépassés et erreurs de connexion sont retentés"""
+        import openai
+        if _is_timeout(error):
+            self._count('timeouts')
+            retryable = True
+        elif isinstance(error, openai.APIConnectionError):
+            retryable = True
+        else:
+            status = getattr(error, 'status_code', None)
+            retryable = status == 429 or (status is not None and status >= 500)
+
+        if retryable and attempt < self.max_retries:
+            self._count('retries')
+            return True
+        return False
+
+    def _backoff_delay(self, error: Exception, attempt: int) -> float:
+        """Backoff exponentiel à gigue complète, au moins égal à Retry-After s'il est fourni"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        response = getattr(error, 'response', None)
+        retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+        try:
+            delay = max(delay, min(self.backoff_max, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def _record_latency(self, key: Tuple, latency: float) -> None:
+        with self._lock:
+            history = self._latencies.setdefault(key, deque(maxlen=self.latency_window))
+            history.append(latency)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.hedge_pool_size, thread_name_prefix="llm-hedge")
+            return self._pool
+
+    def _pool_available(self) -> bool:
+        """Vrai si un thread du pool de hedging est libre (les perdants abandonnés en occupent)"""
+        with self._lock:
+            return self._pool_busy < self.hedge_pool_size
+
+    def _submit(self, create: Callable[..., Any], params: Dict[str, Any]) -> Future:
+        """Soumet create au pool en comptant les threads occupés jusqu'à la fin de l'appel"""
+        def release(_: Future) -> None:
+            # Appelé aussi pour un appel annulé avant d'avoir démarré
+            with self._lock:
+                self._pool_busy -= 1
+
+        pool = self._get_pool()
+        with self._lock:
+            self._pool_busy += 1
+        future = pool.submit(create, timeout=self.timeout, **params)
+        future.add_done_callback(release)
+        return future
+
+    @staticmethod
+    def _latency_key(params: Dict[str, Any]) -> Tuple:
+        # La latence dépend surtout du modèle et de la longueur de sortie demandée
+        return params.get('model'), params.get('max_tokens')
+
+
+_default_executor: Optional[RequestExecutor] = None
+
+
+def get_default_executor() -> RequestExecutor:
+    """Exécuteur partagé par les générateurs du processus (historique de latence commun)"""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = RequestExecutor.from_config()
+    return _default_executor
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Any, Optional
+
+from config import RUN_STORE_CONFIG
+
+
+def make_run_id(kind: str, payload: Any) -> str:
+    """
+    Identifiant d'exécution déterminé par son contenu (type et données d'entrée) :
+    relancer la même génération après une interruption retrouve la même exécution
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return f"{kind}-{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]}"
+
+
+class RunStore:
+    """
+    Points de reprise des générations longues (séquenceurs, scripts, prompts).
+
+    Chaque élément terminé (écran, séquenceur) est enregistré dès son arrivée dans
+    un fichier SQLite, sous la clé (exécution, élément). Une exécution reprise ne
+    régénère que les éléments absents ou en échec : un écran déjà payé ne l'est
+    jamais deux fois, même après un crash ou le rechargement de la page.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """Initialise le stockage (":memory:" : non persistant, pour les tests)"""
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                label TEXT,
+                total INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS run_items (
+                run_id TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                value TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (run_id, item_id)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def start_run(
+        self,
+        kind: str,
+        total: int,
+        run_id: Optional[str] = None,
+        label: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Crée l'exécution, ou la rouvre si elle existe déjà ; retourne son identifiant"""
+        run_id = run_id or f"{kind}-{uuid.uuid4().hex[:16]}"
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO runs (run_id, kind, label, total, status, metadata, created_at, updated_at)
+                VALUES (?, ?, ?, ?, 'running', ?, ?, ?)
+                ON CONFLICT(run_id) DO UPDATE SET status = 'running', total = excluded.total, updated_at = excluded.updated_at
+                """,
+                (run_id, kind, label, total, json.dumps(metadata or {}, ensure_ascii=False), now, now)
+            )
+            self._conn.commit()
+        return run_id
+
+    def save_item(self, run_id: str, item_id: str, value: Any = None, error: Optional[str] = None) -> None:
+        """Enregistre un élément terminé (valeur JSON) ou son échec ; un succès n'est jamais remplacé par un échec"""
+        now = time.time()
+        with self._lock:
+            if error is not None:
+                self._conn.execute(
+                    """
+                    INSERT INTO run_items (run_id, item_id, value, error, created_at) VALUES (?, ?, NULL, ?, ?)
+                    ON CONFLICT(run_id, item_id) DO UPDATE SET error = excluded.error WHERE run_items.error IS NOT NULL
+                    """,
+                    (run_id, item_id, error, now)
+                )
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO run_items (run_id, item_id, value, error, created_at) VALUES (?, ?, ?, NULL, ?)",
+                    (run_id, item_id, json.dumps(value, ensure_ascii=False), now)
+                )
+            self._conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+            self._conn.commit()
+
+    def completed(self, run_id: str) -> Dict[str, Any]:
+        """Éléments réussis de l'exécution : {item_id: valeur}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, value FROM run_items WHERE run_id = ? AND error IS NULL", (run_id,)
+            ).fetchall()
+        return {item_id: json.loads(value) for item_id, value in rows}
+
+    def get_item(self, run_id: str, item_id: str) -> Optional[Any]:
+        """Valeur d'un élément réussi, ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM run_items WHERE run_id = ? AND item_id = ? AND error IS NULL", (run_id, item_id)
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Description de l'exécution (type, libellé, total, statut, métadonnées), ou None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_id, kind, label, total, status, metadata FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('run_id', 'kind', 'label', 'total', 'status'), row[:5]), metadata=json.loads(row[5]))
+
+    def finish_run(self, run_id: str, status: str = "completed") -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?", (status, time.time(), run_id)
+            )
+            self._conn.commit()
+
+    def list_runs(self, kind: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Dernières exécutions (les plus récentes d'abord) avec leur avancement"""
+        query = """
+            SELECT r.run_id, r.kind, r.label, r.total, r.status, r.created_at, r.updated_at,
+                   COALESCE(SUM(i.item_id IS NOT NULL AND i.error IS NULL), 0) AS done,
+                   COALESCE(SUM(i.error IS NOT NULL), 0) AS failed
+            FROM runs r LEFT JOIN run_items i ON i.run_id = r.run_id
+            {where}
+            GROUP BY r.run_id ORDER BY r.updated_at DESC LIMIT ?
+        """
+        where, params = ("WHERE r.kind = ?", (kind, limit)) if kind else ("", (limit,))
+        with self._lock:
+            rows = self._conn.execute(query.format(where=where), params).fetchall()
+        columns = ('run_id', 'kind', 'label', 'total', 'status', 'created_at', 'updated_at', 'done', 'failed')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def delete_run(self, run_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM run_items WHERE run_id = ?", (run_id,))
+            self._conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+            self._conn.commit()
+
+
+_default_store: Optional[RunStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_run_store() -> Optional[RunStore]:
+    """Retourne le stockage partagé des exécutions (None si désactivé dans la configuration)"""
+    global _default_store
+
+    if not RUN_STORE_CONFIG.get("enabled", True):
+        return None
+
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = RunStore(RUN_STORE_CONFIG.get("path", ".runs.sqlite3"))
+        return _default_store
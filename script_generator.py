@@ -1,10 +1,15 @@
 import streamlit as st
 import json
-import pandas as pd
 from datetime import datetime
-from openai import OpenAI
 from typing import Dict, List, Any
-import io
+
+from llm_cache import get_default_cache
+from llm_client import format_usage_summary
+from run_store import RunStore, get_default_run_store, make_run_id
+from script_generators import ScriptGenerator, screen_keys
+from tracing import format_stage_summary, get_tracer
+from config import GENERATION_CONFIG
+from utils_v2 import build_texts_export, export_scripts_markdown
 
 # Configuration de la page
 st.set_page_config(
@@ -13,189 +18,6 @@ st.set_page_config(
     layout="wide"
 )
 
-class ScriptGenerator:
-    def __init__(self, api_key: str):
-        """Initialise le générateur de scripts avec la clé API OpenAI"""
-        self.client = OpenAI(api_key=api_key)
-    
-    def generate_script(self, activity_data: Dict, activity_type: str) -> str:
-        """Génère un script pédagogique pour une activité spécifique"""
-        
-        # Prompts spécialisés par type d'activité
-        prompts = {
-            'text': self._get_text_prompt(),
-            'quiz': self._get_quiz_prompt(),
-            'accordion': self._get_accordion_prompt(),
-            'video': self._get_video_prompt(),
-            'image': self._get_image_prompt(),
-            'flash-card': self._get_flashcard_prompt()
-        }
-        
-        if activity_type not in prompts:
-            return f"Type d'activité '{activity_type}' non supporté"
-        
-        # Préparation du contexte
-        context = f"""
-        ACTIVITÉ À SCRIPTER :
-        
-        Numéro d'écran : {activity_data.get('num_ecran', 'Non défini')}
-        Titre : {activity_data.get('titre_ecran', 'Non défini')}
-        Sous-titre : {activity_data.get('sous_titre', 'Non défini')}
-        Contenu : {activity_data.get('resume_contenu', 'Non défini')}
-        Niveau Bloom : {activity_data.get('niveau_bloom', 'Non défini')}
-        Difficulté : {activity_data.get('difficulte', 'Non défini')}
-        Durée : {activity_data.get('duree_estimee', 'Non défini')} minutes
-        Objectif : {activity_data.get('objectif_lie', 'Non défini')}
-        Commentaires : {activity_data.get('commentaire', 'Non défini')}
-        Séquence : {activity_data.get('sequence', 'Non défini')}
-        
-        Générez le script pédagogique détaillé pour cette activité de type "{activity_type}".
-        """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": prompts[activity_type]},
-                    {"role": "user", "content": context}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            return f"Erreur lors de la génération : {str(e)}"
-    
-    def _get_text_prompt(self) -> str:
-        return """
-        Vous êtes un expert en rédaction pédagogique. Votre mission : créer un script de contenu textuel structuré et engageant.
-
-        GÉNÉREZ UN SCRIPT TEXTUEL avec :
-        1. Un titre accrocheur
-        2. Une introduction captivante (2-3 phrases)
-        3. Le contenu principal organisé en sections claires
-        4. Des exemples concrets et pertinents
-        5. Des éléments de mise en forme (gras, italique, listes)
-        6. Une conclusion avec points clés à retenir
-        7. Une transition vers la suite
-
-        ADAPTEZ selon la difficulté :
-        - Facile : langage simple, exemples de base
-        - Moyen : vocabulaire technique modéré
-        - Difficile : terminologie spécialisée, concepts avancés
-
-        FORMAT : Script en texte formaté, prêt à intégrer dans un outil de formation.
-        """
-    
-    def _get_quiz_prompt(self) -> str:
-        return """
-        Vous êtes un expert en évaluation pédagogique. Votre mission : créer un script de quiz interactif.
-
-        GÉNÉREZ UN SCRIPT DE QUIZ avec :
-        1. Instructions claires pour l'apprenant
-        2. 3-8 questions selon la durée (environ 2 min par question)
-        3. Questions adaptées au niveau de Bloom spécifié
-        4. Options de réponses plausibles
-        5. Bonnes réponses avec explications
-        6. Feedbacks constructifs pour les mauvaises réponses
-        7. Score et bilan final
-
-        TYPES DE QUESTIONS selon Bloom :
-        - Comprendre : QCM de définition, vrai/faux
-        - Appliquer : Questions de mise en situation
-        - Analyser : Questions de comparaison, analyse de cas
-        - Évaluer : Questions d'argumentation, critiques
-
-        FORMAT : Script détaillé avec questions, réponses et feedbacks.
-        """
-    
-    def _get_accordion_prompt(self) -> str:
-        return """
-        Vous êtes un expert en structuration d'informations. Votre mission : créer un script d'accordion pédagogique.
-
-        GÉNÉREZ UN SCRIPT D'ACCORDION avec :
-        1. Introduction générale du contenu
-        2. 4-8 sections dépliables selon la durée
-        3. Titres de sections engageants (fermés)
-        4. Contenu détaillé pour chaque section (ouvert)
-        5. Progression logique entre les sections
-        6. Éléments visuels suggérés (images, schémas)
-        7. Interactions recommandées (clic, survol)
-
-        USAGES selon Bloom :
-        - Comprendre : Définitions expandables, explications détaillées
-        - Analyser : Comparaisons structurées, décompositions
-        - Évaluer : Critères d'évaluation, grilles d'analyse
-
-        FORMAT : Script avec sections titrées et contenu détaillé pour chaque partie.
-        """
-    
-    def _get_video_prompt(self) -> str:
-        return """
-        Vous êtes un expert en scénarisation vidéo éducative. Votre mission : créer un script vidéo pédagogique.
-
-        GÉNÉREZ UN SCRIPT VIDÉO avec :
-        1. Synopsis et objectif de la vidéo
-        2. Structure temporelle (intro 10%, développement 70%, conclusion 20%)
-        3. Texte de narration (voix off)
-        4. Descriptions des éléments visuels
-        5. Animations et transitions suggérées
-        6. Moments d'interaction ou de pause
-        7. Ressources visuelles nécessaires
-
-        STYLES selon difficulté :
-        - Facile : narration simple, visuels clairs
-        - Moyen : rythme modéré, animations explicatives
-        - Difficile : contenu dense, schémas complexes
-
-        FORMAT : Script détaillé avec timecodes, narration et indications visuelles.
-        """
-    
-    def _get_image_prompt(self) -> str:
-        return """
-        Vous êtes un expert en design pédagogique visuel. Votre mission : créer un script d'image interactive.
-
-        GÉNÉREZ UN SCRIPT D'IMAGE avec :
-        1. Description générale de l'image principale
-        2. Éléments visuels clés à inclure
-        3. Zones interactives (cliquables, hover)
-        4. Contenu des pop-ups/infobulles
-        5. Légendes et annotations
-        6. Palette de couleurs suggérée
-        7. Style graphique recommandé
-
-        TYPES selon Bloom :
-        - Se souvenir : Schémas simples, illustrations mnémotechniques
-        - Comprendre : Infographies, diagrammes explicatifs
-        - Analyser : Cartes conceptuelles, comparaisons visuelles
-
-        FORMAT : Script descriptif avec spécifications visuelles et interactions.
-        """
-    
-    def _get_flashcard_prompt(self) -> str:
-        return """
-        Vous êtes un expert en mémorisation active. Votre mission : créer un script de flash-cards pédagogiques.
-
-        GÉNÉREZ UN SCRIPT DE FLASH-CARDS avec :
-        1. Introduction au jeu de cartes
-        2. 8-20 cartes selon la durée (1-2 min par carte)
-        3. Questions/termes au recto
-        4. Réponses/définitions au verso
-        5. Indices ou mnémotechniques
-        6. Progression par difficulté
-        7. Système de révision suggéré
-
-        TYPES DE CARTES :
-        - Concept ↔ Définition
-        - Question ↔ Réponse
-        - Terme ↔ Explication
-        - Situation ↔ Solution
-
-        FORMAT : Script avec cartes numérotées, recto/verso et conseils d'utilisation.
-        """
-
 def load_sequencer_json(uploaded_file) -> List[Dict]:
     """Charge le fichier JSON de séquenceur"""
     try:
@@ -208,7 +30,29 @@ def load_sequencer_json(uploaded_file) -> List[Dict]:
         st.error(f"Erreur lors du chargement : {str(e)}")
         return []
 
+def load_saved_scripts(run_store: RunStore, run_id: str) -> Dict[str, Dict[str, Any]]:
+    """Scripts terminés d'une exécution enregistrée, dans l'ordre de sa sélection"""
+    saved_run = run_store.get_run(run_id)
+    if saved_run is None:
+        return {}
+    activities = saved_run['metadata'].get('activities', [])
+    script_ids = saved_run['metadata'].get('script_ids', [])
+    completed = run_store.completed(run_id)
+    return {
+        script_id: {'activite': activity, 'script': completed[key]}
+        for script_id, activity, key in zip(script_ids, activities, screen_keys(activities))
+        if key in completed
+    }
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_scripts_export(export_key: str, export_format: str, _scripts: Dict[str, Dict[str, Any]]) -> bytes:
+    """Export ZIP ou JSONL des scripts, construit en mémoire à la première demande puis gardé en cache pour l'exécution export_key"""
+    return build_texts_export(_scripts, export_format, 'script')
+
 def main():
+    # pandas n'est utile qu'aux tableaux et graphiques : importé à l'exécution, pas au chargement du module
+    import pandas as pd
+
     st.title("📝 Générateur de Scripts Pédagogiques")
     st.markdown("*Générez des scripts détaillés à partir de votre séquenceur pédagogique*")
     st.markdown("---")
@@ -232,8 +76,48 @@ def main():
                 st.error("❌ Format de clé API invalide")
                 api_key = None
         
+        max_workers = st.slider(
+            "Générations simultanées",
+            min_value=1,
+            max_value=32,
+            value=GENERATION_CONFIG["activity_concurrency"],
+            help="Écrans générés en parallèle ; la durée totale se rapproche de celle de l'écran le plus long"
+        )
+        packed = st.checkbox(
+            "Regrouper les écrans de même type",
+            value=False,
+            help="Plusieurs écrans par requête : le prompt système n'est envoyé qu'une fois par groupe "
+                 "(moins de requêtes et de tokens d'entrée)"
+        )
+        
         st.markdown("---")
         
+        # Statistiques du cache des réponses LLM
+        response_cache = get_default_cache()
+        if response_cache is not None:
+            with st.expander("🗄️ Cache des réponses"):
+                cache_stats = response_cache.stats()
+                st.metric("Taux de hit", f"{cache_stats['hit_rate']:.0f}%")
+                st.caption(f"{cache_stats['hits']} hits · {cache_stats['misses']} misses · {cache_stats['disk_entries']} entrées")
+                if st.button("🗑️ Vider le cache"):
+                    response_cache.clear()
+        
+        # Exécutions enregistrées : les scripts terminés survivent à un rechargement de la page
+        run_store = get_default_run_store()
+        if run_store is not None:
+            with st.expander("💾 Exécutions enregistrées"):
+                saved_runs = run_store.list_runs('scripts', limit=10)
+                if not saved_runs:
+                    st.caption("Aucune exécution enregistrée")
+                for saved_run in saved_runs:
+                    st.caption(
+                        f"{saved_run['label'] or saved_run['run_id']} · {saved_run['done']}/{saved_run['total']} écrans"
+                        + (" · interrompue" if saved_run['status'] != 'completed' else "")
+                    )
+                    if st.button("📂 Recharger", key=f"reload_{saved_run['run_id']}"):
+                        st.session_state.generated_scripts = load_saved_scripts(run_store, saved_run['run_id'])
+                        st.session_state.scripts_export_key = f"{saved_run['run_id']}:{saved_run['updated_at']}"
+        
         # Informations
         with st.expander("ℹ️ Format JSON attendu"):
             st.markdown("""
@@ -311,31 +195,61 @@ def main():
                 if selected_activities:
                     generator = ScriptGenerator(api_key)
                     
-                    with st.spinner("🔄 Génération des scripts en cours..."):
-                        scripts = {}
+                    # Activités sélectionnées, dans l'ordre de la sélection
+                    activities = []
+                    script_ids = []
+                    for selected in selected_activities:
+                        activity_index = activity_options.index(selected)
+                        activity = sequencer_data[activity_index]
+                        activities.append(activity)
+                        script_ids.append(f"{activity.get('num_ecran', f'Act{activity_index+1}')}_{activity.get('type_activite', 'unknown')}")
+                    
+                    # Même sélection, même modèle : même exécution, les écrans déjà enregistrés ne sont pas régénérés
+                    run_id = make_run_id('scripts', [generator.model, generator.structured_output, activities])
+                    if run_store is not None:
+                        run_store.start_run(
+                            'scripts', len(activities), run_id, label=uploaded_file.name,
+                            metadata={'activities': activities, 'script_ids': script_ids}
+                        )
+                        resumed = len(run_store.completed(run_id))
+                        if resumed:
+                            st.info(f"💾 {resumed} écran(s) repris de l'exécution interrompue")
+                    
+                    with st.spinner("🔄 Génération des scripts en cours..."), get_tracer().run('scripts', activities=len(activities)):
+                        # Chaque script rejoint la session dès qu'il est prêt, dans l'ordre d'achèvement
+                        st.session_state.generated_scripts = {}
+                        failures = 0
                         
                         progress_bar = st.progress(0)
-                        for i, selected in enumerate(selected_activities):
-                            # Trouver l'index de l'activité sélectionnée
-                            activity_index = activity_options.index(selected)
-                            activity = sequencer_data[activity_index]
-                            
-                            # Générer le script
-                            script = generator.generate_script(
-                                activity, 
-                                activity.get('type_activite', 'text')
-                            )
-                            
-                            script_id = f"{activity.get('num_ecran', f'Act{activity_index+1}')}_{activity.get('type_activite', 'unknown')}"
-                            scripts[script_id] = {
-                                'activite': activity,
+                        status = st.empty()
+                        results = generator.generate_many(activities, max_workers, packed, store=run_store, run_id=run_id)
+                        for done, (index, script, error) in enumerate(results, 1):
+                            if error is not None:
+                                # Échec isolé : les autres activités continuent
+                                script = f"Erreur lors de la génération : {error}"
+                                failures += 1
+                            st.session_state.generated_scripts[script_ids[index]] = {
+                                'activite': activities[index],
                                 'script': script
                             }
-                            
-                            progress_bar.progress((i + 1) / len(selected_activities))
-                        
-                        st.session_state.generated_scripts = scripts
-                        st.success(f"✅ {len(scripts)} scripts générés avec succès !")
+                            progress_bar.progress(done / len(activities))
+                            status.caption(f"{done}/{len(activities)} — {script_ids[index]} terminé")
+                        status.empty()
+                    if run_store is not None:
+                        run_store.finish_run(run_id, 'completed' if not failures else 'partial')
+                    
+                    # Ordre de la sélection pour l'affichage et les exports
+                    scripts = st.session_state.generated_scripts
+                    st.session_state.generated_scripts = {script_id: scripts[script_id] for script_id in script_ids}
+                    st.session_state.scripts_export_key = f"{run_id}:{datetime.now().isoformat()}"
+                    
+                    if failures:
+                        st.warning(f"⚠️ {failures} activité(s) en échec sur {len(activities)}")
+                    st.success(f"✅ {len(st.session_state.generated_scripts) - failures} scripts générés avec succès !")
+                    st.caption(f"📈 {format_usage_summary(generator.llm.usage_stats())}")
+                    trace_summary = get_tracer().last_run('scripts')
+                    if trace_summary is not None:
+                        st.caption(f"⏱️ {format_stage_summary(trace_summary)}")
                 else:
                     st.warning("⚠️ Veuillez sélectionner au moins une activité")
         
@@ -386,50 +300,43 @@ def main():
         st.markdown("---")
         st.subheader("📦 Export Global")
         
-        col_export1, col_export2 = st.columns(2)
+        col_export1, col_export2, col_export3 = st.columns(3)
+        export_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # ZIP et JSONL construits à la demande (bouton « Préparer »), puis gardés en cache pour l'exécution affichée
+        export_key = st.session_state.setdefault('scripts_export_key', datetime.now().isoformat())
         
         with col_export1:
             # Export tous les scripts en un fichier
-            all_scripts_content = ""
-            for script_id, script_data in scripts.items():
-                activity = script_data['activite']
-                all_scripts_content += f"""
-# {script_id} - {activity.get('titre_ecran', 'Sans titre')}
-
-**Type :** {activity.get('type_activite', 'N/A')}  
-**Durée :** {activity.get('duree_estimee', 'N/A')} minutes  
-**Difficulté :** {activity.get('difficulte', 'N/A')}  
-
-{script_data['script']}
-
----
-
-"""
-            
             st.download_button(
                 label="📥 Télécharger Tous les Scripts",
-                data=all_scripts_content,
-                file_name=f"tous_scripts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+                data=export_scripts_markdown(scripts),
+                file_name=f"tous_scripts_{export_stamp}.md",
                 mime="text/markdown"
             )
         
         with col_export2:
-            # Export en JSON structuré
-            json_export = {
-                "metadata": {
-                    "date_generation": datetime.now().isoformat(),
-                    "nombre_scripts": len(scripts),
-                    "types_activites": list(set(script_data['activite'].get('type_activite') for script_data in scripts.values()))
-                },
-                "scripts": scripts
-            }
-            
-            st.download_button(
-                label="📥 Export JSON Structuré",
-                data=json.dumps(json_export, indent=2, ensure_ascii=False),
-                file_name=f"scripts_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json"
-            )
+            # Archive ZIP : un fichier Markdown par écran et un manifeste
+            if st.button("🗜️ Préparer l'archive ZIP", key="prepare_scripts_zip"):
+                st.session_state.scripts_zip_key = export_key
+            if st.session_state.get('scripts_zip_key') == export_key:
+                st.download_button(
+                    label="📥 Archive ZIP (un fichier par écran)",
+                    data=build_scripts_export(export_key, 'zip', scripts),
+                    file_name=f"scripts_{export_stamp}.zip",
+                    mime="application/zip"
+                )
+        
+        with col_export3:
+            # Export JSONL : une ligne par script
+            if st.button("🧾 Préparer l'export JSONL", key="prepare_scripts_jsonl"):
+                st.session_state.scripts_jsonl_key = export_key
+            if st.session_state.get('scripts_jsonl_key') == export_key:
+                st.download_button(
+                    label="📥 Export JSONL",
+                    data=build_scripts_export(export_key, 'jsonl', scripts),
+                    file_name=f"scripts_export_{export_stamp}.jsonl",
+                    mime="application/x-ndjson"
+                )
         
         # Bouton reset
         if st.button("🔄 Générer de Nouveaux Scripts"):
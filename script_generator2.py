@@ -1,10 +1,15 @@
 import streamlit as st
 import json
-import pandas as pd
 from datetime import datetime
-from openai import OpenAI
 from typing import Dict, List, Any
-import io
+
+from llm_cache import get_default_cache
+from llm_client import format_usage_summary
+from run_store import RunStore, get_default_run_store, make_run_id
+from script_generators import PromptGenerator, screen_keys
+from tracing import format_stage_summary, get_tracer
+from config import GENERATION_CONFIG
+from utils_v2 import build_texts_export, export_prompts_text
 
 # Configuration de la page
 st.set_page_config(
@@ -13,302 +18,6 @@ st.set_page_config(
     layout="wide"
 )
 
-class PromptGenerator:
-    def __init__(self, api_key: str):
-        """Initialise le générateur de prompts avec la clé API OpenAI"""
-        self.client = OpenAI(api_key=api_key)
-    
-    def generate_prompt(self, activity_data: Dict, activity_type: str) -> str:
-        """Génère un prompt spécialisé pour une activité spécifique"""
-        
-        # Templates de prompts par type d'activité
-        prompt_templates = {
-            'text': self._get_text_prompt_template(),
-            'quiz': self._get_quiz_prompt_template(),
-            'accordion': self._get_accordion_prompt_template(),
-            'video': self._get_video_prompt_template(),
-            'image': self._get_image_prompt_template(),
-            'flash-card': self._get_flashcard_prompt_template()
-        }
-        
-        if activity_type not in prompt_templates:
-            return f"Type d'activité '{activity_type}' non supporté"
-        
-        # Préparation du contexte pour la génération de prompt
-        context = f"""
-        DONNÉES DE L'ACTIVITÉ :
-        
-        Numéro d'écran : {activity_data.get('num_ecran', 'Non défini')}
-        Titre : {activity_data.get('titre_ecran', 'Non défini')}
-        Sous-titre : {activity_data.get('sous_titre', 'Non défini')}
-        Contenu : {activity_data.get('resume_contenu', 'Non défini')}
-        Niveau Bloom : {activity_data.get('niveau_bloom', 'Non défini')}
-        Difficulté : {activity_data.get('difficulte', 'Non défini')}
-        Durée : {activity_data.get('duree_estimee', 'Non défini')} minutes
-        Objectif : {activity_data.get('objectif_lie', 'Non défini')}
-        Commentaires : {activity_data.get('commentaire', 'Non défini')}
-        Séquence : {activity_data.get('sequence', 'Non défini')}
-        
-        Générez un PROMPT COMPLET et PRÊT À UTILISER pour créer cette activité de type "{activity_type}" dans un outil externe.
-        """
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": prompt_templates[activity_type]},
-                    {"role": "user", "content": context}
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            return f"Erreur lors de la génération : {str(e)}"
-    
-    def _get_text_prompt_template(self) -> str:
-        return """
-        Vous êtes un expert en génération de prompts pour outils de création de contenu textuel.
-        
-        VOTRE MISSION : Générer un PROMPT COMPLET que l'utilisateur pourra copier-coller dans ChatGPT, Claude, ou tout autre outil IA pour créer automatiquement le contenu textuel pédagogique.
-        
-        LE PROMPT DOIT CONTENIR :
-        1. Le rôle de l'IA (ex: "Tu es un expert en...")
-        2. Le contexte et l'objectif pédagogique précis
-        3. Les spécifications techniques (durée, niveau, difficulté)
-        4. La structure exacte attendue
-        5. Les critères de qualité
-        6. Le format de sortie souhaité
-        7. Les contraintes et adaptations
-        
-        GÉNÉREZ UN PROMPT COMME CELUI-CI :
-        "Tu es un expert en rédaction pédagogique spécialisé en [domaine]. Crée un contenu textuel de [durée] minutes sur [sujet]...
-        
-        STRUCTURE ATTENDUE :
-        - Titre accrocheur
-        - Introduction (50 mots)
-        - Corps principal (3 sections)
-        - Conclusion avec points clés
-        
-        CRITÈRES :
-        - Niveau de difficulté : [niveau]
-        - Vocabulaire adapté à [public]
-        - Exemples concrets inclus
-        
-        LIVRABLES : Texte formaté en markdown, prêt à intégrer."
-        
-        FORMAT DE SORTIE : UN PROMPT COMPLET PRÊT À COPIER-COLLER dans un outil IA.
-        """
-    
-    def _get_quiz_prompt_template(self) -> str:
-        return """
-        Vous êtes un expert en génération de prompts pour outils de création de quiz.
-        
-        VOTRE MISSION : Générer un PROMPT COMPLET pour créer automatiquement un quiz pédagogique avec questions, réponses, et feedbacks.
-        
-        LE PROMPT DOIT SPÉCIFIER :
-        1. Le rôle d'expert en évaluation pédagogique
-        2. Le sujet et niveau de Bloom ciblé
-        3. Le nombre de questions selon la durée
-        4. Les types de questions adaptés
-        5. La structure des feedbacks
-        6. Le format de sortie (JSON, texte structuré)
-        7. Les critères de difficulté
-        
-        EXEMPLE DE PROMPT À GÉNÉRER :
-        "Tu es un expert en évaluation pédagogique. Crée un quiz de [X] questions sur [sujet] pour tester le niveau [Bloom]...
-        
-        SPÉCIFICATIONS :
-        - Durée totale : [X] minutes
-        - [X] questions QCM + [X] questions ouvertes
-        - Difficulté : [niveau]
-        - 4 options par QCM avec distracteurs plausibles
-        
-        POUR CHAQUE QUESTION :
-        - Énoncé clair
-        - Options de réponse
-        - Bonne réponse avec explication
-        - Feedback pour réponses incorrectes
-        
-        FORMAT : JSON structuré avec questions, réponses, feedbacks."
-        
-        GÉNÉREZ LE PROMPT COMPLET PRÊT À UTILISER.
-        """
-    
-    def _get_accordion_prompt_template(self) -> str:
-        return """
-        Vous êtes un expert en génération de prompts pour outils de création d'accordéons interactifs.
-        
-        VOTRE MISSION : Générer un PROMPT COMPLET pour créer un accordion pédagogique avec sections dépliables organisées logiquement.
-        
-        LE PROMPT DOIT INCLURE :
-        1. Le rôle d'expert en structuration d'informations
-        2. Le contenu à organiser en sections
-        3. La logique de progression pédagogique
-        4. Les spécifications d'interactivité
-        5. Le format de sortie structuré
-        6. Les éléments visuels suggérés
-        
-        MODÈLE DE PROMPT :
-        "Tu es un expert en design pédagogique interactif. Crée un accordion sur [sujet] avec [X] sections dépliables...
-        
-        STRUCTURE :
-        - Introduction générale (visible)
-        - [X] sections principales (titres visibles, contenu dépliable)
-        - Progression logique du simple au complexe
-        
-        POUR CHAQUE SECTION :
-        - Titre accrocheur (fermé)
-        - Contenu détaillé (ouvert)
-        - Éléments visuels suggérés
-        - Temps de lecture estimé
-        
-        SPÉCIFICATIONS :
-        - Durée totale : [X] minutes
-        - Niveau : [difficulté]
-        - Navigation : séquentielle/libre
-        
-        FORMAT : Structure JSON avec sections, titres, contenus."
-        
-        CRÉEZ LE PROMPT COMPLET POUR OUTIL EXTERNE.
-        """
-    
-    def _get_video_prompt_template(self) -> str:
-        return """
-        Vous êtes un expert en génération de prompts pour outils de création vidéo pédagogique.
-        
-        VOTRE MISSION : Générer un PROMPT COMPLET pour créer un script vidéo avec narration, éléments visuels et timing.
-        
-        LE PROMPT DOIT CONTENIR :
-        1. Le rôle de scénariste vidéo éducatif
-        2. Les spécifications techniques (durée, style)
-        3. La structure narrative (intro/développement/conclusion)
-        4. Les descriptions d'éléments visuels
-        5. Le texte de narration
-        6. Les timecodes et transitions
-        7. Les ressources nécessaires
-        
-        TEMPLATE DE PROMPT :
-        "Tu es un scénariste vidéo spécialisé en contenu éducatif. Crée un script vidéo de [X] minutes sur [sujet]...
-        
-        STRUCTURE VIDÉO :
-        - Introduction accrocheuse (10% du temps)
-        - Développement en [X] parties (70%)
-        - Conclusion synthétique (20%)
-        
-        POUR CHAQUE SÉQUENCE :
-        - Timecode (début-fin)
-        - Texte de narration
-        - Description des visuels
-        - Animations suggérées
-        - Transitions
-        
-        SPÉCIFICATIONS :
-        - Durée : [X] minutes
-        - Style : [documentaire/explicatif/conversationnel]
-        - Public : [niveau]
-        - Rythme : adapté à la difficulté [niveau]
-        
-        LIVRABLES :
-        - Script complet avec timecodes
-        - Liste des ressources visuelles
-        - Instructions de montage"
-        
-        GÉNÉREZ LE PROMPT PRÊT POUR OUTIL VIDÉO.
-        """
-    
-    def _get_image_prompt_template(self) -> str:
-        return """
-        Vous êtes un expert en génération de prompts pour outils de création d'images pédagogiques interactives.
-        
-        VOTRE MISSION : Générer un PROMPT COMPLET pour créer une image/infographie interactive avec zones cliquables et annotations.
-        
-        LE PROMPT DOIT SPÉCIFIER :
-        1. Le rôle de designer pédagogique visuel
-        2. Le type d'image (schéma, carte, infographie, diagramme)
-        3. Les éléments visuels principaux
-        4. Les zones interactives
-        5. Les styles graphiques
-        6. Les spécifications techniques
-        7. L'accessibilité et la lisibilité
-        
-        EXEMPLE DE PROMPT :
-        "Tu es un designer pédagogique spécialisé en visualisation d'informations. Crée une [type d'image] interactive sur [sujet]...
-        
-        ÉLÉMENTS VISUELS :
-        - Image principale : [description]
-        - [X] zones interactives cliquables
-        - Légendes et annotations
-        - Palette de couleurs : [spécifications]
-        
-        INTERACTIVITÉ :
-        - Zones cliquables avec pop-ups informatifs
-        - Survol avec infobulles
-        - Navigation entre éléments
-        
-        SPÉCIFICATIONS TECHNIQUES :
-        - Résolution : 1920x1080
-        - Style : [moderne/minimaliste/illustratif]
-        - Accessibilité : contrastes élevés, texte lisible
-        - Durée d'exploration : [X] minutes
-        
-        FORMAT DE SORTIE :
-        - Fichier image principal
-        - Coordonnées des zones interactives
-        - Contenu des pop-ups
-        - Guide d'utilisation"
-        
-        CRÉEZ LE PROMPT COMPLET POUR OUTIL GRAPHIQUE.
-        """
-    
-    def _get_flashcard_prompt_template(self) -> str:
-        return """
-        Vous êtes un expert en génération de prompts pour outils de création de flash-cards pédagogiques.
-        
-        VOTRE MISSION : Générer un PROMPT COMPLET pour créer un jeu de flash-cards optimisé pour la mémorisation active.
-        
-        LE PROMPT DOIT INCLURE :
-        1. Le rôle d'expert en mémorisation
-        2. Le nombre de cartes selon la durée
-        3. Les types d'associations (terme-définition, question-réponse)
-        4. La progression par difficulté
-        5. Le système de révision
-        6. Le format de sortie
-        7. Les principes de mémorisation
-        
-        MODÈLE DE PROMPT :
-        "Tu es un expert en sciences cognitives et mémorisation active. Crée un jeu de [X] flash-cards sur [sujet]...
-        
-        SPÉCIFICATIONS :
-        - [X] cartes pour [X] minutes d'utilisation
-        - Types : [X]% définitions, [X]% questions, [X]% applications
-        - Progression : du simple au complexe
-        - Niveau : [difficulté]
-        
-        POUR CHAQUE CARTE :
-        - RECTO : Question/terme/situation claire
-        - VERSO : Réponse/définition/explication complète
-        - Indices mnémotechniques si pertinent
-        - Tags pour catégorisation
-        
-        PRINCIPES DE CONCEPTION :
-        - Une information par carte
-        - Questions précises
-        - Réponses concises mais complètes
-        - Exemples concrets inclus
-        
-        SYSTÈME DE RÉVISION :
-        - Intervalle de répétition espacée
-        - Algorithme de difficulté adaptative
-        - Suivi des performances
-        
-        FORMAT : JSON avec cartes structurées recto/verso + métadonnées."
-        
-        GÉNÉREZ LE PROMPT COMPLET POUR OUTIL DE FLASHCARDS.
-        """
-
 def load_sequencer_json(uploaded_file) -> List[Dict]:
     """Charge le fichier JSON de séquenceur"""
     try:
@@ -321,7 +30,29 @@ def load_sequencer_json(uploaded_file) -> List[Dict]:
         st.error(f"Erreur lors du chargement : {str(e)}")
         return []
 
+def load_saved_prompts(run_store: RunStore, run_id: str) -> Dict[str, Dict[str, Any]]:
+    """Prompts terminés d'une exécution enregistrée, dans l'ordre de sa sélection"""
+    saved_run = run_store.get_run(run_id)
+    if saved_run is None:
+        return {}
+    activities = saved_run['metadata'].get('activities', [])
+    prompt_ids = saved_run['metadata'].get('prompt_ids', [])
+    completed = run_store.completed(run_id)
+    return {
+        prompt_id: {'activite': activity, 'prompt': completed[key]}
+        for prompt_id, activity, key in zip(prompt_ids, activities, screen_keys(activities))
+        if key in completed
+    }
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_prompts_export(export_key: str, export_format: str, _prompts: Dict[str, Dict[str, Any]]) -> bytes:
+    """Export ZIP ou JSONL des prompts, construit en mémoire à la première demande puis gardé en cache pour l'exécution export_key"""
+    return build_texts_export(_prompts, export_format, 'prompt')
+
 def main():
+    # pandas n'est utile qu'aux tableaux et graphiques : importé à l'exécution, pas au chargement du module
+    import pandas as pd
+
     st.title("🤖 Générateur de Prompts Pédagogiques")
     st.markdown("*Générez des prompts prêts à utiliser dans d'autres outils IA*")
     st.markdown("---")
@@ -345,8 +76,48 @@ def main():
                 st.error("❌ Format de clé API invalide")
                 api_key = None
         
+        max_workers = st.slider(
+            "Générations simultanées",
+            min_value=1,
+            max_value=32,
+            value=GENERATION_CONFIG["activity_concurrency"],
+            help="Écrans générés en parallèle ; la durée totale se rapproche de celle de l'écran le plus long"
+        )
+        packed = st.checkbox(
+            "Regrouper les écrans de même type",
+            value=False,
+            help="Plusieurs écrans par requête : le prompt système n'est envoyé qu'une fois par groupe "
+                 "(moins de requêtes et de tokens d'entrée)"
+        )
+        
         st.markdown("---")
         
+        # Statistiques du cache des réponses LLM
+        response_cache = get_default_cache()
+        if response_cache is not None:
+            with st.expander("🗄️ Cache des réponses"):
+                cache_stats = response_cache.stats()
+                st.metric("Taux de hit", f"{cache_stats['hit_rate']:.0f}%")
+                st.caption(f"{cache_stats['hits']} hits · {cache_stats['misses']} misses · {cache_stats['disk_entries']} entrées")
+                if st.button("🗑️ Vider le cache"):
+                    response_cache.clear()
+        
+        # Exécutions enregistrées : les prompts terminés survivent à un rechargement de la page
+        run_store = get_default_run_store()
+        if run_store is not None:
+            with st.expander("💾 Exécutions enregistrées"):
+                saved_runs = run_store.list_runs('prompts', limit=10)
+                if not saved_runs:
+                    st.caption("Aucune exécution enregistrée")
+                for saved_run in saved_runs:
+                    st.caption(
+                        f"{saved_run['label'] or saved_run['run_id']} · {saved_run['done']}/{saved_run['total']} écrans"
+                        + (" · interrompue" if saved_run['status'] != 'completed' else "")
+                    )
+                    if st.button("📂 Recharger", key=f"reload_{saved_run['run_id']}"):
+                        st.session_state.generated_prompts = load_saved_prompts(run_store, saved_run['run_id'])
+                        st.session_state.prompts_export_key = f"{saved_run['run_id']}:{saved_run['updated_at']}"
+        
         # Informations
         with st.expander("ℹ️ À propos des prompts"):
             st.markdown("""
@@ -428,31 +199,61 @@ def main():
                 if selected_activities:
                     generator = PromptGenerator(api_key)
                     
-                    with st.spinner("🔄 Génération des prompts en cours..."):
-                        prompts = {}
+                    # Activités sélectionnées, dans l'ordre de la sélection
+                    activities = []
+                    prompt_ids = []
+                    for selected in selected_activities:
+                        activity_index = activity_options.index(selected)
+                        activity = sequencer_data[activity_index]
+                        activities.append(activity)
+                        prompt_ids.append(f"{activity.get('num_ecran', f'Act{activity_index+1}')}_{activity.get('type_activite', 'unknown')}")
+                    
+                    # Même sélection, même modèle : même exécution, les écrans déjà enregistrés ne sont pas régénérés
+                    run_id = make_run_id('prompts', [generator.model, generator.structured_output, activities])
+                    if run_store is not None:
+                        run_store.start_run(
+                            'prompts', len(activities), run_id, label=uploaded_file.name,
+                            metadata={'activities': activities, 'prompt_ids': prompt_ids}
+                        )
+                        resumed = len(run_store.completed(run_id))
+                        if resumed:
+                            st.info(f"💾 {resumed} écran(s) repris de l'exécution interrompue")
+                    
+                    with st.spinner("🔄 Génération des prompts en cours..."), get_tracer().run('prompts', activities=len(activities)):
+                        # Chaque prompt rejoint la session dès qu'il est prêt, dans l'ordre d'achèvement
+                        st.session_state.generated_prompts = {}
+                        failures = 0
                         
                         progress_bar = st.progress(0)
-                        for i, selected in enumerate(selected_activities):
-                            # Trouver l'index de l'activité sélectionnée
-                            activity_index = activity_options.index(selected)
-                            activity = sequencer_data[activity_index]
-                            
-                            # Générer le prompt
-                            prompt = generator.generate_prompt(
-                                activity, 
-                                activity.get('type_activite', 'text')
-                            )
-                            
-                            prompt_id = f"{activity.get('num_ecran', f'Act{activity_index+1}')}_{activity.get('type_activite', 'unknown')}"
-                            prompts[prompt_id] = {
-                                'activite': activity,
+                        status = st.empty()
+                        results = generator.generate_many(activities, max_workers, packed, store=run_store, run_id=run_id)
+                        for done, (index, prompt, error) in enumerate(results, 1):
+                            if error is not None:
+                                # Échec isolé : les autres activités continuent
+                                prompt = f"Erreur lors de la génération : {error}"
+                                failures += 1
+                            st.session_state.generated_prompts[prompt_ids[index]] = {
+                                'activite': activities[index],
                                 'prompt': prompt
                             }
-                            
-                            progress_bar.progress((i + 1) / len(selected_activities))
-                        
-                        st.session_state.generated_prompts = prompts
-                        st.success(f"✅ {len(prompts)} prompts générés avec succès !")
+                            progress_bar.progress(done / len(activities))
+                            status.caption(f"{done}/{len(activities)} — {prompt_ids[index]} terminé")
+                        status.empty()
+                    if run_store is not None:
+                        run_store.finish_run(run_id, 'completed' if not failures else 'partial')
+                    
+                    # Ordre de la sélection pour l'affichage et les exports
+                    prompts = st.session_state.generated_prompts
+                    st.session_state.generated_prompts = {prompt_id: prompts[prompt_id] for prompt_id in prompt_ids}
+                    st.session_state.prompts_export_key = f"{run_id}:{datetime.now().isoformat()}"
+                    
+                    if failures:
+                        st.warning(f"⚠️ {failures} activité(s) en échec sur {len(activities)}")
+                    st.success(f"✅ {len(st.session_state.generated_prompts) - failures} prompts générés avec succès !")
+                    st.caption(f"📈 {format_usage_summary(generator.llm.usage_stats())}")
+                    trace_summary = get_tracer().last_run('prompts')
+                    if trace_summary is not None:
+                        st.caption(f"⏱️ {format_stage_summary(trace_summary)}")
                 else:
                     st.warning("⚠️ Veuillez sélectionner au moins une activité")
         
@@ -519,59 +320,43 @@ def main():
         st.markdown("---")
         st.subheader("📦 Export Global des Prompts")
         
-        col_export1, col_export2 = st.columns(2)
+        col_export1, col_export2, col_export3 = st.columns(3)
+        export_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # ZIP et JSONL construits à la demande (bouton « Préparer »), puis gardés en cache pour l'exécution affichée
+        export_key = st.session_state.setdefault('prompts_export_key', datetime.now().isoformat())
         
         with col_export1:
             # Export tous les prompts en un fichier
-            all_prompts_content = ""
-            for prompt_id, prompt_data in prompts.items():
-                activity = prompt_data['activite']
-                all_prompts_content += f"""
-# PROMPT {prompt_id} - {activity.get('titre_ecran', 'Sans titre')}
-
-Type: {activity.get('type_activite', 'N/A')}
-Durée: {activity.get('duree_estimee', 'N/A')} minutes
-Difficulté: {activity.get('difficulte', 'N/A')}
-
-## Prompt à copier-coller:
-
-{prompt_data['prompt']}
-
-{'='*80}
-
-"""
-            
             st.download_button(
                 label="📥 Télécharger Tous les Prompts",
-                data=all_prompts_content,
-                file_name=f"tous_prompts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+                data=export_prompts_text(prompts),
+                file_name=f"tous_prompts_{export_stamp}.txt",
                 mime="text/plain"
             )
         
         with col_export2:
-            # Export en JSON structuré
-            json_export = {
-                "metadata": {
-                    "date_generation": datetime.now().isoformat(),
-                    "nombre_prompts": len(prompts),
-                    "types_activites": list(set(prompt_data['activite'].get('type_activite') for prompt_data in prompts.values())),
-                    "usage": "Copiez-collez ces prompts dans ChatGPT, Claude, ou tout autre outil IA"
-                },
-                "prompts": {
-                    prompt_id: {
-                        "activite_info": prompt_data['activite'],
-                        "prompt_ready_to_use": prompt_data['prompt']
-                    }
-                    for prompt_id, prompt_data in prompts.items()
-                }
-            }
-            
-            st.download_button(
-                label="📥 Export JSON Structuré",
-                data=json.dumps(json_export, indent=2, ensure_ascii=False),
-                file_name=f"prompts_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                mime="application/json"
-            )
+            # Archive ZIP : un fichier Markdown par écran et un manifeste
+            if st.button("🗜️ Préparer l'archive ZIP", key="prepare_prompts_zip"):
+                st.session_state.prompts_zip_key = export_key
+            if st.session_state.get('prompts_zip_key') == export_key:
+                st.download_button(
+                    label="📥 Archive ZIP (un fichier par écran)",
+                    data=build_prompts_export(export_key, 'zip', prompts),
+                    file_name=f"prompts_{export_stamp}.zip",
+                    mime="application/zip"
+                )
+        
+        with col_export3:
+            # Export JSONL : une ligne par prompt
+            if st.button("🧾 Préparer l'export JSONL", key="prepare_prompts_jsonl"):
+                st.session_state.prompts_jsonl_key = export_key
+            if st.session_state.get('prompts_jsonl_key') == export_key:
+                st.download_button(
+                    label="📥 Export JSONL",
+                    data=build_prompts_export(export_key, 'jsonl', prompts),
+                    file_name=f"prompts_export_{export_stamp}.jsonl",
+                    mime="application/x-ndjson"
+                )
         
         # Bouton reset
         if st.button("🔄 Générer de Nouveaux Prompts"):
@@ -0,0 +1,799 @@
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+
+from json_stream import extract_complete_members, extract_partial_string
+from llm_cache import LLMCache, get_default_cache
+from llm_client import LLMClient
+from prompt_encoding import count_tokens
+from run_store import RunStore
+from sequencer_schema import (
+    PROMPT_SCHEMA, SCRIPT_SCHEMA, SchemaValidationError, keyed_texts_schema, parse_structured, response_format
+)
+from tracing import get_tracer, span
+from config import GENERATION_CONFIG, PACKING_CONFIG, PROMPT_CONFIG
+
+
+def format_activity_context(activity_data: Dict[str, Any]) -> str:
+    """Champs de l'écran transmis au modèle (partie variable du message utilisateur)"""
+    return f"""
+        Numéro d'écran : {activity_data.get('num_ecran', 'Non défini')}
+        Titre : {activity_data.get('titre_ecran', 'Non défini')}
+        Sous-titre : {activity_data.get('sous_titre', 'Non défini')}
+        Contenu : {activity_data.get('resume_contenu', 'Non défini')}
+        Niveau Bloom : {activity_data.get('niveau_bloom', 'Non défini')}
+        Difficulté : {activity_data.get('difficulte', 'Non défini')}
+        Durée : {activity_data.get('duree_estimee', 'Non défini')} minutes
+        Objectif : {activity_data.get('objectif_lie', 'Non défini')}
+        Commentaires : {activity_data.get('commentaire', 'Non défini')}
+        Séquence : {activity_data.get('sequence', 'Non défini')}
+        """
+
+
+def screen_keys(activities: List[Dict[str, Any]]) -> List[str]:
+    """Identifiant de chaque écran : num_ecran, suffixé en cas de doublon"""
+    keys = []
+    seen: Dict[str, int] = {}
+    for index, activity in enumerate(activities):
+        base = str(activity.get('num_ecran') or f"Act{index + 1}")
+        seen[base] = seen.get(base, 0) + 1
+        keys.append(base if seen[base] == 1 else f"{base}~{seen[base]}")
+    return keys
+
+
+class ActivityGenerator:
+    """
+    Base commune des générateurs par écran (scripts et prompts), sans dépendance à Streamlit.
+
+    Les sous-classes fournissent les prompts système par type d'activité et le
+    schéma de la réponse structurée ; la base gère l'appel, la sortie structurée
+    et la reprise des réponses tronquées.
+    """
+
+    model = "gpt-4o"
+    max_tokens = 2000
+    schema: Dict[str, Any] = {}
+    schema_name = ""
+    text_field = ""
+
+    def __init__(
+        self,
+        api_key: str,
+        cache: Optional[LLMCache] = None,
+        structured_output: Optional[bool] = None,
+        base_url: Optional[str] = None,
+        refresh: bool = False
+    ):
+        """
+        Initialise le générateur avec la clé API OpenAI
+
+        structured_output : réponse contrainte par le schéma du générateur ({"num_ecran", "type_activite", texte})
+        base_url : serveur compatible OpenAI à la place de l'API (ex. mock_llm_server pour les benchmarks)
+        refresh : régénérer sans relire le cache de réponses (reprise ignorée, --fresh)
+        """
+        self.llm = LLMClient(
+            api_key, cache=cache if cache is not None else get_default_cache(), base_url=base_url,
+            refresh=refresh
+        )
+        self.structured_output = PROMPT_CONFIG["structured_output"] if structured_output is None else structured_output
+        self.max_continuations = GENERATION_CONFIG["max_continuations"]
+
+    @property
+    def client(self):
+        """Client OpenAI synchrone (créé au premier accès)"""
+        return self.llm.client
+
+    def system_prompts(self) -> Dict[str, str]:
+        """Prompt système par type d'activité"""
+        raise NotImplementedError
+
+    def instruction(self, activity_type: str) -> str:
+        """Consigne en tête du message utilisateur"""
+        raise NotImplementedError
+
+    def build_messages(self, activity_data: Dict[str, Any], activity_type: str) -> List[Dict[str, str]]:
+        """
+        Messages de la requête : consigne en tête, données variables en fin (préfixe stable).
+        Lève ValueError si le type d'activité n'est pas supporté.
+        """
+        prompts = self.system_prompts()
+        if activity_type not in prompts:
+            raise ValueError(f"Type d'activité '{activity_type}' non supporté")
+
+        context = f"""
+        {self.instruction(activity_type)}
+""" + format_activity_context(activity_data)
+
+        return [
+            {"role": "system", "content": prompts[activity_type]},
+            {"role": "user", "content": context}
+        ]
+
+    def completion_params(self, activity_data: Dict[str, Any], activity_type: str) -> Dict[str, Any]:
+        """Paramètres de l'appel chat.completions pour un écran"""
+        params = {
+            "model": self.model,
+            "messages": self.build_messages(activity_data, activity_type),
+            "temperature": 0.7,
+            "max_tokens": self.max_tokens
+        }
+        if self.structured_output:
+            params["response_format"] = response_format(self.schema_name, self.schema)
+        return params
+
+    def generate_text(self, activity_data: Dict[str, Any], activity_type: str, use_cache: Optional[bool] = None) -> str:
+        """
+        Génère le texte d'un écran ; lève une exception en cas d'échec.
+        Les temps par étape vont dans une exécution nommée d'après text_field, ou dans
+        l'exécution déjà ouverte (lot d'écrans, fichier de la CLI).
+        use_cache=False : ignore la réponse en cache (défaut : selon llm.refresh).
+        """
+        with get_tracer().run(self.text_field, num_ecran=activity_data.get('num_ecran')):
+            with span('prompt_build'):
+                params = self.completion_params(activity_data, activity_type)
+            response = self.llm.complete(use_cache=use_cache, **params)
+            return self.decode_response(response, params)
+
+    def generate_many(
+        self,
+        activities: List[Dict[str, Any]],
+        max_workers: Optional[int] = None,
+        packed: bool = False,
+        store: Optional[RunStore] = None,
+        run_id: Optional[str] = None
+    ) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+        """
+        Génère les textes de plusieurs écrans en parallèle, dans un pool de threads borné
+        (max_workers, GENERATION_CONFIG["activity_concurrency"] par défaut).
+
+        Produit (index, texte, erreur) dans l'ordre d'achèvement, pour afficher chaque
+        écran dès qu'il est prêt ; un échec n'affecte que son écran (texte None).
+        packed : une requête par groupe d'écrans de même type (pack_groups) au lieu d'une par écran.
+        Chaque tâche s'exécute dans une copie du contexte de l'appelant : elle reste
+        rattachée à l'exécution tracée en cours.
+        store, run_id : point de reprise (run_store.RunStore) ; chaque écran est enregistré
+        dès son arrivée et les écrans déjà réussis de l'exécution sont produits sans appel.
+        """
+        if not activities:
+            return
+        keys = screen_keys(activities)
+        pending = list(range(len(activities)))
+        if store is not None and run_id is not None:
+            done = store.completed(run_id)
+            pending = [index for index in pending if keys[index] not in done]
+            for index, key in enumerate(keys):
+                if key in done:
+                    yield index, done[key], None
+            if not pending:
+                return
+
+        if packed:
+            pending_groups = self.pack_groups([activities[index] for index in pending])
+            groups = [[pending[position] for position in group] for group in pending_groups]
+        else:
+            groups = [[index] for index in pending]
+        max_workers = max_workers or GENERATION_CONFIG["activity_concurrency"]
+        pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups))))
+        try:
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run, self._generate_indexes, activities, keys, group,
+                    store if run_id is not None else None, run_id
+                )
+                for group in groups
+            ]
+            for future in as_completed(futures):
+                yield from future.result()
+        finally:
+            # Itération interrompue : les écrans pas encore commencés sont abandonnés
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _generate_indexes(
+        self,
+        activities: List[Dict[str, Any]],
+        keys: List[str],
+        group: List[int],
+        store: Optional[RunStore] = None,
+        run_id: Optional[str] = None
+    ) -> List[Tuple[int, Optional[str], Optional[str]]]:
+        """
+        (index, texte, erreur) des écrans d'un groupe ; les écrans absents de la réponse groupée sont générés seuls.
+        Les résultats sont enregistrés dans store depuis le thread de travail : un écran payé est conservé
+        même si l'appelant a cessé de lire les résultats.
+        """
+        texts: Dict[str, str] = {}
+        if len(group) > 1:
+            try:
+                texts = self.generate_group([activities[index] for index in group], [keys[index] for index in group])
+            except Exception:
+                texts = {}
+
+        outcomes = []
+        for index in group:
+            if keys[index] in texts:
+                outcomes.append((index, texts[keys[index]], None))
+                continue
+            try:
+                outcomes.append((index, self.generate_text(activities[index], activities[index].get('type_activite', 'text')), None))
+            except Exception as e:
+                outcomes.append((index, None, str(e)))
+        if store is not None:
+            for index, text, error in outcomes:
+                store.save_item(run_id, keys[index], text, error)
+        return outcomes
+
+    def pack_groups(self, activities: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Index des écrans regroupés par type d'activité et par séquence, dans l'ordre du
+        séquenceur : un groupe ne mêle jamais deux séquences. Un groupe est fermé dès qu'il atteint PACKING_CONFIG["max_screens"] écrans, ou quand
+        l'écran suivant dépasserait le budget d'entrée (max_input_tokens) ou de sortie
+        (max_tokens du générateur par écran, au plus max_output_tokens).
+        """
+        prompts = self.system_prompts()
+        by_group: Dict[Tuple[str, str], List[int]] = {}
+        for index, activity in enumerate(activities):
+            group_key = (activity.get('type_activite', 'text'), str(activity.get('sequence', '')))
+            by_group.setdefault(group_key, []).append(index)
+
+        max_screens = max(1, min(PACKING_CONFIG["max_screens"], PACKING_CONFIG["max_output_tokens"] // self.max_tokens))
+        groups = []
+        for (activity_type, _sequence), indexes in by_group.items():
+            base_tokens = count_tokens(prompts.get(activity_type, '') + self.instruction(activity_type), self.model)
+            group: List[int] = []
+            input_tokens = base_tokens
+            for index in indexes:
+                tokens = count_tokens(format_activity_context(activities[index]), self.model)
+                if group and (len(group) >= max_screens or input_tokens + tokens > PACKING_CONFIG["max_input_tokens"]):
+                    groups.append(group)
+                    group, input_tokens = [], base_tokens
+                group.append(index)
+                input_tokens += tokens
+            if group:
+                groups.append(group)
+        return groups
+
+    def build_group_messages(
+        self,
+        activities: List[Dict[str, Any]],
+        keys: List[str],
+        activity_type: str
+    ) -> List[Dict[str, str]]:
+        """
+        Messages d'une requête groupée : même prompt système que pour un écran seul,
+        consigne de format puis les données de chaque écran sous son identifiant.
+        Lève ValueError si le type d'activité n'est pas supporté.
+        """
+        prompts = self.system_prompts()
+        if activity_type not in prompts:
+            raise ValueError(f"Type d'activité '{activity_type}' non supporté")
+
+        context = f"""
+        Les {len(keys)} écrans ci-dessous sont du même type. Traitez chacun indépendamment,
+        avec le même niveau de détail que s'il était seul. Retournez UNIQUEMENT un objet JSON
+        dont les clés sont exactement les identifiants des écrans ({', '.join(keys)}) et les
+        valeurs le {self.text_field} complet de l'écran correspondant.
+
+        {self.instruction(activity_type)}
+""" + ''.join(
+            f"\n        ### Écran {key}" + format_activity_context(activity)
+            for key, activity in zip(keys, activities)
+        )
+
+        return [
+            {"role": "system", "content": prompts[activity_type]},
+            {"role": "user", "content": context}
+        ]
+
+    def generate_group(self, activities: List[Dict[str, Any]], keys: List[str]) -> Dict[str, str]:
+        """
+        Génère en une requête les textes d'écrans de même type ; retourne {identifiant: texte}.
+        Les écrans entièrement reçus d'une réponse tronquée ou mal formée sont conservés ;
+        seuls les écrans absents ou coupés sont omis (à générer seuls).
+        """
+        activity_type = activities[0].get('type_activite', 'text')
+        with get_tracer().run(self.text_field, screens=len(activities)):
+            with span('prompt_build', screens=len(activities)):
+                params = {
+                    "model": self.model,
+                    "messages": self.build_group_messages(activities, keys, activity_type),
+                    "temperature": 0.7,
+                    "max_tokens": min(self.max_tokens * len(activities), PACKING_CONFIG["max_output_tokens"])
+                }
+                if self.structured_output:
+                    params["response_format"] = response_format(f"{self.text_field}s_groupes", keyed_texts_schema(keys))
+            response = self.llm.complete(**params)
+            with span('parse', screens=len(activities)):
+                texts = self._split_group_response(response['content'], keys)
+            if len(texts) < len(keys):
+                # Réponse incomplète : les écrans manquants seront générés seuls, sans la resservir du cache
+                self.llm.discard(params)
+            return texts
+
+    @staticmethod
+    def _split_group_response(content: str, keys: List[str]) -> Dict[str, str]:
+        """
+        Textes non vides de la réponse groupée, pour les identifiants attendus ; une réponse
+        tronquée ou mal terminée rend les écrans dont la valeur a été reçue en entier.
+        """
+        data = extract_complete_members(content or '')
+        return {key: data[key] for key in keys if isinstance(data.get(key), str) and data[key].strip()}
+
+    def generate_batch_offline(
+        self,
+        activities: List[Dict[str, Any]],
+        directory: Optional[str] = None,
+        backend: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        on_status: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Génère les textes via l'API Batch (débit maximal, coût réduit, résultats sous 24 h).
+        Bloque jusqu'à la fin du lot ; retourne {num_ecran: {'activite', text_field, 'error'}}.
+
+        directory : répertoire du lot (défaut : dérivé des écrans, sous BATCH_CONFIG["directory"]) ;
+        relancer avec les mêmes écrans reprend le lot au lieu de le soumettre à nouveau.
+        backend : "openai" ou "local" (substitut fichier), BATCH_CONFIG["backend"] par défaut
+        """
+        from batch_runner import BatchRun
+
+        directory = directory or BatchRun.default_directory(self, activities)
+        return BatchRun(self, directory, backend, poll_interval).run(activities, on_status)
+
+    def decode_response(self, response: Dict[str, Any], params: Dict[str, Any]) -> str:
+        """Texte de la réponse, prolongé par des continuations si elle est tronquée"""
+        if response['finish_reason'] == 'length':
+            # Réponse tronquée par max_tokens : reprise à la suite du texte déjà produit
+            text = response['content']
+            if self.structured_output:
+                with span('parse'):
+                    text = extract_partial_string(text, self.text_field)
+            text, _ = self.llm.continue_text(params, text, self.max_continuations)
+            return text
+
+        if self.structured_output:
+            with span('parse'):
+                try:
+                    return parse_structured(response['content'], self.schema)[self.text_field]
+                except (json.JSONDecodeError, SchemaValidationError):
+                    # Réponse inexploitable : « Régénérer » doit interroger à nouveau l'API
+                    self.llm.discard(params)
+                    raise
+        return response['content']
+
+
+class ScriptGenerator(ActivityGenerator):
+    """Scripts pédagogiques détaillés, un par écran du séquenceur"""
+
+    schema = SCRIPT_SCHEMA
+    schema_name = "script_pedagogique"
+    text_field = "script"
+
+    def generate_script(self, activity_data: Dict, activity_type: str) -> str:
+        """Génère un script pédagogique pour une activité spécifique (message d'erreur en cas d'échec)"""
+        if activity_type not in self.system_prompts():
+            return f"Type d'activité '{activity_type}' non supporté"
+        
+        try:
+            return self.generate_text(activity_data, activity_type)
+        except Exception as e:
+            return f"Erreur lors de la génération : {str(e)}"
+
+    def instruction(self, activity_type: str) -> str:
+        return f"""Générez le script pédagogique détaillé pour cette activité de type "{activity_type}".
+
+        ACTIVITÉ À SCRIPTER :"""
+
+    def system_prompts(self) -> Dict[str, str]:
+        # Prompts spécialisés par type d'activité
+        return {
+            'text': self._get_text_prompt(),
+            'quiz': self._get_quiz_prompt(),
+            'accordion': self._get_accordion_prompt(),
+            'video': self._get_video_prompt(),
+            'image': self._get_image_prompt(),
+            'flash-card': self._get_flashcard_prompt()
+        }
+
+    def _get_text_prompt(self) -> str:
+        return """
+        Vous êtes un expert en rédaction pédagogique. Votre mission : créer un script de contenu textuel structuré et engageant.
+
+        GÉNÉREZ UN SCRIPT TEXTUEL avec :
+        1. Un titre accrocheur
+        2. Une introduction captivante (2-3 phrases)
+        3. Le contenu principal organisé en sections claires
+        4. Des exemples concrets et pertinents
+        5. Des éléments de mise en forme (gras, italique, listes)
+        6. Une conclusion avec points clés à retenir
+        7. Une transition vers la suite
+
+        ADAPTEZ selon la difficulté :
+        - Facile : langage simple, exemples de base
+        - Moyen : vocabulaire technique modéré
+        - Difficile : terminologie spécialisée, concepts avancés
+
+        FORMAT : Script en texte formaté, prêt à intégrer dans un outil de formation.
+        """
+    
+    def _get_quiz_prompt(self) -> str:
+        return """
+        Vous êtes un expert en évaluation pédagogique. Votre mission : créer un script de quiz interactif.
+
+        GÉNÉREZ UN SCRIPT DE QUIZ avec :
+        1. Instructions claires pour l'apprenant
+        2. 3-8 questions selon la durée (environ 2 min par question)
+        3. Questions adaptées au niveau de Bloom spécifié
+        4. Options de réponses plausibles
+        5. Bonnes réponses avec explications
+        6. Feedbacks constructifs pour les mauvaises réponses
+        7. Score et bilan final
+
+        TYPES DE QUESTIONS selon Bloom :
+        - Comprendre : QCM de définition, vrai/faux
+        - Appliquer : Questions de mise en situation
+        - Analyser : Questions de comparaison, analyse de cas
+        - Évaluer : Questions d'argumentation, critiques
+
+        FORMAT : Script détaillé avec questions, réponses et feedbacks.
+        """
+    
+    def _get_accordion_prompt(self) -> str:
+        return """
+        Vous êtes un expert en structuration d'informations. Votre mission : créer un script d'accordion pédagogique.
+
+        GÉNÉREZ UN SCRIPT D'ACCORDION avec :
+        1. Introduction générale du contenu
+        2. 4-8 sections dépliables selon la durée
+        3. Titres de sections engageants (fermés)
+        4. Contenu détaillé pour chaque section (ouvert)
+        5. Progression logique entre les sections
+        6. Éléments visuels suggérés (images, schémas)
+        7. Interactions recommandées (clic, survol)
+
+        USAGES selon Bloom :
+        - Comprendre : Définitions expandables, explications détaillées
+        - Analyser : Comparaisons structurées, décompositions
+        - Évaluer : Critères d'évaluation, grilles d'analyse
+
+        FORMAT : Script avec sections titrées et contenu détaillé pour chaque partie.
+        """
+    
+    def _get_video_prompt(self) -> str:
+        return """
+        Vous êtes un expert en scénarisation vidéo éducative. Votre mission : créer un script vidéo pédagogique.
+
+        GÉNÉREZ UN SCRIPT VIDÉO avec :
+        1. Synopsis et objectif de la vidéo
+        2. Structure temporelle (intro 10%, développement 70%, conclusion 20%)
+        3. Texte de narration (voix off)
+        4. Descriptions des éléments visuels
+        5. Animations et transitions suggérées
+        6. Moments d'interaction ou de pause
+        7. Ressources visuelles nécessaires
+
+        STYLES selon difficulté :
+        - Facile : narration simple, visuels clairs
+        - Moyen : rythme modéré, animations explicatives
+        - Difficile : contenu dense, schémas complexes
+
+        FORMAT : Script détaillé avec timecodes, narration et indications visuelles.
+        """
+    
+    def _get_image_prompt(self) -> str:
+        return """
+        Vous êtes un expert en design pédagogique visuel. Votre mission : créer un script d'image interactive.
+
+        GÉNÉREZ UN SCRIPT D'IMAGE avec :
+        1. Description générale de l'image principale
+        2. Éléments visuels clés à inclure
+        3. Zones interactives (cliquables, hover)
+        4. Contenu des pop-ups/infobulles
+        5. Légendes et annotations
+        6. Palette de couleurs suggérée
+        7. Style graphique recommandé
+
+        TYPES selon Bloom :
+        - Se souvenir : Schémas simples, illustrations mnémotechniques
+        - Comprendre : Infographies, diagrammes explicatifs
+        - Analyser : Cartes conceptuelles, comparaisons visuelles
+
+        FORMAT : Script descriptif avec spécifications visuelles et interactions.
+        """
+    
+    def _get_flashcard_prompt(self) -> str:
+        return """
+        Vous êtes un expert en mémorisation active. Votre mission : créer un script de flash-cards pédagogiques.
+
+        GÉNÉREZ UN SCRIPT DE FLASH-CARDS avec :
+        1. Introduction au jeu de cartes
+        2. 8-20 cartes selon la durée (1-2 min par carte)
+        3. Questions/termes au recto
+        4. Réponses/définitions au verso
+        5. Indices ou mnémotechniques
+        6. Progression par difficulté
+        7. Système de révision suggéré
+
+        TYPES DE CARTES :
+        - Concept ↔ Définition
+        - Question ↔ Réponse
+        - Terme ↔ Explication
+        - Situation ↔ Solution
+
+        FORMAT : Script avec cartes numérotées, recto/verso et conseils d'utilisation.
+        """
+
+
+class PromptGenerator(ActivityGenerator):
+    """Prompts prêts à l'emploi dans un outil externe, un par écran du séquenceur"""
+
+    schema = PROMPT_SCHEMA
+    schema_name = "prompt_activite"
+    text_field = "prompt"
+
+    def generate_prompt(self, activity_data: Dict, activity_type: str) -> str:
+        """Génère un prompt spécialisé pour une activité spécifique (message d'erreur en cas d'échec)"""
+        if activity_type not in self.system_prompts():
+            return f"Type d'activité '{activity_type}' non supporté"
+        
+        try:
+            return self.generate_text(activity_data, activity_type)
+        except Exception as e:
+            return f"Erreur lors de la génération : {str(e)}"
+
+    def instruction(self, activity_type: str) -> str:
+        return f"""Générez un PROMPT COMPLET et PRÊT À UTILISER pour créer cette activité de type "{activity_type}" dans un outil externe.
+
+        DONNÉES DE L'ACTIVITÉ :"""
+
+    def system_prompts(self) -> Dict[str, str]:
+        # Templates de prompts par type d'activité
+        return {
+            'text': self._get_text_prompt_template(),
+            'quiz': self._get_quiz_prompt_template(),
+            'accordion': self._get_accordion_prompt_template(),
+            'video': self._get_video_prompt_template(),
+            'image': self._get_image_prompt_template(),
+            'flash-card': self._get_flashcard_prompt_template()
+        }
+
+    def _get_text_prompt_template(self) -> str:
+        return """
+        Vous êtes un expert en génération de prompts pour outils de création de contenu textuel.
+        
+        VOTRE MISSION : Générer un PROMPT COMPLET que l'utilisateur pourra copier-coller dans ChatGPT, Claude, ou tout autre outil IA pour créer automatiquement le contenu textuel pédagogique.
+        
+        LE PROMPT DOIT CONTENIR :
+        1. Le rôle de l'IA (ex: "Tu es un expert en...")
+        2. Le contexte et l'objectif pédagogique précis
+        3. Les spécifications techniques (durée, niveau, difficulté)
+        4. La structure exacte attendue
+        5. Les critères de qualité
+        6. Le format de sortie souhaité
+        7. Les contraintes et adaptations
+        
+        GÉNÉREZ UN PROMPT COMME CELUI-CI :
+        "Tu es un expert en rédaction pédagogique spécialisé en [domaine]. Crée un contenu textuel de [durée] minutes sur [sujet]...
+        
+        STRUCTURE ATTENDUE :
+        - Titre accrocheur
+        - Introduction (50 mots)
+        - Corps principal (3 sections)
+        - Conclusion avec points clés
+        
+        CRITÈRES :
+        - Niveau de difficulté : [niveau]
+        - Vocabulaire adapté à [public]
+        - Exemples concrets inclus
+        
+        LIVRABLES : Texte formaté en markdown, prêt à intégrer."
+        
+        FORMAT DE SORTIE : UN PROMPT COMPLET PRÊT À COPIER-COLLER dans un outil IA.
+        """
+    
+    def _get_quiz_prompt_template(self) -> str:
+        return """
+        Vous êtes un expert en génération de prompts pour outils de création de quiz.
+        
+        VOTRE MISSION : Générer un PROMPT COMPLET pour créer automatiquement un quiz pédagogique avec questions, réponses, et feedbacks.
+        
+        LE PROMPT DOIT SPÉCIFIER :
+        1. Le rôle d'expert en évaluation pédagogique
+        2. Le sujet et niveau de Bloom ciblé
+        3. Le nombre de questions selon la durée
+        4. Les types de questions adaptés
+        5. La structure des feedbacks
+        6. Le format de sortie (JSON, texte structuré)
+        7. Les critères de difficulté
+        
+        EXEMPLE DE PROMPT À GÉNÉRER :
+        "Tu es un expert en évaluation pédagogique. Crée un quiz de [X] questions sur [sujet] pour tester le niveau [Bloom]...
+        
+        SPÉCIFICATIONS :
+        - Durée totale : [X] minutes
+        - [X] questions QCM + [X] questions ouvertes
+        - Difficulté : [niveau]
+        - 4 options par QCM avec distracteurs plausibles
+        
+        POUR CHAQUE QUESTION :
+        - Énoncé clair
+        - Options de réponse
+        - Bonne réponse avec explication
+        - Feedback pour réponses incorrectes
+        
+        FORMAT : JSON structuré avec questions, réponses, feedbacks."
+        
+        GÉNÉREZ LE PROMPT COMPLET PRÊT À UTILISER.
+        """
+    
+    def _get_accordion_prompt_template(self) -> str:
+        return """
+        Vous êtes un expert en génération de prompts pour outils de création d'accordéons interactifs.
+        
+        VOTRE MISSION : Générer un PROMPT COMPLET pour créer un accordion pédagogique avec sections dépliables organisées logiquement.
+        
+        LE PROMPT DOIT INCLURE :
+        1. Le rôle d'expert en structuration d'informations
+        2. Le contenu à organiser en sections
+        3. La logique de progression pédagogique
+        4. Les spécifications d'interactivité
+        5. Le format de sortie structuré
+        6. Les éléments visuels suggérés
+        
+        MODÈLE DE PROMPT :
+        "Tu es un expert en design pédagogique interactif. Crée un accordion sur [sujet] avec [X] sections dépliables...
+        
+        STRUCTURE :
+        - Introduction générale (visible)
+        - [X] sections principales (titres visibles, contenu dépliable)
+        - Progression logique du simple au complexe
+        
+        POUR CHAQUE SECTION :
+        - Titre accrocheur (fermé)
+        - Contenu détaillé (ouvert)
+        - Éléments visuels suggérés
+        - Temps de lecture estimé
+        
+        SPÉCIFICATIONS :
+        - Durée totale : [X] minutes
+        - Niveau : [difficulté]
+        - Navigation : séquentielle/libre
+        
+        FORMAT : Structure JSON avec sections, titres, contenus."
+        
+        CRÉEZ LE PROMPT COMPLET POUR OUTIL EXTERNE.
+        """
+    
+    def _get_video_prompt_template(self) -> str:
+        return """
+        Vous êtes un expert en génération de prompts pour outils de création vidéo pédagogique.
+        
+        VOTRE MISSION : Générer un PROMPT COMPLET pour créer un script vidéo avec narration, éléments visuels et timing.
+        
+        LE PROMPT DOIT CONTENIR :
+        1. Le rôle de scénariste vidéo éducatif
+        2. Les spécifications techniques (durée, style)
+        3. La structure narrative (intro/développement/conclusion)
+        4. Les descriptions d'éléments visuels
+        5. Le texte de narration
+        6. Les timecodes et transitions
+        7. Les ressources nécessaires
+        
+        TEMPLATE DE PROMPT :
+        "Tu es un scénariste vidéo spécialisé en contenu éducatif. Crée un script vidéo de [X] minutes sur [sujet]...
+        
+        STRUCTURE VIDÉO :
+        - Introduction accrocheuse (10% du temps)
+        - Développement en [X] parties (70%)
+        - Conclusion synthétique (20%)
+        
+        POUR CHAQUE SÉQUENCE :
+        - Timecode (début-fin)
+        - Texte de narration
+        - Description des visuels
+        - Animations suggérées
+        - Transitions
+        
+        SPÉCIFICATIONS :
+        - Durée : [X] minutes
+        - Style : [documentaire/explicatif/conversationnel]
+        - Public : [niveau]
+        - Rythme : adapté à la difficulté [niveau]
+        
+        LIVRABLES :
+        - Script complet avec timecodes
+        - Liste des ressources visuelles
+        - Instructions de montage"
+        
+        GÉNÉREZ LE PROMPT PRÊT POUR OUTIL VIDÉO.
+        """
+    
+    def _get_image_prompt_template(self) -> str:
+        return """
+        Vous êtes un expert en génération de prompts pour outils de création d'images pédagogiques interactives.
+        
+        VOTRE MISSION : Générer un PROMPT COMPLET pour créer une image/infographie interactive avec zones cliquables et annotations.
+        
+        LE PROMPT DOIT SPÉCIFIER :
+        1. Le rôle de designer pédagogique visuel
+        2. Le type d'image (schéma, carte, infographie, diagramme)
+        3. Les éléments visuels principaux
+        4. Les zones interactives
+        5. Les styles graphiques
+        6. Les spécifications techniques
+        7. L'accessibilité et la lisibilité
+        
+        EXEMPLE DE PROMPT :
+        "Tu es un designer pédagogique spécialisé en visualisation d'informations. Crée une [type d'image] interactive sur [sujet]...
+        
+        ÉLÉMENTS VISUELS :
+        - Image principale : [description]
+        - [X] zones interactives cliquables
+        - Légendes et annotations
+        - Palette de couleurs : [spécifications]
+        
+        INTERACTIVITÉ :
+        - Zones cliquables avec pop-ups informatifs
+        - Survol avec infobulles
+        - Navigation entre éléments
+        
+        SPÉCIFICATIONS TECHNIQUES :
+        - Résolution : 1920x1080
+        - Style : [moderne/minimaliste/illustratif]
+        - Accessibilité : contrastes élevés, texte lisible
+        - Durée d'exploration : [X] minutes
+        
+        FORMAT DE SORTIE :
+        - Fichier image principal
+        - Coordonnées des zones interactives
+        - Contenu des pop-ups
+        - Guide d'utilisation"
+        
+        CRÉEZ LE PROMPT COMPLET POUR OUTIL GRAPHIQUE.
+        """
+    
+    def _get_flashcard_prompt_template(self) -> str:
+        return """
+        Vous êtes un expert en génération de prompts pour outils de création de flash-cards pédagogiques.
+        
+        VOTRE MISSION : Générer un PROMPT COMPLET pour créer un jeu de flash-cards optimisé pour la mémorisation active.
+        
+        LE PROMPT DOIT INCLURE :
+        1. Le rôle d'expert en mémorisation
+        2. Le nombre de cartes selon la durée
+        3. Les types d'associations (terme-définition, question-réponse)
+        4. La progression par difficulté
+        5. Le système de révision
+        6. Le format de sortie
+        7. Les principes de mémorisation
+        
+        MODÈLE DE PROMPT :
+        "Tu es un expert en sciences cognitives et mémorisation active. Crée un jeu de [X] flash-cards sur [sujet]...
+        
+        SPÉCIFICATIONS :
+        - [X] cartes pour [X] minutes d'utilisation
+        - Types : [X]% définitions, [X]% questions, [X]% applications
+        - Progression : du simple au complexe
+        - Niveau : [difficulté]
+        
+        POUR CHAQUE CARTE :
+        - RECTO : Question/terme/situation claire
+        - VERSO : Réponse/définition/explication complète
+        - Indices mnémotechniques si pertinent
+        - Tags pour catégorisation
+        
+        PRINCIPES DE CONCEPTION :
+        - Une information par carte
+        - Questions précises
+        - Réponses concises mais complètes
+        - Exemples concrets inclus
+        
+        SYSTÈME DE RÉVISION :
+        - Intervalle de répétition espacée
+        - Algorithme de difficulté adaptative
+        - Suivi des performances
+        
+        FORMAT : JSON avec cartes structurées recto/verso + métadonnées."
+        
+        GÉNÉREZ LE PROMPT COMPLET POUR OUTIL DE FLASHCARDS.
+        """
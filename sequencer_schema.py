@@ -0,0 +1,184 @@
+import json
+from typing import Dict, List, Any, Tuple
+
+# Types d'activités autorisés dans un séquenceur
+AUTHORIZED_ACTIVITY_TYPES = ['text', 'quiz', 'accordion', 'video', 'image', 'flash-card']
+
+DIFFICULTY_LEVELS = ['facile', 'moyen', 'difficile']
+
+# Schéma d'un écran du séquenceur (mode strict : tous les champs requis, aucun champ en plus)
+SCREEN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sequence": {"type": "string"},
+        "num_ecran": {"type": "string"},
+        "titre_ecran": {"type": "string"},
+        "sous_titre": {"type": "string"},
+        "resume_contenu": {"type": "string"},
+        "type_activite": {"type": "string", "enum": AUTHORIZED_ACTIVITY_TYPES},
+        "niveau_bloom": {"type": "string"},
+        "difficulte": {"type": "string", "enum": DIFFICULTY_LEVELS},
+        "duree_estimee": {"type": "integer"},
+        "objectif_lie": {"type": "string"},
+        "commentaire": {"type": "string"}
+    },
+    "required": [
+        "sequence", "num_ecran", "titre_ecran", "sous_titre", "resume_contenu", "type_activite",
+        "niveau_bloom", "difficulte", "duree_estimee", "objectif_lie", "commentaire"
+    ],
+    "additionalProperties": False
+}
+
+# Les structured outputs imposent un objet à la racine : les écrans sont sous la clé "ecrans"
+SEQUENCER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "ecrans": {"type": "array", "items": SCREEN_SCHEMA}
+    },
+    "required": ["ecrans"],
+    "additionalProperties": False
+}
+
+# Plan de la phase squelette de la génération en deux temps
+SKELETON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "sequences": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "sequence": {"type": "string"},
+                    "role": {"type": "string"},
+                    "niveau_bloom": {"type": "string"},
+                    "objectifs_couverts": {"type": "array", "items": {"type": "integer"}},
+                    "nombre_ecrans": {"type": "integer"}
+                },
+                "required": ["sequence", "role", "niveau_bloom", "objectifs_couverts", "nombre_ecrans"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["sequences"],
+    "additionalProperties": False
+}
+
+# Script pédagogique d'un écran (ScriptGenerator)
+SCRIPT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "num_ecran": {"type": "string"},
+        "type_activite": {"type": "string", "enum": AUTHORIZED_ACTIVITY_TYPES},
+        "script": {"type": "string"}
+    },
+    "required": ["num_ecran", "type_activite", "script"],
+    "additionalProperties": False
+}
+
+# Prompt prêt à l'emploi d'un écran (PromptGenerator)
+PROMPT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "num_ecran": {"type": "string"},
+        "type_activite": {"type": "string", "enum": AUTHORIZED_ACTIVITY_TYPES},
+        "prompt": {"type": "string"}
+    },
+    "required": ["num_ecran", "type_activite", "prompt"],
+    "additionalProperties": False
+}
+
+
+def keyed_texts_schema(keys: List[str]) -> Dict[str, Any]:
+    """Textes de plusieurs écrans en une réponse : un objet {identifiant d'écran: texte}"""
+    return {
+        "type": "object",
+        "properties": {key: {"type": "string"} for key in keys},
+        "required": list(keys),
+        "additionalProperties": False
+    }
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "number": (int, float)
+}
+
+
+class SchemaValidationError(ValueError):
+    """Réponse structurée non conforme au schéma attendu"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("; ".join(errors[:5]) + (f" (+{len(errors) - 5} erreurs)" if len(errors) > 5 else ""))
+
+
+def response_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Paramètre response_format d'un appel chat.completions en mode json_schema strict"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": schema}
+    }
+
+
+def validate(instance: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Valide localement une valeur contre le sous-ensemble de JSON Schema utilisé ici
+    (type, enum, properties, required, additionalProperties, items).
+    Retourne la liste des erreurs, vide si la valeur est conforme.
+    """
+    expected = schema.get("type")
+    if expected == "integer":
+        valid_type = isinstance(instance, int) and not isinstance(instance, bool)
+    elif expected == "number":
+        valid_type = isinstance(instance, (int, float)) and not isinstance(instance, bool)
+    elif expected is not None:
+        valid_type = isinstance(instance, _JSON_TYPES[expected])
+    else:
+        valid_type = True
+
+    if not valid_type:
+        return [f"{path} : type {expected} attendu, {type(instance).__name__} reçu"]
+
+    errors = []
+    if "enum" in schema and instance not in schema["enum"]:
+        errors.append(f"{path} : valeur '{instance}' hors de {schema['enum']}")
+
+    if expected == "object":
+        properties = schema.get("properties", {})
+        for field in schema.get("required", []):
+            if field not in instance:
+                errors.append(f"{path} : champ requis manquant '{field}'")
+        for field, value in instance.items():
+            if field in properties:
+                errors.extend(validate(value, properties[field], f"{path}.{field}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path} : champ non prévu '{field}'")
+
+    if expected == "array" and "items" in schema:
+        for index, item in enumerate(instance):
+            errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+
+    return errors
+
+
+def split_valid_screens(screens: List[Any]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Sépare les écrans conformes à SCREEN_SCHEMA des écrans invalides (retournés sous forme d'erreurs)"""
+    valid, errors = [], []
+    for index, screen in enumerate(screens):
+        screen_errors = validate(screen, SCREEN_SCHEMA, f"ecrans[{index}]")
+        if screen_errors:
+            errors.extend(screen_errors)
+        else:
+            valid.append(screen)
+    return valid, errors
+
+
+def parse_structured(content: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Décode une réponse structurée et la valide (lève json.JSONDecodeError ou SchemaValidationError)"""
+    data = json.loads(content)
+    errors = validate(data, schema)
+    if errors:
+        raise SchemaValidationError(errors)
+    return data
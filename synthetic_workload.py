@@ -0,0 +1,338 @@
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+
+from config import BLOOM_TAXONOMY
+from sequencer_schema import DIFFICULTY_LEVELS
+
+# Libellés des niveaux de Bloom tels qu'ils apparaissent dans les textes d'analyse
+BLOOM_LABELS = {
+    "se_souvenir": "Se souvenir",
+    "comprendre": "Comprendre",
+    "appliquer": "Appliquer",
+    "analyser": "Analyser",
+    "evaluer": "Évaluer",
+    "creer": "Créer"
+}
+
+# Difficulté (1 à 5) typique de chaque niveau
+BLOOM_DIFFICULTY = {
+    "se_souvenir": 1, "comprendre": 2, "appliquer": 3, "analyser": 3, "evaluer": 4, "creer": 5
+}
+
+# Types d'activités adaptés à chaque niveau, pour des séquenceurs plausibles
+BLOOM_ACTIVITIES = {
+    "se_souvenir": ["flash-card", "quiz", "text"],
+    "comprendre": ["text", "video", "image", "accordion"],
+    "appliquer": ["quiz", "accordion", "video"],
+    "analyser": ["accordion", "quiz", "image"],
+    "evaluer": ["quiz", "text", "accordion"],
+    "creer": ["text", "accordion"]
+}
+
+DOMAINS = {
+    "Cybersécurité": [
+        "les tentatives de phishing", "les mots de passe robustes", "les logiciels malveillants",
+        "les sauvegardes de données", "la connexion VPN", "les journaux de sécurité",
+        "les politiques de sécurité", "la réponse aux incidents", "le chiffrement des données",
+        "les droits d'accès"
+    ],
+    "Histoire du Maroc": [
+        "les réformes du makhzen", "les échanges commerciaux", "la bataille d'Isly",
+        "les traités avec l'Europe", "les structures tribales", "la crise financière",
+        "les missions diplomatiques", "les villes impériales"
+    ],
+    "Gestion de projet": [
+        "le cahier des charges", "le diagramme de Gantt", "la gestion des risques",
+        "le budget prévisionnel", "les indicateurs de suivi", "la conduite du changement",
+        "la communication d'équipe", "la clôture du projet"
+    ]
+}
+
+CONDITIONS = [
+    "en s'appuyant sur des exemples concrets",
+    "à partir d'une étude de cas fournie",
+    "avec un taux de réussite d'au moins 80 %",
+    "en moins de 30 minutes",
+    "à l'aide d'une grille d'analyse"
+]
+
+
+def capable_of(verb: str) -> str:
+    """« capable de citer », « capable d'analyser » (élision devant voyelle)"""
+    return f"capable d'{verb}" if verb[:1].lower() in "aeéèiîoôuh" else f"capable de {verb}"
+
+
+def parse_bloom_mix(spec: str) -> Dict[str, float]:
+    """
+    Convertit « comprendre=2,analyser=1 » en poids par niveau de Bloom.
+    Lève ValueError si un niveau est inconnu ou un poids invalide.
+    """
+    mix = {}
+    for part in spec.split(','):
+        if not part.strip():
+            continue
+        level, _, weight = part.partition('=')
+        level = level.strip()
+        if level not in BLOOM_LABELS:
+            raise ValueError(f"Niveau de Bloom inconnu : {level} (choix : {', '.join(BLOOM_LABELS)})")
+        try:
+            mix[level] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Poids invalide pour {level} : {weight}")
+        if mix[level] < 0:
+            raise ValueError(f"Poids négatif pour {level}")
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Le mélange de Bloom doit contenir au moins un poids positif")
+    return mix
+
+
+class WorkloadGenerator:
+    """
+    Génère des entrées synthétiques réalistes et déterministes (même graine, mêmes données).
+
+    - generate_text_input : format classification / formatted_objectives / difficulty_evaluation
+    - generate_bloom_input : format classification_bloom de exemple_cybersecurite.json
+    - generate_sequencer : écrans conformes à SCREEN_SCHEMA, pour les générateurs de scripts
+
+    malformed_rate : proportion de lignes volontairement altérées (champ manquant,
+    niveau illisible, numérotation perdue) pour exercer la tolérance des parseurs.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        domain: str = "Cybersécurité",
+        bloom_mix: Optional[Dict[str, float]] = None,
+        weeks: int = 8,
+        malformed_rate: float = 0.0
+    ):
+        if domain not in DOMAINS:
+            raise ValueError(f"Domaine inconnu : {domain} (choix : {', '.join(DOMAINS)})")
+        if not 0.0 <= malformed_rate <= 1.0:
+            raise ValueError("malformed_rate doit être compris entre 0 et 1")
+        self.seed = seed
+        self.domain = domain
+        self.bloom_mix = bloom_mix or {level: 1.0 for level in BLOOM_LABELS}
+        self.weeks = max(1, weeks)
+        self.malformed_rate = malformed_rate
+
+    def objectives(self, count: int, rng: random.Random) -> List[Dict[str, Any]]:
+        """Objectifs triés par semaine puis par niveau de Bloom (progression réaliste)"""
+        levels = list(self.bloom_mix)
+        weights = [self.bloom_mix[level] for level in levels]
+        order = list(BLOOM_LABELS)
+        topics = DOMAINS[self.domain]
+
+        objectives = []
+        for _ in range(count):
+            level = rng.choices(levels, weights)[0]
+            # Les niveaux élevés arrivent plutôt en fin de formation
+            position = order.index(level) / (len(order) - 1)
+            week = max(1, min(self.weeks, round(position * self.weeks + rng.uniform(-1.5, 1.5))))
+            objectives.append({
+                'bloom': level,
+                'verbe': rng.choice(BLOOM_TAXONOMY[level]['verbes_action']),
+                'sujet': rng.choice(topics),
+                'condition': rng.choice(CONDITIONS),
+                'semaine': week,
+                'difficulte': max(1, min(5, BLOOM_DIFFICULTY[level] + rng.choice((-1, 0, 0, 1)))),
+                'heures': rng.randint(2, 6) * (1 + order.index(level) // 2)
+            })
+        objectives.sort(key=lambda objective: (objective['semaine'], order.index(objective['bloom'])))
+        return objectives
+
+    def generate_text_input(self, objective_count: int = 3, index: int = 0) -> Dict[str, Any]:
+        """Entrée au format textuel lu par parse_input_data"""
+        rng = self._rng('text', index)
+        objectives = self.objectives(objective_count, rng)
+
+        classification, formatted, difficulty = [], [], []
+        for number, objective in enumerate(objectives, 1):
+            statement = f"L'apprenant sera {capable_of(objective['verbe'])} {objective['sujet']}."
+            label = BLOOM_LABELS[objective['bloom']]
+
+            bloom_line = f"Niveau de Bloom: {label}"
+            if self._malformed(rng):
+                bloom_line = rng.choice(["", f"Niveau Bloom - {label}", "Niveau de Bloom:"])
+            classification.append("\n".join(line for line in [
+                f"Objectif: {statement}",
+                f"Verbe principal: {objective['verbe']}",
+                bloom_line,
+                f"Justification: Le verbe \"{objective['verbe']}\" correspond au niveau {label} de la taxonomie de Bloom."
+            ] if line))
+
+            prefix = f"{number}. " if not self._malformed(rng) else ""
+            formatted.append(
+                f"{prefix}À la fin de la semaine {objective['semaine']}, l'apprenant sera "
+                f"{capable_of(objective['verbe'])} {objective['sujet']} {objective['condition']}."
+            )
+
+            level_line = f"   - **Niveau de difficulté : {objective['difficulte']}**"
+            if self._malformed(rng):
+                level_line = rng.choice(["", "   - **Niveau de difficulté : élevé**"])
+            difficulty.append("\n".join(line for line in [
+                f"{number}. **Objectif : {statement}**",
+                level_line,
+                f"   - **Justification :** Cet objectif mobilise le niveau {label} sur {objective['sujet']}.",
+                f"   - **Temps nécessaire :** Environ {objective['heures']}-{objective['heures'] + 2} heures.",
+                "   - **Conseils :** Décomposer en sous-objectifs et proposer des exercices progressifs."
+            ] if line))
+
+        return {
+            "classification": {"classification": "\n\n---\n\n".join(classification)},
+            "formatted_objectives": {"formatted_objectives": "\n\n".join(formatted)},
+            "difficulty_evaluation": {"difficulty_evaluation": "\n\n".join(difficulty)},
+            "domaine": self.domain,
+            "contexte": f"Formation synthétique de {objective_count} objectifs sur {self.weeks} semaines"
+        }
+
+    def generate_bloom_input(self, objective_count: int = 3, index: int = 0) -> Dict[str, Any]:
+        """Entrée au format classification_bloom (exemple_cybersecurite.json)"""
+        rng = self._rng('bloom', index)
+        objectives = self.objectives(objective_count, rng)
+
+        classification = {level: [] for level in BLOOM_LABELS}
+        difficulty = {level: [] for level in DIFFICULTY_LEVELS}
+        smart = []
+        for objective in objectives:
+            statement = f"{objective['verbe'].capitalize()} {objective['sujet']}"
+            level = objective['bloom']
+            if self._malformed(rng):
+                # Entrée vide ou rangée sous une clé inconnue
+                level = rng.choice([level, f"{level}_"])
+                statement = statement if level != objective['bloom'] else ""
+            classification.setdefault(level, []).append(statement)
+
+            difficulty[DIFFICULTY_LEVELS[min(2, (objective['difficulte'] - 1) // 2)]].append(
+                f"{objective['verbe'].capitalize()} {objective['sujet']}"
+            )
+
+            entry = {
+                "objectif": f"À la fin de la semaine {objective['semaine']}, l'apprenant sera "
+                            f"{capable_of(objective['verbe'])} {objective['sujet']} {objective['condition']}",
+                "specifique": statement or f"{objective['verbe'].capitalize()} {objective['sujet']}",
+                "mesurable": objective['condition'],
+                "atteignable": "Ressources et exemples fournis, difficulté progressive",
+                "pertinent": f"Compétence utile en {self.domain.lower()}",
+                "temporel": f"Semaine {objective['semaine']}",
+                "niveau_bloom": objective['bloom']
+            }
+            if self._malformed(rng):
+                del entry["niveau_bloom"]
+            smart.append(entry)
+
+        hours = sum(objective['heures'] for objective in objectives)
+        difficulty.update({
+            "progression_temporelle": f"{hours} heures de formation réparties sur {self.weeks} semaines",
+            "prerequis": "Connaissances de base du domaine",
+            "public_cible": "Apprenants adultes en formation continue",
+            "modalites_evaluation": {
+                "formative": "Quiz après chaque séquence, exercices pratiques",
+                "sommative": "Évaluation finale sur étude de cas"
+            }
+        })
+        return {
+            "domaine": self.domain,
+            "classification_bloom": classification,
+            "objectifs_smart": smart,
+            "evaluation_difficulte": difficulty
+        }
+
+    def generate_sequencer(self, screen_count: int = 20, objective_count: int = 3, index: int = 0) -> List[Dict[str, Any]]:
+        """Séquenceur conforme à SCREEN_SCHEMA, écrans répartis sur les objectifs dans l'ordre"""
+        rng = self._rng('sequencer', index)
+        objectives = self.objectives(max(1, objective_count), rng)
+        per_sequence = max(1, -(-screen_count // len(objectives)))
+
+        screens = []
+        for number in range(1, screen_count + 1):
+            sequence = (number - 1) // per_sequence
+            objective = objectives[min(sequence, len(objectives) - 1)]
+            activity_type = rng.choice(BLOOM_ACTIVITIES[objective['bloom']])
+            difficulty = DIFFICULTY_LEVELS[min(2, (objective['difficulte'] - 1) // 2)]
+            screens.append({
+                "sequence": f"Séquence {sequence + 1}",
+                "num_ecran": f"S{sequence + 1}E{(number - 1) % per_sequence + 1}",
+                "titre_ecran": f"{objective['verbe'].capitalize()} {objective['sujet']}",
+                "sous_titre": f"Étape {(number - 1) % per_sequence + 1} : {objective['condition']}",
+                "resume_contenu": (
+                    f"Activité {activity_type} pour {objective['verbe']} {objective['sujet']}, "
+                    f"niveau {BLOOM_LABELS[objective['bloom']]}."
+                ),
+                "type_activite": activity_type,
+                "niveau_bloom": objective['bloom'],
+                "difficulte": difficulty,
+                "duree_estimee": rng.randint(2, 8),
+                "objectif_lie": f"L'apprenant sera {capable_of(objective['verbe'])} {objective['sujet']}",
+                "commentaire": f"Semaine {objective['semaine']}"
+            })
+        return screens
+
+    def _rng(self, kind: str, index: int) -> random.Random:
+        # Un générateur par document : les fichiers ne dépendent ni de l'ordre ni du nombre générés
+        return random.Random(f"{self.seed}:{kind}:{index}")
+
+    def _malformed(self, rng: random.Random) -> bool:
+        return self.malformed_rate > 0 and rng.random() < self.malformed_rate
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Génère des entrées synthétiques déterministes (analyses d'objectifs et séquenceurs)."
+    )
+    parser.add_argument("-o", "--output-dir", default="synthetic", help="Répertoire de sortie (défaut : synthetic)")
+    parser.add_argument("--count", type=int, default=1, help="Nombre de fichiers par format (défaut : 1)")
+    parser.add_argument("--objectives", type=int, default=10, help="Objectifs par fichier (défaut : 10)")
+    parser.add_argument("--screens", type=int, default=0, help="Écrans par séquenceur (défaut : 0, aucun séquenceur)")
+    parser.add_argument(
+        "--format", choices=["text", "bloom", "both"], default="text",
+        help="text : format classification/formatted_objectives/difficulty_evaluation ; bloom : classification_bloom"
+    )
+    parser.add_argument("--domain", choices=list(DOMAINS), default="Cybersécurité")
+    parser.add_argument("--bloom-mix", default=None, help="Poids par niveau, ex. comprendre=2,analyser=1")
+    parser.add_argument("--weeks", type=int, default=8, help="Durée de la formation en semaines (défaut : 8)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Proportion de lignes altérées (0 à 1)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        generator = WorkloadGenerator(
+            seed=args.seed,
+            domain=args.domain,
+            bloom_mix=parse_bloom_mix(args.bloom_mix) if args.bloom_mix else None,
+            weeks=args.weeks,
+            malformed_rate=args.malformed_rate
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = 0
+    for index in range(args.count):
+        documents = {}
+        if args.format in ("text", "both"):
+            documents[f"analyse_{index:04d}.json"] = generator.generate_text_input(args.objectives, index)
+        if args.format in ("bloom", "both"):
+            documents[f"bloom_{index:04d}.json"] = generator.generate_bloom_input(args.objectives, index)
+        if args.screens > 0:
+            documents[f"sequenceur_{index:04d}.json"] = generator.generate_sequencer(args.screens, args.objectives, index)
+        for name, document in documents.items():
+            with open(output_dir / name, 'w', encoding='utf-8') as f:
+                json.dump(document, f, indent=2, ensure_ascii=False)
+            written += 1
+
+    print(f"{written} fichiers écrits dans {output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Reprise d'un lot (BatchRun, backend local) : relire les résultats d'un lot terminé ne
+compte pas l'usage une seconde fois, et un écran dont la réponse a été évincée du cache
+part dans le lot suivant au lieu d'être généré pendant la collecte.
+
+Usage : python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from batch_runner import BatchRun
+from config import BATCH_CONFIG, RATE_LIMIT_CONFIG
+from llm_cache import LLMCache
+from mock_llm_server import MockLLMServer
+from script_generators import ScriptGenerator
+from synthetic_workload import WorkloadGenerator
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setitem(RATE_LIMIT_CONFIG, "enabled", False)
+    monkeypatch.setitem(BATCH_CONFIG, "directory", str(tmp_path / "lots"))
+    with MockLLMServer(seed=0, latency="fixed:0.01", tokens_per_second=100000) as server:
+        yield server
+
+
+def make_run(server, tmp_path, cache):
+    generator = ScriptGenerator("sk-mock", cache=cache, base_url=server.base_url)
+    return generator, BatchRun(generator, str(tmp_path / "lot"), backend="local", poll_interval=0)
+
+
+def test_rerun_does_not_count_usage_twice(server, tmp_path):
+    activities = WorkloadGenerator(seed=0).generate_sequencer(6, 2)
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+
+    generator, batch = make_run(server, tmp_path, cache)
+    first = batch.run(activities)
+    assert all(entry['script'] for entry in first.values())
+    requests = generator.llm.usage_stats()['requests']
+    assert requests == len(activities)
+
+    before = server.stats()['requests']
+    second = batch.run(activities)
+    assert generator.llm.usage_stats()['requests'] == requests
+    assert server.stats()['requests'] == before
+    assert {key: entry['script'] for key, entry in second.items()} == {key: entry['script'] for key, entry in first.items()}
+
+
+def test_evicted_cached_screen_goes_to_next_batch(server, tmp_path, monkeypatch):
+    activities = WorkloadGenerator(seed=0).generate_sequencer(4, 2)
+    cache = LLMCache(path=str(tmp_path / "cache.sqlite3"))
+
+    # Premier écran déjà généré : marqué 'cached' et absent du lot
+    warm = ScriptGenerator("sk-mock", cache=cache, base_url=server.base_url)
+    warm.generate_text(activities[0], activities[0]['type_activite'])
+    generator, batch = make_run(server, tmp_path, cache)
+    state = batch._load_or_prepare(activities)
+    assert state['cached'] == [activities[0]['num_ecran']]
+
+    # Évincé avant la collecte : soumis dans le lot avec les autres, aucun appel direct
+    cache.clear()
+
+    def live_call(*args, **kwargs):
+        raise AssertionError("appel direct pendant la collecte du lot")
+    monkeypatch.setattr(generator, "generate_text", live_call)
+    results = batch.run(activities)
+    assert all(entry['script'] and not entry['error'] for entry in results.values())
+    assert generator.llm.usage_stats()['requests'] == len(activities)
@@ -0,0 +1,60 @@
+"""
+Régénération (--fresh, case « Régénérer ») : le cache de réponses n'est pas relu,
+chaque appel atteint le serveur (simulé) alors qu'une simple relance est servie sans appel.
+
+Usage : python -m pytest -q tests
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import llm_cache
+import run_store
+from cli import process_file
+from config import RATE_LIMIT_CONFIG
+from llm_cache import LLMCache
+from mock_llm_server import MockLLMServer
+from run_store import RunStore
+from synthetic_workload import WorkloadGenerator
+
+
+@pytest.fixture
+def isolated_state(tmp_path, monkeypatch):
+    """Cache de réponses et points de reprise dans un répertoire temporaire"""
+    monkeypatch.setitem(RATE_LIMIT_CONFIG, "enabled", False)
+    monkeypatch.setattr(llm_cache, "_default_cache", LLMCache(path=str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(run_store, "_default_store", RunStore(str(tmp_path / "runs.sqlite3")))
+    return tmp_path
+
+
+def test_fresh_run_reaches_the_server(isolated_state):
+    input_path = isolated_state / "analyse.json"
+    input_path.write_text(json.dumps(WorkloadGenerator(seed=0).generate_text_input(4, 0), ensure_ascii=False))
+    output_dir = str(isolated_state / "sortie")
+
+    with MockLLMServer(seed=0, latency="fixed:0.01", tokens_per_second=100000) as server:
+        def run(fresh):
+            before = server.stats()['requests']
+            report = process_file(
+                str(input_path), output_dir, "sk-mock", scripts=True, base_url=server.base_url, fresh=fresh
+            )
+            assert report['success'], report['error']
+            return server.stats()['requests'] - before, report
+
+        first_requests, _ = run(fresh=False)
+        resumed_requests, resumed = run(fresh=False)
+        fresh_requests, fresh = run(fresh=True)
+
+    assert first_requests > 0
+    # Simple relance : séquenceur et scripts repris, aucun appel
+    assert resumed_requests == 0
+    assert resumed['resumed'] > 0
+    # Régénération : ni reprise ni cache de réponses, autant d'appels que la première fois
+    assert fresh['resumed'] == 0
+    assert fresh_requests == first_requests
+    assert fresh['usage']['requests'] > 0
+    assert fresh['usage']['completion_tokens'] > 0
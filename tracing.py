@@ -0,0 +1,313 @@
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Any, Deque, Iterator, Optional
+
+from config import TRACE_CONFIG
+
+# Étapes mesurées, dans l'ordre d'une génération
+STAGES = ('analysis', 'prompt_build', 'queue_wait', 'ttft', 'llm_total', 'parse', 'enrich', 'export')
+
+STAGE_LABELS = {
+    'analysis': "Analyse des entrées",
+    'prompt_build': "Construction du prompt",
+    'queue_wait': "Attente (concurrence, débit)",
+    'ttft': "Premier token",
+    'llm_total': "Appels LLM",
+    'parse': "Parsing",
+    'enrich': "Enrichissement",
+    'export': "Export"
+}
+
+TOKEN_FIELDS = ('requests', 'response_cache_hits', 'prompt_tokens', 'cached_tokens', 'completion_tokens')
+
+# Exécution en cours ; les ContextVar suivent les tâches asyncio (les threads d'un pool doivent recevoir le contexte)
+_current_run: ContextVar[Optional['TraceRun']] = ContextVar('trace_run', default=None)
+
+
+class TraceRun:
+    """Une exécution (génération d'un séquenceur, d'un script...) : temps par étape et tokens"""
+
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.run_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.tokens = {field: 0 for field in TOKEN_FIELDS}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, **attributes) -> None:
+        """Ajoute une mesure d'étape (les appels concurrents s'additionnent)"""
+        with self._lock:
+            totals = self.stages.setdefault(stage, {'count': 0, 'seconds': 0.0})
+            totals['count'] += 1
+            totals['seconds'] += seconds
+        self.tracer._emit({
+            'type': 'span', 'run_id': self.run_id, 'run': self.name, 'stage': stage,
+            'offset': round(time.perf_counter() - self._start - seconds, 6),
+            'seconds': round(seconds, 6), **attributes
+        })
+
+    def add_usage(self, usage: Dict[str, int], from_cache: bool = False) -> None:
+        with self._lock:
+            if from_cache:
+                self.tokens['response_cache_hits'] += 1
+                return
+            self.tokens['requests'] += 1
+            for field in ('prompt_tokens', 'cached_tokens', 'completion_tokens'):
+                self.tokens[field] += usage.get(field, 0)
+
+    def summary(self) -> Dict[str, Any]:
+        """Temps par étape (secondes, dans l'ordre de STAGES), tokens et durée totale"""
+        with self._lock:
+            stages = {
+                stage: dict(self.stages[stage])
+                for stage in sorted(self.stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+            }
+            tokens = dict(self.tokens)
+        return {
+            'run_id': self.run_id,
+            'name': self.name,
+            'started_at': self.started_at,
+            'duration': self.duration if self.duration is not None else time.perf_counter() - self._start,
+            'attributes': self.attributes,
+            'stages': stages,
+            'tokens': tokens
+        }
+
+
+class Tracer:
+    """
+    Collecte des exécutions instrumentées et de leurs étapes.
+
+    - API Python : runs(), last_run(), totals() ;
+    - trace JSONL : une ligne par étape mesurée puis une ligne de synthèse par exécution ;
+    - fichier texte Prometheus (node_exporter textfile collector), réécrit à la fin de chaque exécution.
+
+    Les exécutions imbriquées sont fusionnées : un générateur appelé dans une exécution
+    déjà ouverte (fichier de la CLI, par exemple) y ajoute ses étapes.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        max_runs: int = 50,
+        enabled: bool = True
+    ):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path.replace('{pid}', str(os.getpid())) if prometheus_path else None
+        self.enabled = enabled
+        self._runs: Deque[TraceRun] = deque(maxlen=max_runs)
+        self._totals: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def run(self, name: str, **attributes) -> Iterator[Optional[TraceRun]]:
+        """Ouvre une exécution, ou rejoint celle qui est déjà ouverte dans ce contexte"""
+        current = _current_run.get()
+        if current is not None or not self.enabled:
+            yield current
+            return
+
+        trace_run = TraceRun(self, name, attributes)
+        token = _current_run.set(trace_run)
+        try:
+            yield trace_run
+        finally:
+            try:
+                _current_run.reset(token)
+            except ValueError:
+                # Générateur fermé depuis un autre contexte (ramasse-miettes) : rien à restaurer
+                pass
+            self._finish(trace_run)
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """Synthèses des dernières exécutions terminées, de la plus ancienne à la plus récente"""
+        with self._lock:
+            runs = list(self._runs)
+        return [trace_run.summary() for trace_run in runs]
+
+    def last_run(self, name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Synthèse de la dernière exécution terminée (du nom donné, le cas échéant)"""
+        for summary in reversed(self.runs()):
+            if name is None or summary['name'] == name:
+                return summary
+        return None
+
+    def totals(self) -> Dict[str, Dict[str, Any]]:
+        """Cumuls par nom d'exécution depuis le démarrage du processus"""
+        with self._lock:
+            return json.loads(json.dumps(self._totals))
+
+    def prometheus_text(self) -> str:
+        """Cumuls au format texte d'exposition Prometheus"""
+        totals = self.totals()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[tuple]) -> None:
+            lines.append(f"# HELP pedagogical_sequencer_{name} {help_text}")
+            lines.append(f"# TYPE pedagogical_sequencer_{name} {kind}")
+            for labels, value in samples:
+                rendered = ','.join(f'{key}="{_escape_label(str(val))}"' for key, val in labels.items())
+                lines.append(f"pedagogical_sequencer_{name}{{{rendered}}} {_format_sample(value)}")
+
+        metric('runs_total', 'counter', "Exécutions terminées", [
+            ({'run': name}, data['runs']) for name, data in totals.items()
+        ])
+        metric('run_seconds_total', 'counter', "Durée cumulée des exécutions", [
+            ({'run': name}, data['seconds']) for name, data in totals.items()
+        ])
+        metric('stage_seconds_total', 'counter', "Temps cumulé par étape", [
+            ({'run': name, 'stage': stage}, stage_totals['seconds'])
+            for name, data in totals.items() for stage, stage_totals in data['stages'].items()
+        ])
+        metric('stage_count_total', 'counter', "Mesures par étape", [
+            ({'run': name, 'stage': stage}, stage_totals['count'])
+            for name, data in totals.items() for stage, stage_totals in data['stages'].items()
+        ])
+        metric('tokens_total', 'counter', "Tokens et requêtes LLM", [
+            ({'run': name, 'kind': field}, value)
+            for name, data in totals.items() for field, value in data['tokens'].items()
+        ])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: Optional[str] = None) -> None:
+        """Écrit le fichier texte Prometheus (remplacement atomique)"""
+        path = path or self.prometheus_path
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temporary, path)
+
+    def _finish(self, trace_run: TraceRun) -> None:
+        trace_run.duration = time.perf_counter() - trace_run._start
+        summary = trace_run.summary()
+        with self._lock:
+            self._runs.append(trace_run)
+            totals = self._totals.setdefault(trace_run.name, {
+                'runs': 0, 'seconds': 0.0, 'stages': {}, 'tokens': {field: 0 for field in TOKEN_FIELDS}
+            })
+            totals['runs'] += 1
+            totals['seconds'] += summary['duration']
+            for stage, stage_summary in summary['stages'].items():
+                stage_totals = totals['stages'].setdefault(stage, {'count': 0, 'seconds': 0.0})
+                stage_totals['count'] += stage_summary['count']
+                stage_totals['seconds'] += stage_summary['seconds']
+            for field, value in summary['tokens'].items():
+                totals['tokens'][field] += value
+
+        self._emit(dict(summary, type='run'))
+        self.write_prometheus()
+
+    def _emit(self, record: Dict[str, Any]) -> None:
+        if not self.jsonl_path:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            directory = os.path.dirname(self.jsonl_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Ajout en une écriture : les lignes de plusieurs processus ne s'entremêlent pas
+            with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_sample(value: Any) -> str:
+    """Valeur d'un échantillon Prometheus sans perte : entiers en entier, flottants en repr (17 chiffres au besoin)"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def current_run() -> Optional[TraceRun]:
+    """Exécution ouverte dans le contexte courant (None hors exécution)"""
+    return _current_run.get()
+
+
+@contextmanager
+def span(stage: str, **attributes) -> Iterator[None]:
+    """Mesure une étape de l'exécution courante (sans effet hors exécution)"""
+    trace_run = _current_run.get()
+    if trace_run is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace_run.record(stage, time.perf_counter() - start, **attributes)
+
+
+def record(stage: str, seconds: float, trace_run: Optional[TraceRun] = None, **attributes) -> None:
+    """Ajoute une durée mesurée ailleurs (attente, premier token) à l'exécution donnée ou courante"""
+    trace_run = trace_run or _current_run.get()
+    if trace_run is not None:
+        trace_run.record(stage, seconds, **attributes)
+
+
+def format_stage_summary(summary: Dict[str, Any]) -> str:
+    """Résumé lisible du temps par étape d'une exécution"""
+    parts = [
+        f"{STAGE_LABELS.get(stage, stage)} {totals['seconds']:.2f} s"
+        + (f" ({totals['count']}×)" if totals['count'] > 1 else "")
+        for stage, totals in summary['stages'].items()
+    ]
+    return f"{summary['duration']:.2f} s au total · " + " · ".join(parts)
+
+
+_default_tracer: Optional[Tracer] = None
+_default_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Collecteur partagé du processus, paramétré par TRACE_CONFIG"""
+    global _default_tracer
+    with _default_tracer_lock:
+        if _default_tracer is None:
+            _default_tracer = Tracer(
+                jsonl_path=TRACE_CONFIG.get("jsonl_path"),
+                prometheus_path=TRACE_CONFIG.get("prometheus_path"),
+                max_runs=TRACE_CONFIG.get("max_runs", 50),
+                enabled=TRACE_CONFIG.get("enabled", True)
+            )
+        return _default_tracer
+
+
+def configure_tracing(jsonl_path: Optional[str] = None, prometheus_path: Optional[str] = None) -> Tracer:
+    """
+    Fixe les fichiers de sortie et recrée le collecteur partagé (worker de la CLI, par exemple).
+    Un chemin None conserve la valeur de TRACE_CONFIG.
+    """
+    global _default_tracer
+    if jsonl_path is not None:
+        TRACE_CONFIG["jsonl_path"] = jsonl_path
+    if prometheus_path is not None:
+        TRACE_CONFIG["prometheus_path"] = prometheus_path
+    with _default_tracer_lock:
+        _default_tracer = None
+    return get_tracer()
@@ -1,21 +1,32 @@
-import streamlit as st
 import json
 import csv
 import io
 import re
-from typing import Dict, List, Any, Tuple
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Any, BinaryIO, Optional, TextIO, Tuple
+
+from objective_parser import (
+    ObjectiveAnalysis,
+    parse_classification,
+    parse_difficulty_evaluation,
+    parse_input_data,
+    parse_smart_objectives
+)
+from sequencer_schema import AUTHORIZED_ACTIVITY_TYPES
 
 def load_json_file(uploaded_file) -> Dict[str, Any]:
-    """Charge et valide un fichier JSON"""
+    """
+    Charge un fichier JSON (fichier uploadé ou ouvert en mode binaire).
+    Lève ValueError avec un message lisible si le fichier est illisible ou invalide.
+    """
     try:
         content = uploaded_file.read().decode('utf-8')
         return json.loads(content)
     except json.JSONDecodeError:
-        st.error("Fichier JSON invalide")
-        return {}
+        raise ValueError("Fichier JSON invalide")
     except Exception as e:
-        st.error(f"Erreur lors du chargement : {str(e)}")
-        return {}
+        raise ValueError(f"Erreur lors du chargement : {str(e)}")
 
 def create_sample_json() -> Dict[str, Any]:
     """Crée un exemple de fichier JSON pour le nouveau format"""
@@ -33,17 +44,13 @@ def create_sample_json() -> Dict[str, Any]:
         "contexte": "Formation universitaire niveau L2, étudiants en histoire"
     }
 
-def validate_new_format_data(data: Dict[str, Any]) -> Tuple[bool, List[str], Dict[str, Any]]:
+def validate_new_format_data(data: Dict[str, Any], parsed: Optional[ObjectiveAnalysis] = None) -> Tuple[bool, List[str], Dict[str, Any]]:
     """
     Valide les données du nouveau format et retourne des statistiques
+    
+    parsed : analyse déjà calculée par parse_input_data (évite de ré-analyser les textes)
     """
     errors = []
-    stats = {
-        'objectives_count': 0,
-        'bloom_levels': 0,
-        'difficulty_levels': 0,
-        'temporal_indicators': 0
-    }
     
     # Vérification des champs obligatoires
     required_fields = ['classification', 'formatted_objectives', 'difficulty_evaluation']
@@ -58,113 +65,55 @@ def validate_new_format_data(data: Dict[str, Any]) -> Tuple[bool, List[str], Dic
         elif not data[field][field]:
             errors.append(f"Contenu vide : {field}.{field}")
     
-    # Analyse de la classification si présente
-    if 'classification' in data and 'classification' in data['classification']:
-        classification_text = data['classification']['classification']
-        
-        # Compter les objectifs (séparés par ---)
-        objectives = classification_text.split('---')
-        stats['objectives_count'] = len([obj for obj in objectives if obj.strip()])
-        
-        # Compter les niveaux de Bloom uniques
-        bloom_levels = set()
-        for line in classification_text.split('\n'):
-            if 'Niveau de Bloom:' in line:
-                level = line.split('Niveau de Bloom:')[1].strip()
-                bloom_levels.add(level.lower())
-        stats['bloom_levels'] = len(bloom_levels)
-    
-    # Analyse des objectifs formatés
+    # Analyse unique des trois textes
+    if parsed is None:
+        parsed = parse_input_data(data)
+    stats = parsed.validation_stats()
+    
+    # Vérifier la numérotation des objectifs SMART
     if 'formatted_objectives' in data and 'formatted_objectives' in data['formatted_objectives']:
-        objectives_text = data['formatted_objectives']['formatted_objectives']
-        
-        # Vérifier la numérotation
-        numbered_objectives = re.findall(r'\d+\.', objectives_text)
-        if len(numbered_objectives) != stats['objectives_count'] and stats['objectives_count'] > 0:
+        if len(parsed.smart_objectives) != stats['objectives_count'] and stats['objectives_count'] > 0:
             errors.append("Le nombre d'objectifs SMART ne correspond pas à la classification")
-        
-        # Compter les indicateurs temporels
-        temporal_matches = re.findall(r'semaine \d+|fin de.*?semaine', objectives_text, re.IGNORECASE)
-        stats['temporal_indicators'] = len(temporal_matches)
     
-    # Analyse de l'évaluation de difficulté
+    # Vérifier la cohérence des évaluations de difficulté avec les objectifs
     if 'difficulty_evaluation' in data and 'difficulty_evaluation' in data['difficulty_evaluation']:
-        difficulty_text = data['difficulty_evaluation']['difficulty_evaluation']
-        
-        # Compter les niveaux de difficulté
-        difficulty_levels = set()
-        difficulty_matches = re.findall(r'Niveau de difficulté\s*:\s*(\d+)', difficulty_text)
-        for match in difficulty_matches:
-            difficulty_levels.add(int(match))
-        stats['difficulty_levels'] = len(difficulty_levels)
-        
-        # Vérifier la cohérence avec les objectifs
-        difficulty_objectives = re.findall(r'\d+\.\s*\*\*Objectif', difficulty_text)
-        if len(difficulty_objectives) != stats['objectives_count'] and stats['objectives_count'] > 0:
+        if len(parsed.difficulties) != stats['objectives_count'] and stats['objectives_count'] > 0:
             errors.append("Le nombre d'évaluations de difficulté ne correspond pas aux objectifs")
+        for failure in parsed.difficulty_failures:
+            errors.append(f"Évaluation de difficulté non analysée — {failure}")
     
     return len(errors) == 0, errors, stats
 
 def extract_bloom_progression(classification_text: str) -> List[str]:
     """Extrait la progression des niveaux de Bloom dans l'ordre"""
-    bloom_progression = []
-    
-    objectives = classification_text.split('---')
-    for obj in objectives:
-        if obj.strip():
-            for line in obj.split('\n'):
-                if 'Niveau de Bloom:' in line:
-                    level = line.split('Niveau de Bloom:')[1].strip()
-                    bloom_progression.append(level)
-                    break
-    
-    return bloom_progression
+    return parse_classification(classification_text).bloom_progression
 
 def extract_temporal_sequence(formatted_objectives: str) -> List[Dict[str, str]]:
     """Extrait la séquence temporelle des objectifs"""
-    temporal_sequence = []
-    
-    # Pattern pour extraire objectifs numérotés avec détails temporels
-    pattern = r'(\d+)\.\s*(.*?)(?=\n\n|\n\d+\.|\Z)'
-    matches = re.findall(pattern, formatted_objectives, re.DOTALL)
-    
-    for num, content in matches:
-        # Extraire la semaine
-        week_match = re.search(r'semaine (\d+)', content.lower())
-        week = week_match.group(1) if week_match else None
-        
-        # Extraire le verbe d'action principal
-        verb_match = re.search(r'capable de (\w+)', content.lower())
-        verb = verb_match.group(1) if verb_match else None
-        
-        temporal_sequence.append({
-            'numero': int(num),
-            'semaine': week,
-            'verbe': verb,
-            'objectif_complet': content.strip()
-        })
+    temporal_sequence = [
+        {
+            'numero': obj.numero,
+            'semaine': obj.semaine,
+            'verbe': obj.verbe,
+            'objectif_complet': obj.objectif
+        }
+        for obj in parse_smart_objectives(formatted_objectives).smart_objectives
+    ]
     
     return sorted(temporal_sequence, key=lambda x: (int(x['semaine']) if x['semaine'] else 999, x['numero']))
 
 def extract_difficulty_matrix(difficulty_text: str) -> Dict[str, Dict[str, Any]]:
     """Extrait une matrice de difficulté détaillée"""
-    matrix = {}
-    
-    # Pattern pour extraire toutes les informations de difficulté
-    pattern = r'(\d+)\.\s*\*\*Objectif\s*:\s*(.*?)\*\*\s*\n\s*-\s*\*\*Niveau de difficulté\s*:\s*(\d+)\*\*\s*\n\s*-\s*\*\*Justification\s*:\*\*\s*(.*?)\n\s*-\s*\*\*Temps nécessaire\s*:\*\*\s*(.*?)\n'
-    
-    matches = re.findall(pattern, difficulty_text, re.DOTALL)
-    
-    for num, objectif, niveau, justification, temps in matches:
-        matrix[f"objectif_{num}"] = {
-            'objectif': objectif.strip(),
-            'niveau_difficulte': int(niveau),
-            'justification': justification.strip(),
-            'temps_estime': temps.strip(),
-            'numero': int(num)
+    return {
+        f"objectif_{entry.numero}": {
+            'objectif': entry.objectif,
+            'niveau_difficulte': entry.niveau,
+            'justification': entry.justification,
+            'temps_estime': entry.temps,
+            'numero': entry.numero
         }
-    
-    return matrix
+        for entry in parse_difficulty_evaluation(difficulty_text).difficulties
+    }
 
 def export_to_csv(sequencer_data: List[Dict[str, str]]) -> str:
     """Export le séquenceur au format CSV avec les nouveaux champs"""
@@ -203,9 +152,151 @@ def export_to_csv(sequencer_data: List[Dict[str, str]]) -> str:
     
     return output.getvalue()
 
+def export_for_lms(sequencer_data: List[Dict[str, str]]) -> str:
+    """Export spécialisé pour les plateformes LMS"""
+    output = io.StringIO()
+    fieldnames = [
+        'module', 'lesson', 'activity_type', 'title', 'description', 
+        'bloom_level', 'difficulty', 'estimated_time', 'prerequisites'
+    ]
+    
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    
+    for item in sequencer_data:
+        writer.writerow({
+            'module': item.get('sequence', ''),
+            'lesson': item.get('num_ecran', ''),
+            'activity_type': item.get('type_activite', ''),
+            'title': item.get('titre_ecran', ''),
+            'description': item.get('resume_contenu', ''),
+            'bloom_level': item.get('niveau_bloom', ''),
+            'difficulty': item.get('difficulte', ''),
+            'estimated_time': item.get('duree_estimee', 5),
+            'prerequisites': item.get('commentaire', '')
+        })
+    
+    return output.getvalue()
+
+def _script_section(script_id: str, script_data: Dict[str, Any]) -> str:
+    """Section Markdown d'un script"""
+    activity = script_data['activite']
+    return f"""
+# {script_id} - {activity.get('titre_ecran', 'Sans titre')}
+
+**Type :** {activity.get('type_activite', 'N/A')}  
+**Durée :** {activity.get('duree_estimee', 'N/A')} minutes  
+**Difficulté :** {activity.get('difficulte', 'N/A')}  
+
+{script_data['script']}
+
+---
+
+"""
+
+def _prompt_section(prompt_id: str, prompt_data: Dict[str, Any]) -> str:
+    """Section texte d'un prompt"""
+    activity = prompt_data['activite']
+    return f"""
+# PROMPT {prompt_id} - {activity.get('titre_ecran', 'Sans titre')}
+
+Type: {activity.get('type_activite', 'N/A')}
+Durée: {activity.get('duree_estimee', 'N/A')} minutes
+Difficulté: {activity.get('difficulte', 'N/A')}
+
+## Prompt à copier-coller:
+
+{prompt_data['prompt']}
+
+{'='*80}
+
+"""
+
+_SECTION_RENDERERS = {'script': _script_section, 'prompt': _prompt_section}
+
+def export_scripts_markdown(scripts: Dict[str, Dict[str, Any]]) -> str:
+    """Concatène les scripts générés en un document Markdown ({id: {'activite', 'script'}})"""
+    # Une seule concaténation finale : temps linéaire en nombre de scripts
+    return ''.join(_script_section(script_id, script_data) for script_id, script_data in scripts.items())
+
+def export_prompts_text(prompts: Dict[str, Dict[str, Any]]) -> str:
+    """Concatène les prompts générés en un document texte ({id: {'activite', 'prompt'}})"""
+    return ''.join(_prompt_section(prompt_id, prompt_data) for prompt_id, prompt_data in prompts.items())
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', name).strip('._') or 'ecran'
+
+def write_texts_zip(texts: Dict[str, Dict[str, Any]], output: BinaryIO, text_field: str = 'script') -> int:
+    """
+    Écrit une archive ZIP : un fichier Markdown par écran, puis manifest.json.
+
+    texts : {id: {'activite', text_field}} ; output : fichier binaire ouvert en écriture.
+    Chaque écran est compressé et écrit dès qu'il est rendu : la mémoire ne dépend que
+    du plus long texte (et du manifeste, sans les textes). Retourne le nombre d'écrans.
+    """
+    render = _SECTION_RENDERERS[text_field]
+    entries = []
+    types = set()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for index, (text_id, text_data) in enumerate(texts.items(), 1):
+            activity = text_data['activite']
+            file_name = f"{index:05d}_{_safe_filename(text_id)}.md"
+            archive.writestr(file_name, render(text_id, text_data))
+            types.add(activity.get('type_activite'))
+            entries.append({
+                'fichier': file_name,
+                'id': text_id,
+                'num_ecran': activity.get('num_ecran'),
+                'titre_ecran': activity.get('titre_ecran'),
+                'type_activite': activity.get('type_activite'),
+                'caracteres': len(text_data[text_field] or '')
+            })
+        # Manifeste écrit entrée par entrée, sans document JSON complet en mémoire
+        with io.TextIOWrapper(archive.open('manifest.json', 'w'), encoding='utf-8') as manifest:
+            header = {
+                'date_generation': datetime.now().isoformat(),
+                'nombre_ecrans': len(entries),
+                'types_activites': sorted(str(activity_type) for activity_type in types)
+            }
+            manifest.write(json.dumps(header, ensure_ascii=False)[:-1] + ', "fichiers": [')
+            for position, entry in enumerate(entries):
+                manifest.write((',' if position else '') + '\n  ' + json.dumps(entry, ensure_ascii=False))
+            manifest.write('\n]}\n')
+    return len(entries)
+
+def write_texts_jsonl(texts: Dict[str, Dict[str, Any]], output: TextIO, text_field: str = 'script') -> int:
+    """
+    Écrit un objet JSON par ligne et par écran ({"id", "activite", text_field}) dans un fichier texte.
+    Les lignes sont écrites au fil de l'eau, sans document complet en mémoire. Retourne le nombre d'écrans.
+    """
+    count = 0
+    for text_id, text_data in texts.items():
+        output.write(json.dumps(
+            {'id': text_id, 'activite': text_data['activite'], text_field: text_data[text_field]},
+            ensure_ascii=False
+        ))
+        output.write('\n')
+        count += 1
+    return count
+
+def build_texts_export(texts: Dict[str, Dict[str, Any]], export_format: str, text_field: str = 'script') -> bytes:
+    """
+    Contenu d'un export 'zip' (write_texts_zip) ou 'jsonl' (write_texts_jsonl), construit en mémoire
+    pour un bouton de téléchargement. Lève ValueError si le format n'est pas supporté.
+    """
+    if export_format not in ('zip', 'jsonl'):
+        raise ValueError(f"Format d'export '{export_format}' non supporté")
+    if export_format == 'zip':
+        buffer = io.BytesIO()
+        write_texts_zip(texts, buffer, text_field)
+        return buffer.getvalue()
+    buffer = io.StringIO()
+    write_texts_jsonl(texts, buffer, text_field)
+    return buffer.getvalue().encode('utf-8')
+
 def validate_activity_types(sequencer_data: List[Dict[str, str]]) -> List[str]:
     """Valide que seuls les types d'activités autorisés sont utilisés"""
-    authorized_types = ['text', 'quiz', 'accordion', 'video', 'image', 'flash-card']
+    authorized_types = AUTHORIZED_ACTIVITY_TYPES
     errors = []
     
     for i, item in enumerate(sequencer_data):